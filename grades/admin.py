@@ -1,33 +1,273 @@
-from django.contrib import admin
-from .models import Course, Enrollment, Profile, Comment, Teacher
+import hashlib
+
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Exists, F, OuterRef, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .grading import recompute_course
+from .models import (
+    ArchivedEnrollment, Course, CourseSlot, Enrollment, EnrollmentRequest, GradingPolicy, Prerequisite, Profile,
+    Comment, Semester, Task, Teacher, WaitlistEntry,
+)
+from .throttle import enrollment_key, forget, forget_many
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator for very large changelists.
+
+    Unfiltered PostgreSQL tables use the planner's row estimate; everything
+    else runs the real COUNT(*) once and caches it for
+    GRADES_ADMIN_COUNT_TTL seconds, keyed by the SQL of the filtered query.
+    """
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        query = getattr(qs, 'query', None)
+        if query is None:
+            return super().count
+        conn = connections[qs.db]
+        if conn.vendor == 'postgresql' and not query.where:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [qs.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] > 0:
+                return row[0]
+        sql, params = query.sql_with_params()
+        key = 'admin-count:' + hashlib.md5(f'{sql}|{params}'.encode()).hexdigest()
+        total = cache.get(key)
+        if total is None:
+            total = qs.count()
+            cache.set(key, total, getattr(settings, 'GRADES_ADMIN_COUNT_TTL', 60))
+        return total
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist defaults for tables with millions of rows."""
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+class GradingPolicyInline(admin.StackedInline):
+    model = GradingPolicy
+    can_delete = False
+    max_num = 1
+
+
+class PrerequisiteInline(admin.TabularInline):
+    model = Prerequisite
+    fk_name = 'course'
+    autocomplete_fields = ('required',)
+    extra = 0
+
+
+class CourseSlotInline(admin.TabularInline):
+    model = CourseSlot
+    extra = 0
 
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
-    list_display = ('code', 'name', 'teacher')
+    inlines = (GradingPolicyInline, CourseSlotInline, PrerequisiteInline)
+    list_display = ('code', 'name', 'teacher', 'capacity')
+    list_select_related = ('teacher',)
     search_fields = ('code', 'name', 'teacher__username', 'teacher__profile__full_name')
+    autocomplete_fields = ('teacher',)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'capacity' in form.changed_data:
+            # a raised (or removed) capacity lets the waitlists in
+            from .waitlist import seats_freed
+            for semester in set(obj.waitlist_entries.values_list('semester', flat=True)):
+                seats_freed(obj.id, semester)
+
+
+class EnrollmentActionForm(ActionForm):
+    semester = forms.CharField(max_length=20, required=False, label='學期')
+    course_code = forms.CharField(max_length=10, required=False, label='目標課程代碼')
 
 
 @admin.register(Enrollment)
-class EnrollmentAdmin(admin.ModelAdmin):
-    list_display = ('student', 'course', 'semester', 'midterm_grade', 'final_grade')
-    list_filter = ('course', 'semester')
+class EnrollmentAdmin(LargeTableAdmin):
+    list_display = ('student', 'course', 'semester', 'midterm_grade', 'final_grade', 'total_grade')
+    list_select_related = ('student', 'course')
+    # filtering by course goes through search; listing every course as a filter option does not scale
+    list_filter = ('semester',)
     search_fields = ('student__username', 'course__code', 'course__name')
+    autocomplete_fields = ('student', 'course')
+    action_form = EnrollmentActionForm
+    actions = ('set_semester', 'clear_grades', 'move_to_course')
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        Semester.touch([obj.semester])
+        forget(enrollment_key(obj.student_id, obj.course_id))
+
+    def delete_queryset(self, request, queryset):
+        rows = list(queryset.values_list('student_id', 'course_id', 'semester'))
+        super().delete_queryset(request, queryset)
+        Semester.touch({semester for _, _, semester in rows})
+        forget_many(enrollment_key(student, course) for student, course, _ in rows)
+
+    def _reassign(self, request, queryset, **target):
+        """Set ``target`` (semester or course_id) on the selected rows, skipping those that would collide.
+
+        A row is skipped when the student already has the resulting
+        (student, course, semester) row, or when a selected row with a lower
+        id takes it; both are decided in SQL (a NOT EXISTS and a ROW_NUMBER
+        over the resulting key), so the rows never reach Python and the
+        rest are updated with one UPDATE. Returns (updated, skipped), or
+        None after reporting a concurrent collision.
+        """
+        fields = ('student_id', 'course_id', 'semester')
+        taken = Enrollment.objects.filter(**{**{f: OuterRef(f) for f in fields}, **target}).exclude(pk=OuterRef('pk'))
+        first = Window(RowNumber(), partition_by=[F(f) for f in fields if f not in target], order_by=F('id').asc())
+        keep = queryset.filter(~Exists(taken)).annotate(turn=first).filter(turn=1).values('id')
+        try:
+            with transaction.atomic():
+                selected = queryset.count()
+                semesters = set(queryset.values_list('semester', flat=True).distinct())
+                updated = Enrollment.objects.filter(id__in=keep).update(**target)
+                if 'semester' in target:
+                    semesters.add(target['semester'])
+                Semester.touch(semesters)
+        except IntegrityError:
+            self.message_user(request, '部分選課紀錄剛被其他人修改，未做任何變更，請重新操作', messages.ERROR)
+            return None
+        return updated, selected - updated
+
+    def _report_reassign(self, request, result, done):
+        updated, skipped = result
+        if skipped:
+            self.message_user(request, f'{done}；{skipped} 筆因學生已有相同課程與學期的選課紀錄而略過', messages.WARNING)
+        else:
+            self.message_user(request, done)
+
+    @admin.action(description='設定學期（使用上方「學期」欄位）')
+    def set_semester(self, request, queryset):
+        semester = request.POST.get('semester', '').strip()
+        if not semester:
+            self.message_user(request, '請輸入學期', messages.ERROR)
+            return
+        result = self._reassign(request, queryset, semester=semester)
+        if result:
+            self._report_reassign(request, result, f'已將 {result[0]} 筆選課紀錄設為 {semester}')
+
+    @admin.action(description='清除期中與期末成績')
+    def clear_grades(self, request, queryset):
+        semesters = set(queryset.values_list('semester', flat=True))
+        updated = queryset.update(midterm_grade=None, final_grade=None, total_grade=None, version=F('version') + 1)
+        Semester.touch(semesters)
+        self.message_user(request, f'已清除 {updated} 筆成績')
+
+    @admin.action(description='移至其他課程（使用上方「目標課程代碼」欄位）')
+    def move_to_course(self, request, queryset):
+        code = request.POST.get('course_code', '').strip()
+        course = Course.objects.filter(code=code).first() if code else None
+        if course is None:
+            self.message_user(request, f'找不到課程代碼 {code}', messages.ERROR)
+            return
+        result = self._reassign(request, queryset, course_id=course.id)
+        if result:
+            # moved rows are graded under the target course's policy
+            recompute_course(course.id)
+            self._report_reassign(request, result, f'已將 {result[0]} 筆選課紀錄移至 {course.code}')
+
+
+@admin.register(ArchivedEnrollment)
+class ArchivedEnrollmentAdmin(LargeTableAdmin):
+    """Read-only: archived grades change only through ``archive_enrollments --restore``."""
+    list_display = ('student', 'course', 'semester', 'midterm_grade', 'final_grade', 'total_grade', 'archived_at')
+    list_select_related = ('student', 'course')
+    list_filter = ('semester',)
+    search_fields = ('student__username', 'course__code')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(EnrollmentRequest)
+class EnrollmentRequestAdmin(LargeTableAdmin):
+    list_display = ('id', 'student', 'course', 'action', 'status', 'message', 'created_at', 'processed_at')
+    list_select_related = ('student', 'course')
+    list_filter = ('status', 'action')
+    search_fields = ('student__username', 'course__code')
+    readonly_fields = ('created_at', 'processed_at')
+    autocomplete_fields = ('student', 'course')
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(LargeTableAdmin):
+    list_display = ('course', 'semester', 'student', 'joined_at')
+    list_select_related = ('student', 'course')
+    list_filter = ('semester',)
+    search_fields = ('student__username', 'course__code')
+    autocomplete_fields = ('student', 'course')
 
 
 @admin.register(Profile)
-class ProfileAdmin(admin.ModelAdmin):
+class ProfileAdmin(LargeTableAdmin):
     list_display = ('user', 'full_name', 'is_teacher')
+    list_select_related = ('user',)
     search_fields = ('user__username', 'full_name')
+    autocomplete_fields = ('user',)
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = ('user', 'course', 'created_at', 'updated_at')
+    list_select_related = ('user', 'course')
     search_fields = ('user__username', 'course__code', 'content')
+    autocomplete_fields = ('user', 'course')
 
 
 @admin.register(Teacher)
 class TeacherAdmin(admin.ModelAdmin):
     list_display = ('user', 'department')
-    search_fields = ('user__username', 'department')
\ No newline at end of file
+    list_select_related = ('user',)
+    search_fields = ('user__username', 'department')
+
+
+@admin.register(Semester)
+class SemesterAdmin(admin.ModelAdmin):
+    list_display = ('code', 'is_closed', 'closed_at')
+    list_filter = ('is_closed',)
+    search_fields = ('code',)
+    actions = ('rebuild_snapshots',)
+
+    @admin.action(description='重建已結束學期的報表快照（背景執行）')
+    def rebuild_snapshots(self, request, queryset):
+        from .tasks import rebuild_semester_snapshot
+        codes = list(queryset.filter(is_closed=True).values_list('code', flat=True))
+        for code in codes:
+            rebuild_semester_snapshot.delay(code)
+        self.message_user(request, f'已排入 {len(codes)} 個學期的快照重建')
+
+
+@admin.register(Task)
+class TaskAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'last_error')
+    actions = ('retry',)
+
+    @admin.action(description='重新排入佇列')
+    def retry(self, request, queryset):
+        updated = queryset.exclude(status=Task.RUNNING).update(status=Task.QUEUED, attempts=0, run_at=timezone.now())
+        self.message_user(request, f'已重新排入 {updated} 個工作')
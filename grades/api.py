@@ -0,0 +1,191 @@
+"""Read-only JSON endpoints for other campus systems.
+
+Every list endpoint takes:
+  fields  comma separated subset of the resource's fields (maps to ``.values()``)
+  limit   page size (default 100, max 1000)
+  cursor  opaque value from the previous page's ``next_cursor``
+
+Pages are keyset-paginated on ``id`` so a consumer can walk the whole table
+with constant memory on both ends, and responses carry an ETag and are
+gzip-compressed when the client accepts it.
+"""
+import base64
+import functools
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET
+
+from django.contrib.auth.models import User
+from .models import Course, Enrollment
+from .grading import semester_summary, student_average
+from .views.common import _is_teacher
+
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# public field name -> ORM lookup
+COURSE_FIELDS = {
+    'id': 'id',
+    'code': 'code',
+    'name': 'name',
+    'teacher': 'teacher__username',
+}
+ENROLLMENT_FIELDS = {
+    'id': 'id',
+    'student': 'student__username',
+    'student_id': 'student_id',
+    'course': 'course__code',
+    'course_id': 'course_id',
+    'semester': 'semester',
+    'midterm_grade': 'midterm_grade',
+    'final_grade': 'final_grade',
+    'total_grade': 'total_grade',
+}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _error(message, status):
+    return JsonResponse({'detail': message}, status=status)
+
+
+def _encode_cursor(last_id):
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(value):
+    try:
+        padded = value + '=' * (-len(value) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ApiError('cursor 無效')
+
+
+def _selected_fields(request, available):
+    raw = request.GET.get('fields', '').strip()
+    if not raw:
+        return list(available)
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in available]
+    if unknown:
+        raise ApiError(f"未知欄位: {', '.join(unknown)}")
+    return fields
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError('limit 必須為整數')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _json_response(request, payload):
+    """Serialize ``payload`` and answer 304 when the client's ETag still matches."""
+    body = json.dumps(payload, cls=DjangoJSONEncoder, ensure_ascii=False).encode('utf-8')
+    etag = quote_etag(hashlib.md5(body).hexdigest())
+    not_modified = get_conditional_response(request, etag=etag)
+    response = not_modified or HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    # responses depend on who is asking
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def _page(request, queryset, field_map):
+    """Keyset-paginate ``queryset`` on id and return only the selected fields."""
+    fields = _selected_fields(request, field_map)
+    limit = _limit(request)
+    cursor = request.GET.get('cursor')
+    qs = queryset.order_by('id')
+    if cursor:
+        qs = qs.filter(id__gt=_decode_cursor(cursor))
+    lookups = [field_map[f] for f in fields]
+    # id is always fetched so the next cursor can be computed
+    rows = list(qs.values('id', *lookups)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    results = [{f: row[field_map[f]] for f in fields} for row in rows]
+    next_cursor = _encode_cursor(rows[-1]['id']) if has_more else None
+    return {'results': results, 'next_cursor': next_cursor}
+
+
+def api_view(view):
+    """Common wrapper: GET only, gzip, and ApiError -> JSON error response."""
+    @require_GET
+    @gzip_page
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as exc:
+            return _error(str(exc), exc.status)
+    return wrapper
+
+
+@api_view
+def course_list(request):
+    """All courses (public, like the course list on the main page)."""
+    qs = Course.objects.all()
+    return _json_response(request, _page(request, qs, COURSE_FIELDS))
+
+
+@api_view
+def enrollment_list(request):
+    """Enrollments visible to the caller.
+
+    Staff see everything, teachers see their own courses' rosters and students
+    see only their own rows. Optional filters: ``course`` (id) and ``semester``.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        raise ApiError('請先登入', status=403)
+    qs = Enrollment.objects.all()
+    if not user.is_staff:
+        if _is_teacher(user):
+            qs = qs.filter(course__teacher=user) | qs.filter(student=user)
+        else:
+            qs = qs.filter(student=user)
+    course_id = request.GET.get('course')
+    if course_id:
+        if not course_id.isdigit():
+            raise ApiError('course 必須為課程 id')
+        qs = qs.filter(course_id=int(course_id))
+    semester = request.GET.get('semester')
+    if semester is not None:
+        qs = qs.filter(semester=semester)
+    return _json_response(request, _page(request, qs, ENROLLMENT_FIELDS))
+
+
+@api_view
+def student_summary(request, student_id):
+    """Per-semester averages for one student (the student themselves or staff)."""
+    user = request.user
+    if not user.is_authenticated:
+        raise ApiError('請先登入', status=403)
+    if not (user.is_staff or user.id == student_id):
+        raise ApiError('沒有權限查看此學生', status=403)
+    student = get_object_or_404(User.objects.select_related('profile'), id=student_id)
+    semesters = semester_summary(student)
+    overall = student_average(student)
+    profile = getattr(student, 'profile', None)
+    return _json_response(request, {
+        'id': student.id,
+        'username': student.username,
+        'full_name': profile.full_name if profile else '',
+        'average': overall,
+        'semesters': semesters,
+    })
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import api
+
+urlpatterns = [
+    path('courses/', api.course_list, name='api_courses'),
+    path('enrollments/', api.enrollment_list, name='api_enrollments'),
+    path('students/<int:student_id>/summary/', api.student_summary, name='api_student_summary'),
+]
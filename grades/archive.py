@@ -0,0 +1,56 @@
+"""Move enrollments of closed semesters between Enrollment and ArchivedEnrollment.
+
+Rows move in id-ordered batches; each batch is one transaction with one
+bulk_create and one DELETE, so an interrupted run leaves every row in
+exactly one table and can simply be restarted.
+"""
+from django.db import transaction
+
+from .models import ArchivedEnrollment, Enrollment
+from .throttle import enrollment_key, forget_many
+
+
+FIELDS = ('student_id', 'course_id', 'semester', 'midterm_grade', 'final_grade', 'total_grade')
+
+
+def _move(source, target, semester, batch_size):
+    """Move ``semester``'s rows from ``source`` to ``target``; returns (moved, skipped).
+
+    A row whose (student, course, semester) already exists in ``target`` is
+    left where it is and counted as skipped.
+    """
+    moved = skipped = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                source.objects.filter(semester=semester, id__gt=last_id)
+                .order_by('id').values('id', *FIELDS)[:batch_size]
+            )
+            if not batch:
+                return moved, skipped
+            last_id = batch[-1]['id']
+            taken = set(
+                target.objects.filter(
+                    semester=semester,
+                    student_id__in={row['student_id'] for row in batch},
+                    course_id__in={row['course_id'] for row in batch},
+                ).values_list('student_id', 'course_id')
+            )
+            rows = [row for row in batch if (row['student_id'], row['course_id']) not in taken]
+            target.objects.bulk_create([target(**{f: row[f] for f in FIELDS}) for row in rows])
+            source.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        # bulk writes send no signals: drop cached enroll/drop outcomes of the moved pairs
+        forget_many(enrollment_key(row['student_id'], row['course_id']) for row in rows)
+        moved += len(rows)
+        skipped += len(batch) - len(rows)
+
+
+def archive_semester(semester, batch_size=2000):
+    """Move a (closed) semester's enrollments into ArchivedEnrollment; returns (moved, skipped)."""
+    return _move(Enrollment, ArchivedEnrollment, semester, batch_size)
+
+
+def restore_semester(semester, batch_size=2000):
+    """Move a semester's archived rows back into Enrollment, e.g. to correct grades; returns (moved, skipped)."""
+    return _move(ArchivedEnrollment, Enrollment, semester, batch_size)
@@ -0,0 +1,276 @@
+import csv
+import io
+import re
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import (
+    ArchivedEnrollment, Course, CourseSlot, Enrollment, EnrollmentRequest, PrerequisiteClosure, Semester, WaitlistEntry,
+)
+
+
+def parse_usernames(text):
+    """Split free text (commas, whitespace or newlines) into unique usernames, keeping order."""
+    seen = {}
+    for name in re.split(r'[\s,;]+', text or ''):
+        if name:
+            seen.setdefault(name, None)
+    return list(seen)
+
+
+def read_usernames_csv(fileobj):
+    """Read usernames from the first column of a CSV file; a ``username`` header row is skipped."""
+    data = fileobj.read()
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    names = []
+    for row in csv.reader(io.StringIO(data)):
+        if not row or not row[0].strip():
+            continue
+        name = row[0].strip()
+        if not names and name.lower() == 'username':
+            continue
+        names.append(name)
+    return parse_usernames(' '.join(names))
+
+
+def bulk_enroll(course, usernames, semester=''):
+    """Enroll many students in ``course`` in one transaction.
+
+    Users are resolved with a single query and existing enrollments are
+    skipped; the remainder is inserted with one ``bulk_create``. Returns a
+    dict of username lists: ``inserted``, ``skipped`` and ``unknown``.
+    """
+    if not isinstance(usernames, str):
+        usernames = ' '.join(usernames)
+    from .throttle import enrollment_key, forget_many
+
+    usernames = parse_usernames(usernames)
+    with transaction.atomic():
+        users = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+        existing = set(
+            Enrollment.objects.filter(course=course, semester=semester, student_id__in=users.values())
+            .values_list('student__username', flat=True)
+        )
+        to_insert = [name for name in usernames if name in users and name not in existing]
+        Enrollment.objects.bulk_create(
+            [Enrollment(student_id=users[name], course=course, semester=semester) for name in to_insert],
+            ignore_conflicts=True,
+        )
+        if to_insert:
+            Semester.touch([semester])
+    # bulk writes send no signals, so drop replayed outcomes here
+    forget_many(enrollment_key(users[name], course.id) for name in to_insert)
+    return {
+        'inserted': to_insert,
+        'skipped': [name for name in usernames if name in existing],
+        'unknown': [name for name in usernames if name not in users],
+    }
+
+
+# Rush mode (GRADES_RUSH_MODE): views only append an EnrollmentRequest, and the
+# process_enrollment_queue worker applies them in batched transactions, so
+# the database sees one writer instead of one lock per click.
+
+def enqueue_request(student, course, action, semester='', override=False):
+    """Queue an enroll/drop; ``override`` skips the prerequisite and timetable checks at apply time."""
+    return EnrollmentRequest.objects.create(
+        student=student, course=course, action=action, semester=semester, override=override,
+    )
+
+
+def _missing_prerequisites(students, course_ids):
+    """``{(student id, course id): [codes still to pass, nearest first]}`` for the batch, in three queries."""
+    closure = list(
+        PrerequisiteClosure.objects.filter(course_id__in=course_ids)
+        .order_by('depth', 'required__code').values_list('course_id', 'required_id', 'required__code')
+    )
+    if not closure:
+        return {}
+    required = {r for _, r, _ in closure}
+    passed = set()
+    for model in (Enrollment, ArchivedEnrollment):
+        passed |= set(
+            model.objects.filter(
+                student_id__in=students, course_id__in=required, final_grade__gte=settings.GRADES_PASS_GRADE,
+            ).values_list('student_id', 'course_id')
+        )
+    missing = {}
+    for s in students:
+        for c, r, code in closure:
+            if (s, r) not in passed:
+                missing.setdefault((s, c), []).append(code)
+    return missing
+
+
+def _clashing(slots, course_id, timetable):
+    """Slots of the courses in ``timetable`` overlapping one of ``course_id``'s, in weekday order."""
+    wanted = slots.get(course_id, [])
+    return sorted(
+        (
+            slot for other in timetable if other != course_id for slot in slots.get(other, [])
+            if any(
+                slot.weekday == mine.weekday and slot.start_time < mine.end_time and slot.end_time > mine.start_time
+                for mine in wanted
+            )
+        ),
+        key=lambda slot: (slot.weekday, slot.start_time),
+    )
+
+
+def next_request_batch(batch_size):
+    """The next pending requests, oldest first within a course and round-robin across courses.
+
+    Every course with pending requests gets its first request into the batch
+    before any course gets its second, so one oversubscribed course cannot
+    starve the others.
+    """
+    turn = Window(RowNumber(), partition_by=[F('course_id')], order_by=F('id').asc())
+    return list(
+        EnrollmentRequest.objects.filter(status=EnrollmentRequest.PENDING)
+        .annotate(turn=turn)
+        .order_by('turn', 'id')[:batch_size]
+    )
+
+
+def apply_enrollment_requests(requests):
+    """Apply a batch of requests in one transaction; returns {status: count}.
+
+    Requests are replayed in id order against the current enrollments, so an
+    enroll followed by a drop of the same course ends up dropped. Enrolls in
+    a full course (or one that already has a line) join its waitlist, and
+    drops of a waitlisted course leave it. Only the net changes are written:
+    one bulk_create and one delete each for enrollments and waitlist entries,
+    and one bulk_update of the request rows. Courses that lost students get a
+    waitlist promotion once the batch commits.
+
+    Enrolls are checked again as they are applied, since grades and
+    timetables may have changed since the request was queued: a student
+    missing a prerequisite, or whose timetable (including the enrolls and
+    drops earlier in the batch) clashes with the course, is rejected with
+    the message the direct path gives, unless the request has ``override``.
+    Passed courses and slots are loaded once per batch.
+    """
+    from .throttle import enrollment_key, forget_many
+    from .timetable import describe
+    from .waitlist import seats_freed
+
+    if not requests:
+        return {}
+    now = timezone.now()
+    students = {r.student_id for r in requests}
+    course_ids = {r.course_id for r in requests}
+    with transaction.atomic():
+        enrolled = set(Enrollment.objects.filter(student_id__in=students).values_list('student_id', 'course_id', 'semester'))
+        existing = {e for e in enrolled if e[1] in course_ids}
+        present = set(existing)
+        checked = [r for r in requests if r.action == 'enroll' and not r.override]
+        missing = _missing_prerequisites({r.student_id for r in checked}, {r.course_id for r in checked})
+        # each student's courses per semester, kept current as the batch is replayed
+        timetables = {}
+        for s, c, sem in enrolled:
+            timetables.setdefault((s, sem), set()).add(c)
+        slots = {}
+        if checked:
+            for slot in CourseSlot.objects.filter(course_id__in={c for _, c, _ in enrolled} | course_ids).select_related('course'):
+                slots.setdefault(slot.course_id, []).append(slot)
+        codes, capacity = {}, {}
+        for course_id, code, cap in Course.objects.filter(id__in=course_ids).values_list('id', 'code', 'capacity'):
+            codes[course_id] = code
+            if cap is not None:
+                capacity[course_id] = cap
+        taken = {
+            (row['course_id'], row['semester']): row['n']
+            for row in Enrollment.objects.filter(course_id__in=capacity).values('course_id', 'semester').annotate(n=Count('id'))
+        }
+        lines = set(WaitlistEntry.objects.filter(course_id__in=course_ids).values_list('course_id', 'semester').distinct())
+        waiting_before = set(
+            WaitlistEntry.objects.filter(student_id__in=students, course_id__in=course_ids)
+            .values_list('student_id', 'course_id', 'semester')
+        )
+        # a list, so new entries get ids (their place in line) in request order
+        waiting = sorted(waiting_before)
+        for r in sorted(requests, key=lambda r: r.id):
+            pair = (r.student_id, r.course_id, r.semester)
+            seat = (r.course_id, r.semester)
+            timetable = timetables.setdefault((r.student_id, r.semester), set())
+            refusal = None
+            if r.action == 'enroll' and not r.override and pair not in present:
+                if (r.student_id, r.course_id) in missing:
+                    refusal = f"尚未通過 {codes[r.course_id]} 的先修課程：{'、'.join(missing[r.student_id, r.course_id])}"
+                elif clashing := _clashing(slots, r.course_id, timetable):
+                    refusal = f"{codes[r.course_id]} 與已選課程上課時間衝突：{describe(clashing)}"
+            if refusal:
+                r.status, r.message = EnrollmentRequest.REJECTED, refusal[:200]
+            elif r.action == 'enroll':
+                if pair in present:
+                    r.status, r.message = EnrollmentRequest.DONE, '已在課程中'
+                elif pair in waiting or seat in lines or (
+                    r.course_id in capacity and taken.get(seat, 0) >= capacity[r.course_id]
+                ):
+                    r.status, r.message = EnrollmentRequest.DONE, '已額滿，已加入候補名單'
+                    if pair not in waiting:
+                        waiting.append(pair)
+                    lines.add(seat)
+                else:
+                    r.status, r.message = EnrollmentRequest.DONE, '已加選'
+                    present.add(pair)
+                    timetable.add(r.course_id)
+                    taken[seat] = taken.get(seat, 0) + 1
+            elif pair in present:
+                r.status, r.message = EnrollmentRequest.DONE, '已退選'
+                present.discard(pair)
+                timetable.discard(r.course_id)
+                taken[seat] = taken.get(seat, 0) - 1
+            elif pair in waiting:
+                r.status, r.message = EnrollmentRequest.DONE, '已取消候補'
+                waiting.remove(pair)
+            else:
+                r.status, r.message = EnrollmentRequest.REJECTED, '未修習此課程'
+            r.processed_at = now
+
+        created = present - existing
+        Enrollment.objects.bulk_create(
+            [Enrollment(student_id=s, course_id=c, semester=sem) for s, c, sem in created],
+            ignore_conflicts=True,
+        )
+        dropped = {}
+        for s, c, sem in existing - present:
+            dropped.setdefault((c, sem), []).append(s)
+        for (c, sem), dropped_students in dropped.items():
+            Enrollment.objects.filter(course_id=c, semester=sem, student_id__in=dropped_students).delete()
+        WaitlistEntry.objects.bulk_create(
+            [
+                WaitlistEntry(student_id=s, course_id=c, semester=sem, joined_at=now)
+                for s, c, sem in waiting if (s, c, sem) not in waiting_before
+            ],
+            ignore_conflicts=True,
+        )
+        left = waiting_before - set(waiting)
+        for s, c, sem in left:
+            WaitlistEntry.objects.filter(student_id=s, course_id=c, semester=sem).delete()
+        EnrollmentRequest.objects.bulk_update(requests, ['status', 'message', 'processed_at'])
+        Semester.touch({sem for s, c, sem in created} | {sem for c, sem in dropped})
+        for c, sem in dropped:
+            seats_freed(c, sem)
+
+    # bulk writes send no signals, so drop replayed outcomes here
+    forget_many(enrollment_key(s, c) for s, c, sem in created | (existing - present))
+    counts = {}
+    for r in requests:
+        counts[r.status] = counts.get(r.status, 0) + 1
+    return counts
+
+
+def queue_position(req):
+    """How many pending requests for the same course are ahead of ``req`` (0 once processed)."""
+    if req.status != EnrollmentRequest.PENDING:
+        return 0
+    return EnrollmentRequest.objects.filter(
+        status=EnrollmentRequest.PENDING, course_id=req.course_id, id__lt=req.id,
+    ).count()
@@ -1,9 +1,12 @@
+import csv
+
 from django import forms
 from django.contrib.auth.models import User, Group
 from django.contrib.auth.forms import UserCreationForm
 from .models import Profile, Teacher
 
-from .models import Comment
+from .models import Comment, Course
+from .enrollment import parse_usernames, read_usernames_csv
 
 
 class CommentForm(forms.ModelForm):
@@ -15,6 +18,17 @@ class CommentForm(forms.ModelForm):
         }
 
 
+class CourseForm(forms.ModelForm):
+    class Meta:
+        model = Course
+        fields = ['name', 'code', 'teacher']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # restrict instructor choices to users marked as teachers
+        self.fields['teacher'].queryset = User.objects.filter(profile__is_teacher=True)
+
+
 class UserRegistrationForm(UserCreationForm):
     email = forms.EmailField(required=False)
 
@@ -103,3 +117,28 @@ class CreateTeacherForm(UserCreationForm):
             # Create Teacher model instance
             Teacher.objects.get_or_create(user=user, defaults={'department': ''})
         return user
+
+
+class BulkEnrollForm(forms.Form):
+    """Staff/teacher form to enroll a whole cohort from pasted usernames and/or a CSV file."""
+    usernames = forms.CharField(
+        required=False,
+        label='學生帳號',
+        widget=forms.Textarea(attrs={'rows': 8, 'class': 'form-control', 'placeholder': '每行一個帳號，或以逗號分隔'}),
+    )
+    csv_file = forms.FileField(required=False, label='CSV 檔案（第一欄為帳號）')
+    semester = forms.CharField(max_length=20, required=False, label='學期',
+                               widget=forms.TextInput(attrs={'class': 'form-control'}))
+
+    def clean(self):
+        cleaned = super().clean()
+        names = parse_usernames(cleaned.get('usernames', ''))
+        if cleaned.get('csv_file'):
+            try:
+                names = parse_usernames(' '.join(names + read_usernames_csv(cleaned['csv_file'])))
+            except (UnicodeDecodeError, csv.Error):
+                raise forms.ValidationError({'csv_file': '無法讀取 CSV 檔案，請確認為 UTF-8 編碼的 CSV'})
+        if not names:
+            raise forms.ValidationError('請輸入至少一個學生帳號或上傳 CSV 檔案')
+        cleaned['username_list'] = names
+        return cleaned
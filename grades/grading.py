@@ -0,0 +1,142 @@
+"""Grade computation.
+
+An enrollment's total is ``(midterm * w_mid + final * w_final) * scale + curve``
+under its course's GradingPolicy (GradingPolicy defaults when the course has
+none). Totals are stored on ``Enrollment.total_grade``: single rows are updated
+in ``Enrollment.save()``, whole courses or semesters with one UPDATE per course
+here, and every average shown to users is an average of stored totals.
+Student averages also read ArchivedEnrollment, so archiving a closed
+semester (grades.archive) does not change them.
+"""
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum, Value
+from django.db.models.functions import Round
+
+from .models import ArchivedEnrollment, Course, Enrollment, GradingPolicy, Semester
+
+
+class GradeError(ValueError):
+    """A submitted grade that cannot be stored; the message follows the field label (期中/期末)."""
+
+
+def parse_grade(raw):
+    """A submitted midterm/final grade as stored (2 decimal places), or None when blank.
+
+    Raises GradeError for anything that is not a finite number between 0 and
+    GRADES_MAX_GRADE, so no NaN, infinity or value too large for the column
+    reaches the database.
+    """
+    if raw is None or isinstance(raw, str) and not raw.strip():
+        return None
+    try:
+        value = Decimal(str(raw).strip())
+    except (InvalidOperation, ValueError):
+        raise GradeError('成績格式錯誤')
+    if not value.is_finite():
+        raise GradeError('成績格式錯誤')
+    if value < 0:
+        raise GradeError('成績不得為負數')
+    if value > settings.GRADES_MAX_GRADE:
+        raise GradeError(f'成績不得超過 {settings.GRADES_MAX_GRADE}')
+    return value.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def _decimal(value):
+    return Value(value, output_field=DecimalField(max_digits=9, decimal_places=3))
+
+
+def total_expression(policy):
+    """SQL expression for the total of every row under ``policy`` (NULL if a score is missing)."""
+    weighted = F('midterm_grade') * _decimal(policy.midterm_weight) + F('final_grade') * _decimal(policy.final_weight)
+    return Round(weighted * _decimal(policy.scale) + _decimal(policy.curve), 2,
+                 output_field=DecimalField(max_digits=9, decimal_places=2))
+
+
+def policy_for(course_id):
+    return GradingPolicy.objects.filter(course_id=course_id).first() or GradingPolicy()
+
+
+def recompute_course(course_id):
+    """Recompute stored totals for one course with a single UPDATE. Returns rows updated."""
+    rows = Enrollment.objects.filter(course_id=course_id)
+    updated = rows.update(total_grade=total_expression(policy_for(course_id)))
+    Semester.touch(rows.values('semester'))
+    return updated
+
+
+def recompute_semester(semester):
+    """Recompute stored totals for every course that has enrollments in ``semester``."""
+    policies = {p.course_id: p for p in GradingPolicy.objects.filter(course__enrollments__semester=semester).distinct()}
+    course_ids = Course.objects.filter(enrollments__semester=semester).values_list('id', flat=True).distinct()
+    updated = 0
+    with transaction.atomic():
+        for course_id in course_ids:
+            expr = total_expression(policies.get(course_id) or GradingPolicy())
+            updated += Enrollment.objects.filter(course_id=course_id, semester=semester).update(total_grade=expr)
+        Semester.touch([semester])
+    return updated
+
+
+def rounded(value):
+    """Round an aggregated average for display (None stays None)."""
+    return None if value is None else round(float(value), 2)
+
+
+def _semester_totals(user, semester=None):
+    """``{semester: [sum of totals, graded rows, rows]}`` over live and archived enrollments."""
+    totals = {}
+    for model in (Enrollment, ArchivedEnrollment):
+        qs = model.objects.filter(student=user)
+        if semester is not None:
+            qs = qs.filter(semester=semester)
+        rows = qs.values('semester').annotate(total=Sum('total_grade'), graded=Count('total_grade'), n=Count('id'))
+        for row in rows:
+            acc = totals.setdefault(row['semester'], [0, 0, 0])
+            acc[0] += row['total'] or 0
+            acc[1] += row['graded']
+            acc[2] += row['n']
+    return totals
+
+
+def _average(total, graded):
+    return rounded(total / graded) if graded else None
+
+
+def student_average(user, semester=None):
+    """Average of the student's course totals (archived semesters included), optionally for one semester."""
+    totals = _semester_totals(user, semester).values()
+    return _average(sum(t[0] for t in totals), sum(t[1] for t in totals))
+
+
+def student_averages(students):
+    """``{student id: average}`` for a queryset of users, archived enrollments included.
+
+    One grouped query per table, for listings of many students.
+    """
+    totals = {}
+    for model in (Enrollment, ArchivedEnrollment):
+        rows = (
+            model.objects.filter(student__in=students)
+            .values('student_id').annotate(total=Sum('total_grade'), graded=Count('total_grade'))
+        )
+        for row in rows:
+            acc = totals.setdefault(row['student_id'], [0, 0])
+            acc[0] += row['total'] or 0
+            acc[1] += row['graded']
+    return {student_id: _average(total, graded) for student_id, (total, graded) in totals.items()}
+
+
+def semester_averages(user):
+    """``{semester: average}`` for every semester the student has enrollments in, archived ones included."""
+    return {sem: _average(total, graded) for sem, (total, graded, n) in _semester_totals(user).items()}
+
+
+def semester_summary(user):
+    """Per-semester ``{'semester', 'courses', 'average'}`` rows, oldest first, archived semesters included."""
+    return [
+        {'semester': sem, 'courses': n, 'average': _average(total, graded)}
+        for sem, (total, graded, n) in sorted(_semester_totals(user).items())
+    ]
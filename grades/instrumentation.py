@@ -0,0 +1,54 @@
+import time
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+
+
+WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` callable that counts and times queries.
+
+    Keeps running totals so the same instance can be reused across several
+    requests; call ``reset()`` between measurements.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.queries = 0
+        self.writes = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.queries += 1
+            if sql.lstrip().upper().startswith(WRITE_PREFIXES):
+                self.writes += 1
+
+
+@contextmanager
+def record_queries(using=None):
+    """Record every query run on the connection while the block executes."""
+    conn = connection if using is None else transaction.get_connection(using)
+    recorder = QueryRecorder()
+    with conn.execute_wrapper(recorder):
+        yield recorder
+
+
+@contextmanager
+def rollback_sandbox(using=None):
+    """Run the block in a transaction that is always rolled back.
+
+    Used by the benchmark commands so they can drive real views against the
+    configured database without leaving rows behind.
+    """
+    with transaction.atomic(using=using):
+        yield
+        transaction.set_rollback(True, using=using)
@@ -0,0 +1,62 @@
+"""Precomputed rows for the long listing pages (main, course detail, transcript).
+
+The views fetch plain dicts with ``.values()`` and these functions shape
+them into exactly what the templates print, so rendering a row is a few
+dictionary lookups: no model instances, no related-object traversal and no
+chance of a lazy query per row. ``manage.py bench_templates`` feeds the same
+functions with generated rows.
+"""
+from django.db.models import F
+
+from .grading import rounded
+
+
+# .values() arguments of one transcript row, shared by Enrollment and ArchivedEnrollment
+TRANSCRIPT_FIELDS = ('id', 'semester', 'course_id', 'midterm_grade', 'final_grade', 'total_grade')
+TRANSCRIPT_ALIASES = {
+    'course_code': F('course__code'),
+    'course_name': F('course__name'),
+    'teacher_name': F('course__teacher__username'),
+}
+
+
+def student_rows(students, enrollments):
+    """Staff overview on the main page: one row per student with their enrollments.
+
+    ``students`` are ``{id, username, avg}`` dicts in display order and
+    ``enrollments`` ``{id, student_id, course_code, course_name, midterm_grade,
+    final_grade}`` dicts.
+    """
+    by_student = {}
+    for enrollment in enrollments:
+        by_student.setdefault(enrollment['student_id'], []).append(enrollment)
+    return [{
+        'student_id': student['id'],
+        'username': student['username'],
+        'avg': rounded(student['avg']),
+        'enrollments': by_student.get(student['id'], []),
+    } for student in students]
+
+
+def roster_rows(enrollments, viewer_id, can_manage):
+    """Course page roster; ``visible`` says whether the viewer may see the row's grades."""
+    for enrollment in enrollments:
+        enrollment['visible'] = can_manage or enrollment['student_id'] == viewer_id
+    return enrollments
+
+
+def comment_rows(comments, viewer_id, is_staff):
+    for comment in comments:
+        comment['editable'] = is_staff or comment['user_id'] == viewer_id
+    return comments
+
+
+def semester_groups(rows, averages):
+    """Transcript rows grouped by semester, oldest first, each with its average."""
+    groups = {}
+    for row in rows:
+        groups.setdefault(row['semester'], []).append(row)
+    return [
+        {'semester': semester, 'average': averages.get(semester), 'rows': groups[semester]}
+        for semester in sorted(groups)
+    ]
@@ -0,0 +1,396 @@
+"""Replay request streams against the app and summarise latency per endpoint.
+
+A stream is the ordered list of requests of one simulated user. Streams come
+either from a recording or from the role-weighted synthetic mix in ``MIX``;
+``run`` logs each stream's user in and replays it on its own session, with up
+to ``concurrency`` streams in flight at once.
+
+Recorded streams are JSON lines, one request per line::
+
+    {"user": "student:3", "method": "POST", "path": "/enroll_course/",
+     "data": {"course_id": 12, "action": "enroll"}, "at": 1.25}
+
+``user`` is ``<role>:<n>`` and picks the n-th seeded load account of that role
+(see ``seed_accounts``); lines of one user are replayed in file order.
+``at`` is the offset in seconds from the start of the recording and is only
+honoured when replaying with a speed factor. ``replay_load --save-stream``
+writes the synthetic mix in this format.
+
+Two targets are supported: ``ClientSession`` drives the views in-process with
+the test client and counts the queries of every request; ``HttpSession``
+talks to a running server over HTTP and takes query counts from the
+Server-Timing header when the server runs with GRADES_TIMING.
+"""
+import http.cookiejar
+import json
+import math
+import re
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import Client
+from django.urls import Resolver404, resolve, reverse
+
+from .instrumentation import record_queries
+from .models import Course, Enrollment, Profile
+
+
+ROLES = ('student', 'teacher', 'staff')
+USERNAME_PREFIX = 'load_'
+COURSE_PREFIX = 'LOAD'
+# teacher-less courses the student mix enrolls in and drops, so drops never
+# remove the rows the teachers' grade writes target
+ELECTIVE_PREFIX = f'{COURSE_PREFIX}E'
+
+# (weight, url name) per role; the request for each name is built by ROUTES
+MIX = {
+    'student': [
+        (30, 'student_courses'), (15, 'main'), (15, 'available_courses'), (20, 'enroll_course'),
+        (10, 'course_detail'), (5, 'semester_average'), (5, 'api_student_summary'),
+    ],
+    'teacher': [(40, 'teacher_courses'), (35, 'teacher_course_students'), (25, 'update_enrollment_grade')],
+    'staff': [(40, 'main'), (30, 'semester_report'), (30, 'api_enrollments')],
+}
+
+
+class Account:
+    def __init__(self, role, username, user_id, courses=(), enrollments=()):
+        self.role = role
+        self.username = username
+        self.user_id = user_id
+        self.courses = list(courses)          # taught courses (teachers)
+        self.enrollments = list(enrollments)  # enrollment ids in those courses (teachers)
+
+
+class World:
+    """Ids the synthetic mix picks from, loaded once before the run."""
+
+    def __init__(self, accounts, semester):
+        self.accounts = accounts
+        self.semester = semester
+        self.courses = list(Course.objects.order_by('id').values_list('id', flat=True)[:500])
+        self.electives = list(Course.objects.filter(code__startswith=ELECTIVE_PREFIX).order_by('id').values_list('id', flat=True))
+
+
+def seed_accounts(students, teachers, staff, password, semester, courses_per_student=3, electives=3):
+    """Create any missing load accounts and return ``{role: [Account, ...]}``.
+
+    Each teacher gets one course and each student is enrolled in
+    ``courses_per_student`` of them, so every page has rows to render. The
+    student mix enrolls in and drops ``electives`` separate courses, which
+    keeps the teachers' graded rows in place for the whole run. All accounts
+    share one password hash, which keeps seeding fast.
+    """
+    hashed = make_password(password)
+    wanted = {'student': students, 'teacher': teachers, 'staff': staff}
+    users = {}
+    for role, count in wanted.items():
+        users[role] = []
+        for i in range(count):
+            user, created = User.objects.get_or_create(
+                username=f'{USERNAME_PREFIX}{role}_{i}', defaults={'password': hashed, 'is_staff': role == 'staff'},
+            )
+            if created and role == 'teacher':
+                Profile.objects.filter(user=user).update(is_teacher=True)
+            users[role].append(user)
+
+    courses = []
+    for i, teacher in enumerate(users['teacher']):
+        course, _ = Course.objects.get_or_create(
+            code=f'{COURSE_PREFIX}{i:03}', defaults={'name': f'Load Test Course {i}', 'teacher': teacher},
+        )
+        courses.append(course)
+    for i in range(electives):
+        Course.objects.get_or_create(code=f'{ELECTIVE_PREFIX}{i:03}', defaults={'name': f'Load Test Elective {i}'})
+    if courses:
+        Enrollment.objects.bulk_create([
+            Enrollment(student=student, course=courses[(i + k) % len(courses)], semester=semester)
+            for i, student in enumerate(users['student'])
+            for k in range(min(courses_per_student, len(courses)))
+        ], ignore_conflicts=True)
+
+    taught = {}
+    for course_id, teacher_id in Course.objects.filter(id__in=[c.id for c in courses]).values_list('id', 'teacher_id'):
+        taught.setdefault(teacher_id, []).append(course_id)
+    graded = {}
+    for enrollment_id, course_id in Enrollment.objects.filter(course_id__in=[c.id for c in courses]).values_list('id', 'course_id'):
+        graded.setdefault(course_id, []).append(enrollment_id)
+
+    accounts = {}
+    for role, role_users in users.items():
+        accounts[role] = []
+        for user in role_users:
+            own = taught.get(user.id, [])
+            accounts[role].append(Account(
+                role, user.username, user.id, own, [e for course_id in own for e in graded.get(course_id, [])],
+            ))
+    return accounts
+
+
+def remove_accounts():
+    """Delete the load accounts and courses (their enrollments cascade); returns the number of users removed."""
+    Course.objects.filter(code__startswith=COURSE_PREFIX).delete()
+    return User.objects.filter(username__startswith=USERNAME_PREFIX).delete()[1].get('auth.User', 0)
+
+
+def _course(account, world, rng):
+    return reverse('course_detail', args=[rng.choice(world.courses)]), {}
+
+
+def _enroll(account, world, rng):
+    return reverse('enroll_course'), {'course_id': rng.choice(world.electives), 'action': rng.choice(('enroll', 'drop'))}
+
+
+def _own_course(account, world, rng):
+    return reverse('teacher_course_students', args=[rng.choice(account.courses)]), {}
+
+
+def _grade(account, world, rng):
+    data = {'midterm_grade': rng.randint(40, 100), 'final_grade': rng.randint(40, 100)}
+    return reverse('update_enrollment_grade', args=[rng.choice(account.enrollments)]), data
+
+
+ROUTES = {
+    'course_detail': _course,
+    'enroll_course': _enroll,
+    'teacher_course_students': _own_course,
+    'update_enrollment_grade': _grade,
+    'semester_average': lambda account, world, rng: (reverse('semester_average', args=[world.semester]), {}),
+    'semester_report': lambda account, world, rng: (reverse('semester_report', args=[world.semester]), {}),
+    'api_student_summary': lambda account, world, rng: (reverse('api_student_summary', args=[account.user_id]), {}),
+}
+POSTS = {'enroll_course', 'update_enrollment_grade'}
+
+
+def synthetic_streams(world, users, requests, role_weights, rng):
+    """Return ``users`` streams of ``requests`` steps each, roles drawn by ``role_weights``.
+
+    A step is ``(method, path, data, at)``; synthetic steps have no ``at``.
+    """
+    roles = [role for role in ROLES if role_weights.get(role) and world.accounts.get(role)]
+    if not roles:
+        raise ValueError('no seeded accounts for the requested roles')
+    used = dict.fromkeys(roles, 0)
+    streams = []
+    for _ in range(users):
+        role = rng.choices(roles, weights=[role_weights[r] for r in roles])[0]
+        account = world.accounts[role][used[role] % len(world.accounts[role])]
+        used[role] += 1
+        names = [name for _, name in MIX[role]
+                 if not (name == 'teacher_course_students' and not account.courses)
+                 and not (name == 'update_enrollment_grade' and not account.enrollments)
+                 and not (name == 'course_detail' and not world.courses)
+                 and not (name == 'enroll_course' and not world.electives)]
+        weights = [weight for weight, name in MIX[role] if name in names]
+        steps = []
+        for name in rng.choices(names, weights=weights, k=requests):
+            build = ROUTES.get(name)
+            path, data = build(account, world, rng) if build else (reverse(name), {})
+            steps.append(('POST' if name in POSTS else 'GET', path, data, None))
+        streams.append((account, steps))
+    return streams
+
+
+def read_streams(lines, accounts):
+    """Group recorded JSON lines into per-user streams, in order of first appearance."""
+    streams = {}
+    for lineno, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            role, _, index = record['user'].partition(':')
+            account = accounts[role][int(index or 0)]
+            step = (record.get('method', 'GET').upper(), record['path'], record.get('data') or {}, record.get('at'))
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError) as exc:
+            raise ValueError(f'line {lineno}: {exc!r}') from exc
+        streams.setdefault(record['user'], (account, []))[1].append(step)
+    return list(streams.values())
+
+
+def write_streams(streams, accounts, fh):
+    """Write streams as recorded JSON lines (the format ``read_streams`` reads)."""
+    index = {account.username: f'{role}:{i}' for role, role_accounts in accounts.items() for i, account in enumerate(role_accounts)}
+    for account, steps in streams:
+        for method, path, data, at in steps:
+            record = {'user': index[account.username], 'method': method, 'path': path, 'data': data}
+            if at is not None:
+                record['at'] = at
+            fh.write(json.dumps(record) + '\n')
+
+
+def endpoint(path):
+    """Label for per-endpoint stats: the URL name, else the path itself."""
+    try:
+        return resolve(urllib.parse.urlsplit(path).path).url_name or path
+    except Resolver404:
+        return path
+
+
+class ClientSession:
+    """In-process session on the test client; reports the queries of each request."""
+
+    def __init__(self):
+        self.client = Client(raise_request_exception=False)
+
+    def login(self, username, password):
+        return self.request('POST', reverse('login'), {'username': username, 'password': password})
+
+    def request(self, method, path, data):
+        send = getattr(self.client, method.lower())
+        args = (path, data) if method in ('GET', 'POST') else (path, json.dumps(data), 'application/json')
+        with record_queries() as recorder:
+            start = time.perf_counter()
+            response = send(*args)
+            elapsed = time.perf_counter() - start
+        return response.status_code, elapsed, recorder.queries
+
+    def close(self):
+        connections.close_all()
+
+
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def _server_timing_queries(headers):
+    match = SERVER_TIMING_QUERIES.search(headers.get('Server-Timing') or '')
+    return int(match.group(1)) if match else None
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    """Session against a running server; redirects are not followed, so each request is timed alone."""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+
+    def _csrf_token(self):
+        return next((c.value for c in self.cookies if c.name == 'csrftoken'), '')
+
+    def login(self, username, password):
+        # the login form sets the CSRF cookie
+        self.request('GET', reverse('login'), {})
+        return self.request('POST', reverse('login'), {
+            'username': username, 'password': password, 'csrfmiddlewaretoken': self._csrf_token(),
+        })
+
+    def request(self, method, path, data):
+        url = self.base_url + path
+        headers = {'Referer': url}
+        body = None
+        if method == 'GET':
+            if data:
+                url += ('&' if '?' in url else '?') + urllib.parse.urlencode(data)
+        else:
+            headers['X-CSRFToken'] = self._csrf_token()
+            if method == 'POST':
+                body = urllib.parse.urlencode(data).encode()
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            else:
+                body = json.dumps(data).encode()
+                headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(url, data=body, method=method, headers=headers)
+        start = time.perf_counter()
+        queries = None
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                response.read()
+                status, queries = response.status, _server_timing_queries(response.headers)
+        except urllib.error.HTTPError as exc:
+            status, queries = exc.code, _server_timing_queries(exc.headers)
+        except (urllib.error.URLError, OSError):
+            status = 0
+        return status, time.perf_counter() - start, queries
+
+    def close(self):
+        pass
+
+
+def _replay(stream, session_factory, password, started, speed):
+    account, steps = stream
+    session = session_factory()
+    samples = []
+    try:
+        status, elapsed, queries = session.login(account.username, password)
+        # a failed login re-renders the form with 200
+        samples.append(('login', status if status == 302 else 401, elapsed, queries))
+        for method, path, data, at in steps:
+            if speed and at is not None:
+                delay = started + at / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            status, elapsed, queries = session.request(method, path, data)
+            samples.append((endpoint(path), status, elapsed, queries))
+    finally:
+        session.close()
+    return samples
+
+
+def run(streams, session_factory, password, concurrency=8, speed=None):
+    """Replay ``streams``; returns (samples, wall seconds).
+
+    A sample is ``(endpoint, status, seconds, queries)``; status 0 means the
+    request failed without a response, queries is None when unknown.
+    """
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = pool.map(lambda stream: _replay(stream, session_factory, password, started, speed), streams)
+        samples = [sample for stream_samples in results for sample in stream_samples]
+    return samples, time.perf_counter() - started
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(pct * len(values) / 100) - 1))]
+
+
+def summarise(samples, wall):
+    """Per-endpoint rows sorted by request count, plus a totals row."""
+    grouped = {}
+    for name, status, seconds, queries in samples:
+        grouped.setdefault(name, []).append((status, seconds, queries))
+
+    def row(name, entries):
+        latencies = sorted(seconds for _, seconds, _ in entries)
+        counted = [queries for _, _, queries in entries if queries is not None]
+        return {
+            'endpoint': name,
+            'requests': len(entries),
+            'rate': len(entries) / wall if wall else 0.0,
+            'errors': sum(1 for status, _, _ in entries if status == 0 or status >= 400),
+            'throttled': sum(1 for status, _, _ in entries if status == 429),
+            'p50': percentile(latencies, 50) * 1000,
+            'p95': percentile(latencies, 95) * 1000,
+            'p99': percentile(latencies, 99) * 1000,
+            'queries': sum(counted) / len(counted) if counted else None,
+        }
+
+    rows = sorted((row(name, entries) for name, entries in grouped.items()), key=lambda r: -r['requests'])
+    total = row('TOTAL', [entry for entries in grouped.values() for entry in entries])
+    return rows, total
+
+
+def parse_weights(text):
+    """``student=85,teacher=10,staff=5`` -> dict; unknown roles raise ValueError."""
+    weights = {}
+    for part in filter(None, text.split(',')):
+        role, _, weight = part.partition('=')
+        if role.strip() not in ROLES:
+            raise ValueError(f'unknown role {role!r}')
+        weights[role.strip()] = float(weight)
+    return weights
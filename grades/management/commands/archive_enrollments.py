@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from grades.archive import archive_semester, restore_semester
+from grades.models import Semester
+
+
+class Command(BaseCommand):
+    help = 'Move enrollments of closed semesters into the archive table (or back with --restore).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('semesters', nargs='*', help='Semester codes, e.g. 2025F 2026S')
+        parser.add_argument('--all-closed', action='store_true', help='Archive every closed semester')
+        parser.add_argument('--restore', action='store_true', help='Move archived rows back into Enrollment')
+        parser.add_argument('--force', action='store_true', help='Archive even if a semester is still open')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        codes = list(options['semesters'])
+        if options['all_closed']:
+            codes += Semester.objects.filter(is_closed=True).exclude(code__in=codes).values_list('code', flat=True)
+        if not codes:
+            raise CommandError('Give semester codes or --all-closed')
+
+        move = restore_semester if options['restore'] else archive_semester
+        for code in codes:
+            if not (options['restore'] or options['force'] or Semester.is_code_closed(code)):
+                raise CommandError(f'Semester {code} is not closed; close it first or use --force')
+            start = time.perf_counter()
+            moved, skipped = move(code, batch_size=options['batch_size'])
+            elapsed = time.perf_counter() - start
+            rate = moved / elapsed if elapsed else 0
+            line = f'{code}: moved {moved} rows in {elapsed:.2f}s ({rate:.0f} rows/s)'
+            if skipped:
+                line += f', skipped {skipped} already present'
+            self.stdout.write(self.style.SUCCESS(line))
@@ -0,0 +1,25 @@
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from grades.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Create missing Profile rows for users created before profiles were added automatically.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        missing = User.objects.filter(profile__isnull=True).values_list('id', flat=True).iterator(chunk_size=batch_size)
+        created = 0
+        while batch := list(islice(missing, batch_size)):
+            Profile.objects.bulk_create([Profile(user_id=user_id) for user_id in batch], ignore_conflicts=True)
+            created += len(batch)
+        if created:
+            self.stdout.write(self.style.SUCCESS(f'Created {created} profiles.'))
+        else:
+            self.stdout.write('No profiles needed creating.')
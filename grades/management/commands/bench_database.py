@@ -0,0 +1,173 @@
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Avg, Count, F, Q
+
+from grades.loadtest import percentile
+from grades.models import Course, Enrollment
+
+
+PREFIX = 'bench_db_'
+CODE = 'BDB%04d'
+
+
+def _grade(rng):
+    return Decimal(rng.randint(0, 100))
+
+
+def grade_write(alias, rng, world):
+    """One teacher grade edit: conditional update bumping the row version."""
+    pk = rng.choice(world['enrollments'])
+    with transaction.atomic(using=alias):
+        Enrollment.objects.using(alias).filter(pk=pk).update(
+            midterm_grade=_grade(rng), final_grade=_grade(rng), version=F('version') + 1,
+        )
+
+
+def enroll_toggle(alias, rng, world):
+    """A student adding then dropping a course: an INSERT and a DELETE."""
+    student, course = rng.choice(world['students']), rng.choice(world['extra_courses'])
+    # bulk_create: Enrollment.save() would load the course from the default alias
+    Enrollment.objects.using(alias).bulk_create(
+        [Enrollment(student_id=student, course_id=course, semester=world['semester'])], ignore_conflicts=True,
+    )
+    Enrollment.objects.using(alias).filter(student_id=student, course_id=course, semester=world['semester']).delete()
+
+
+def dashboard_read(alias, rng, world):
+    """The per-course aggregates of the teacher dashboard."""
+    list(
+        Course.objects.using(alias).filter(code__startswith='BDB')
+        .annotate(students=Count('enrollments'), avg=Avg('enrollments__total_grade')).values('id', 'students', 'avg')
+    )
+
+
+def search(alias, rng, world):
+    """Substring search over courses and students (trigram indexes on PostgreSQL)."""
+    term = f'{rng.randint(0, 999):03d}'
+    list(Course.objects.using(alias).filter(Q(name__icontains=term) | Q(code__icontains=term)).values('id')[:50])
+    list(User.objects.using(alias).filter(username__icontains=term).values('id')[:50])
+
+
+def stream(alias, rng, world):
+    """A full scan through .iterator(), a server-side cursor on PostgreSQL."""
+    for _ in Enrollment.objects.using(alias).filter(semester=world['semester']).values_list('id', 'total_grade').iterator(chunk_size=2000):
+        pass
+
+
+WORKLOADS = {
+    'grade_write': grade_write,
+    'enroll_toggle': enroll_toggle,
+    'dashboard': dashboard_read,
+    'search': search,
+    'stream': stream,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare databases under concurrent load: seeds bench_db_* students and BDB* courses on each alias, runs '
+        'write, read, search and streaming workloads from several threads, reports ops/s, latency percentiles '
+        'and errors (e.g. "database is locked"), then removes the seeded rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', nargs='+', default=['default'],
+            help='Aliases to compare, e.g. "sqlite default" with GRADES_DB=postgres',
+        )
+        parser.add_argument('--workloads', nargs='+', choices=sorted(WORKLOADS), default=list(WORKLOADS))
+        parser.add_argument('--students', type=int, default=2000)
+        parser.add_argument('--courses', type=int, default=200)
+        parser.add_argument('--per-student', type=int, default=5, help='Enrollments seeded per student')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--ops', type=int, default=200, help='Operations per thread per workload')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        for alias in options['database']:
+            if alias not in connections:
+                raise CommandError(f'Unknown database alias {alias!r}')
+        self.stdout.write(f"{'database':<10}{'vendor':<12}{'workload':<15}{'ops':>7}{'ops/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}")
+        for alias in options['database']:
+            world = self._seed(alias, options)
+            try:
+                for name in options['workloads']:
+                    self._report(alias, name, *self._run(alias, WORKLOADS[name], world, options))
+            finally:
+                self._cleanup(alias)
+
+    def _run(self, alias, workload, world, options):
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def worker(n):
+            rng = random.Random(options['seed'] * 1000 + n)
+            mine, failed = [], 0
+            try:
+                for _ in range(options['ops']):
+                    start = time.perf_counter()
+                    try:
+                        workload(alias, rng, world)
+                    except DatabaseError:
+                        failed += 1
+                        continue
+                    mine.append((time.perf_counter() - start) * 1000)
+            finally:
+                connections[alias].close()
+            with lock:
+                latencies.extend(mine)
+                errors.append(failed)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(options['threads'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, sum(errors), time.perf_counter() - start
+
+    def _report(self, alias, name, latencies, errors, wall):
+        latencies.sort()
+        self.stdout.write(
+            f"{alias:<10}{connections[alias].vendor:<12}{name:<15}{len(latencies):>7}{len(latencies) / wall:>9.1f}"
+            f"{percentile(latencies, 50):>9.2f}{percentile(latencies, 95):>9.2f}{errors:>8}"
+        )
+
+    def _seed(self, alias, options):
+        self._cleanup(alias)
+        rng = random.Random(options['seed'])
+        semester = '2099B'
+        with transaction.atomic(using=alias):
+            users = User.objects.using(alias)
+            users.bulk_create([User(username=f'{PREFIX}{i:05d}') for i in range(options['students'])], batch_size=500)
+            Course.objects.using(alias).bulk_create(
+                [Course(code=CODE % i, name=f'Bench course {i:03d}') for i in range(options['courses'])], batch_size=500,
+            )
+            students = list(users.filter(username__startswith=PREFIX).values_list('id', flat=True))
+            courses = list(Course.objects.using(alias).filter(code__startswith='BDB').values_list('id', flat=True))
+            # the last tenth of the courses stay empty for enroll_toggle
+            seeded, extra = courses[:max(1, len(courses) * 9 // 10)], courses[len(courses) * 9 // 10:] or courses
+            rows = []
+            for student in students:
+                for course in rng.sample(seeded, min(options['per_student'], len(seeded))):
+                    midterm, final = _grade(rng), _grade(rng)
+                    rows.append(Enrollment(
+                        student_id=student, course_id=course, semester=semester,
+                        midterm_grade=midterm, final_grade=final, total_grade=(midterm + final) / 2,
+                    ))
+            Enrollment.objects.using(alias).bulk_create(rows, batch_size=1000)
+        enrollments = list(Enrollment.objects.using(alias).filter(semester=semester).values_list('id', flat=True))
+        return {'students': students, 'extra_courses': extra, 'enrollments': enrollments, 'semester': semester}
+
+    @staticmethod
+    def _cleanup(alias):
+        with transaction.atomic(using=alias):
+            Enrollment.objects.using(alias).filter(course__code__startswith='BDB').delete()
+            Course.objects.using(alias).filter(code__startswith='BDB').delete()
+            User.objects.using(alias).filter(username__startswith=PREFIX).delete()
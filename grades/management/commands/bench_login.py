@@ -0,0 +1,66 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models.signals import post_save
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from grades.instrumentation import record_queries, rollback_sandbox
+from grades.models import Profile
+
+
+def _legacy_profile_hook(sender, instance, created, **kwargs):
+    """The pre-backfill signal body: look up the profile on every User save."""
+    if not created:
+        Profile.objects.get_or_create(user=instance)
+
+
+MODES = {
+    # ModelBackend + lookup on every save: what login cost before
+    'legacy': {'backends': ['django.contrib.auth.backends.ModelBackend'], 'legacy_hook': True},
+    'current': {'backends': ['grades.backends.ProfileModelBackend'], 'legacy_hook': False},
+}
+
+
+class Command(BaseCommand):
+    help = 'Measure login throughput and queries per login/page view, before and after the profile changes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=50)
+        parser.add_argument('--modes', nargs='+', choices=sorted(MODES), default=['legacy', 'current'])
+        parser.add_argument(
+            '--real-hasher', action='store_true',
+            help='Keep the configured password hasher (by default a fast hasher isolates the DB cost)',
+        )
+
+    def handle(self, *args, **options):
+        hashers = {} if options['real_hasher'] else {'PASSWORD_HASHERS': ['django.contrib.auth.hashers.MD5PasswordHasher']}
+        self.stdout.write(f"{'mode':<10}{'logins/s':>10}{'login q':>9}{'page q':>8}")
+        for mode in options['modes']:
+            with override_settings(ALLOWED_HOSTS=['testserver'], **hashers):
+                rate, login_q, page_q = self._run(MODES[mode], options['logins'])
+            self.stdout.write(f'{mode:<10}{rate:>10.1f}{login_q:>9.1f}{page_q:>8.1f}')
+
+    def _run(self, mode, logins):
+        if mode['legacy_hook']:
+            post_save.connect(_legacy_profile_hook, sender=User, dispatch_uid='bench_login_legacy')
+        try:
+            with override_settings(AUTHENTICATION_BACKENDS=mode['backends']), rollback_sandbox():
+                User.objects.create_user(username='__bench_login', password='bench-pass')
+                login_url, page_url = reverse('login'), reverse('student_courses')
+                login_queries = page_queries = 0
+                elapsed = 0.0
+                for _ in range(logins):
+                    client = Client()
+                    with record_queries() as recorder:
+                        start = time.perf_counter()
+                        client.post(login_url, {'username': '__bench_login', 'password': 'bench-pass'})
+                        elapsed += time.perf_counter() - start
+                    login_queries += recorder.queries
+                    with record_queries() as recorder:
+                        client.get(page_url)
+                    page_queries += recorder.queries
+        finally:
+            post_save.disconnect(sender=User, dispatch_uid='bench_login_legacy')
+        return logins / elapsed if elapsed else 0.0, login_queries / logins, page_queries / logins
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from grades.instrumentation import record_queries, rollback_sandbox
+from grades.models import Course, Enrollment
+
+
+class Command(BaseCommand):
+    help = 'Count DB queries/writes of the login, enroll and grade flows for each session mode (changes are rolled back).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modes', nargs='+', choices=sorted(settings.SESSION_ENGINES), default=['db', 'cached_db', 'signed_cookies'],
+            help='Session modes to compare (see GRADES_SESSION_MODE in settings.py)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'mode':<16}{'step':<14}{'queries':>8}{'writes':>8}")
+        for mode in options['modes']:
+            for step, queries, writes in self._run_mode(mode):
+                self.stdout.write(f'{mode:<16}{step:<14}{queries:>8}{writes:>8}')
+
+    def _run_mode(self, mode):
+        results = []
+        # no throttling or replayed outcomes: every run must reach the database
+        with override_settings(SESSION_ENGINE=settings.SESSION_ENGINES[mode], ALLOWED_HOSTS=['testserver'],
+                               GRADES_THROTTLE_RATES={}, GRADES_COALESCE_TTL=0):
+            with rollback_sandbox():
+                teacher = User.objects.create_user(username='__bench_teacher', password='bench-pass')
+                teacher.profile.is_teacher = True
+                teacher.profile.save()
+                User.objects.create_user(username='__bench_student', password='bench-pass')
+                course = Course.objects.create(name='Bench Course', code='__BENCH', teacher=teacher)
+
+                student_client = Client()
+                teacher_client = Client()
+                steps = [
+                    ('login', student_client.post, lambda: reverse('login'), {'username': '__bench_student', 'password': 'bench-pass'}),
+                    ('page view', student_client.get, lambda: reverse('student_courses'), {}),
+                    ('enroll', student_client.post, lambda: reverse('enroll_course'), {'course_id': course.id, 'action': 'enroll'}),
+                    ('teacher login', teacher_client.post, lambda: reverse('login'), {'username': '__bench_teacher', 'password': 'bench-pass'}),
+                    ('grade', teacher_client.post,
+                     lambda: reverse('update_enrollment_grade', args=[Enrollment.objects.get(course=course).id]),
+                     {'midterm_grade': '80', 'final_grade': '90'}),
+                ]
+                for step, send, url, data in steps:
+                    # resolve the URL outside the measured block
+                    target = url()
+                    with record_queries() as recorder:
+                        send(target, data)
+                    results.append((step, recorder.queries, recorder.writes))
+        return results
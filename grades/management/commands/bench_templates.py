@@ -0,0 +1,136 @@
+import statistics
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.utils import timezone
+
+from grades.forms import CommentForm
+from grades.instrumentation import record_queries
+from grades.listing import comment_rows, roster_rows, semester_groups, student_rows
+
+
+COURSES = 200
+ENROLLMENTS_PER_STUDENT = 4
+SEMESTERS = 8
+
+
+def _grade(i, base):
+    return Decimal(base + i % (100 - base))
+
+
+def _enrollment(i, student_id):
+    midterm, final = _grade(i, 50), _grade(i * 7, 40)
+    return {
+        'id': i, 'student_id': student_id, 'midterm_grade': midterm, 'final_grade': final,
+        'total_grade': (midterm + final) / 2,
+        'course_code': f'C{i % COURSES:03d}', 'course_name': f'課程 {i % COURSES}',
+    }
+
+
+def _courses():
+    return [
+        {'id': i, 'code': f'C{i:03d}', 'name': f'課程 {i}', 'teacher_name': f'teacher{i % 20}' if i % 10 else None}
+        for i in range(COURSES)
+    ]
+
+
+def main_context(rows):
+    """The staff view of the main page: ``rows`` enrollments over rows/4 students."""
+    students = [
+        {'id': i, 'username': f'student{i:05d}', 'avg': Decimal(60 + i % 40)}
+        for i in range(1, rows // ENROLLMENTS_PER_STUDENT + 1)
+    ]
+    enrollments = [_enrollment(i, i % len(students) + 1) for i in range(rows)]
+    return 'main.html', {'rows': student_rows(students, enrollments), 'courses': _courses()}
+
+
+def course_context(rows):
+    """The teacher's course page: ``rows`` enrolled students, other students and comments."""
+    enrollments = [dict(_enrollment(i, i), student_name=f'student{i:05d}') for i in range(rows)]
+    comments = [
+        {'id': i, 'user_id': i, 'author': f'student{i:05d}', 'content': '留言內容\n第二行', 'created_at': timezone.now()}
+        for i in range(min(rows, 200))
+    ]
+    return 'course.html', {
+        'course': {'id': 1, 'code': 'C001', 'name': '課程 1', 'teacher': {'username': 'teacher1'}},
+        'enrollments': roster_rows(enrollments, viewer_id=0, can_manage=True),
+        'can_manage': True,
+        'can_self_enroll': False,
+        'other_students': [{'id': i, 'username': f'other{i:05d}'} for i in range(min(rows, 500))],
+        'comments': comment_rows(comments, viewer_id=0, is_staff=True),
+        'comment_form': CommentForm(),
+    }
+
+
+def transcript_context(rows):
+    """A student's course list: ``rows`` live and archived enrollments over 8 semesters."""
+    transcript = [{
+        'id': i, 'semester': f'{2020 + i % SEMESTERS // 2}{"FS"[i % 2]}', 'course_id': i % COURSES,
+        'course_code': f'C{i % COURSES:03d}', 'course_name': f'課程 {i % COURSES}', 'teacher_name': f'teacher{i % 20}',
+        'midterm_grade': _grade(i, 50), 'final_grade': _grade(i * 7, 40), 'total_grade': _grade(i * 3, 45),
+        'archived': i % SEMESTERS < SEMESTERS // 2,
+    } for i in range(rows)]
+    averages = {row['semester']: Decimal('75.5') for row in transcript}
+    return 'student_courses.html', {
+        'rows': transcript, 'semesters': semester_groups(transcript, averages), 'pending_requests': [],
+    }
+
+
+PAGES = {'main': main_context, 'course': course_context, 'student_courses': transcript_context}
+
+
+class Command(BaseCommand):
+    help = (
+        'Render the long listing templates (main, course, student_courses) with generated precomputed rows '
+        'through the configured engine; report render time, peak allocations, output size and queries.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Table rows per page')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed renders per page (the median is reported)')
+        parser.add_argument('--pages', nargs='+', choices=sorted(PAGES), default=list(PAGES))
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Empty the cached loader before every render, i.e. what each request paid without it',
+        )
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/')
+        # unsaved, so base.html's profile lookups cannot reach the database
+        request.user = User(username='bench', is_staff=True)
+        self.stdout.write(f"{'page':<17}{'rows':>7}{'median ms':>11}{'ms/1k rows':>12}{'peak KiB':>10}{'out KiB':>9}{'queries':>9}")
+        for page in options['pages']:
+            template, context = PAGES[page](options['rows'])
+            render = lambda: render_to_string(template, context, request)  # noqa: E731
+            render()  # compile (and cache) outside the measurements
+            timings = []
+            with record_queries() as recorder:
+                for _ in range(options['repeat']):
+                    if options['cold']:
+                        self._reset_loaders()
+                    start = time.perf_counter()
+                    html = render()
+                    timings.append(time.perf_counter() - start)
+            tracemalloc.start()
+            try:
+                render()
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            median = statistics.median(timings) * 1000
+            self.stdout.write(
+                f"{page:<17}{options['rows']:>7}{median:>11.1f}{median * 1000 / max(options['rows'], 1):>12.2f}"
+                f"{peak / 1024:>10.0f}{len(html.encode()) / 1024:>9.0f}{recorder.queries / options['repeat']:>9.1f}"
+            )
+
+    @staticmethod
+    def _reset_loaders():
+        for backend in engines.all():
+            for loader in backend.engine.template_loaders:
+                loader.reset()
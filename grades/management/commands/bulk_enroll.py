@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from grades.enrollment import bulk_enroll, read_usernames_csv
+from grades.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Enroll a cohort of students in a course in one transaction (usernames and/or a CSV file).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_code', help='Course code, e.g. CSE101')
+        parser.add_argument('usernames', nargs='*', help='Usernames to enroll')
+        parser.add_argument('--csv', dest='csv_path', help='CSV file whose first column holds usernames')
+        parser.add_argument('--semester', default='', help='Semester for the new enrollments')
+
+    def handle(self, *args, **options):
+        try:
+            course = Course.objects.get(code=options['course_code'])
+        except Course.DoesNotExist:
+            raise CommandError(f"Course {options['course_code']} does not exist")
+        usernames = list(options['usernames'])
+        if options['csv_path']:
+            with open(options['csv_path'], encoding='utf-8-sig') as f:
+                usernames += read_usernames_csv(f)
+        if not usernames:
+            raise CommandError('No usernames given')
+
+        summary = bulk_enroll(course, usernames, semester=options['semester'])
+        self.stdout.write(self.style.SUCCESS(f"Inserted {len(summary['inserted'])} enrollments into {course.code}."))
+        self.stdout.write(f"Skipped (already enrolled): {len(summary['skipped'])}")
+        if summary['unknown']:
+            self.stdout.write(self.style.WARNING(f"Unknown usernames ({len(summary['unknown'])}): {', '.join(summary['unknown'])}"))
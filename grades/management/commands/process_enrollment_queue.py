@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from grades.enrollment import apply_enrollment_requests, next_request_batch
+
+
+class Command(BaseCommand):
+    help = 'Apply queued rush-mode enrollment requests in batched transactions (run a single instance).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--interval', type=float, default=0.5, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit instead of polling')
+
+    def handle(self, *args, **options):
+        processed = 0
+        try:
+            while True:
+                batch = next_request_batch(options['batch_size'])
+                if not batch:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+                    continue
+                start = time.perf_counter()
+                counts = apply_enrollment_requests(batch)
+                processed += len(batch)
+                if options['verbosity'] > 1:
+                    summary = ', '.join(f'{status} {n}' for status, n in sorted(counts.items()))
+                    self.stdout.write(f'{len(batch)} requests in {time.perf_counter() - start:.3f}s ({summary})')
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} enrollment requests.'))
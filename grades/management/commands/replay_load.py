@@ -0,0 +1,90 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from grades import loadtest
+from grades.models import Enrollment
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay a recorded request stream, or a synthetic role-weighted mix, as seeded students, teachers and '
+        'staff; report per-endpoint latency percentiles, throughput, error rates and queries per request. '
+        'Requests write to the configured database: run it against a copy.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of a running server; default drives the views in-process (with query counts)')
+        parser.add_argument('--stream', help='Recorded JSONL stream to replay instead of the synthetic mix')
+        parser.add_argument('--speed', type=float, help='Honour recorded "at" offsets, sped up by this factor')
+        parser.add_argument('--save-stream', help='Write the synthetic stream to this file for later replays')
+        parser.add_argument('--mix', default='student=85,teacher=10,staff=5', help='Role weights of the synthetic mix')
+        parser.add_argument('--users', type=int, default=20, help='Simulated users (synthetic mix)')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per simulated user (synthetic mix)')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--students', type=int, default=50, help='Load accounts to seed per role')
+        parser.add_argument('--teachers', type=int, default=5)
+        parser.add_argument('--staff', type=int, default=2)
+        parser.add_argument('--password', default='load-pass')
+        parser.add_argument('--semester', help='Semester used by the synthetic mix (default: the latest one enrolled)')
+        parser.add_argument('--seed', type=int, help='Random seed for a repeatable synthetic mix')
+        parser.add_argument(
+            '--no-throttle', action='store_true',
+            help='In-process only: disable enrollment rate limiting and coalescing so every request reaches the database',
+        )
+        parser.add_argument('--cleanup', action='store_true', help='Delete the load accounts and courses, then exit')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            removed = loadtest.remove_accounts()
+            self.stdout.write(self.style.SUCCESS(f'Removed {removed} load accounts.'))
+            return
+
+        semester = options['semester'] or Enrollment.objects.order_by('-semester').values_list('semester', flat=True).first() or '2026S'
+        accounts = loadtest.seed_accounts(
+            options['students'], options['teachers'], options['staff'], options['password'], semester,
+        )
+        try:
+            if options['stream']:
+                with open(options['stream'], encoding='utf-8') as fh:
+                    streams = loadtest.read_streams(fh, accounts)
+            else:
+                world = loadtest.World(accounts, semester)
+                streams = loadtest.synthetic_streams(
+                    world, options['users'], options['requests'], loadtest.parse_weights(options['mix']),
+                    random.Random(options['seed']),
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        if options['save_stream']:
+            with open(options['save_stream'], 'w', encoding='utf-8') as fh:
+                loadtest.write_streams(streams, accounts, fh)
+
+        if options['url']:
+            samples, wall = loadtest.run(
+                streams, lambda: loadtest.HttpSession(options['url']), options['password'],
+                options['concurrency'], options['speed'],
+            )
+        else:
+            overrides = {'ALLOWED_HOSTS': ['testserver']}
+            if options['no_throttle']:
+                overrides.update(GRADES_THROTTLE_RATES={}, GRADES_COALESCE_TTL=0)
+            with override_settings(**overrides):
+                samples, wall = loadtest.run(
+                    streams, loadtest.ClientSession, options['password'], options['concurrency'], options['speed'],
+                )
+        self._report(*loadtest.summarise(samples, wall), wall)
+
+    def _report(self, rows, total, wall):
+        self.stdout.write(
+            f"{'endpoint':<28}{'n':>6}{'req/s':>8}{'err%':>7}{'429':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'q/req':>7}"
+        )
+        for row in rows + [total]:
+            errors = 100 * row['errors'] / row['requests']
+            queries = '-' if row['queries'] is None else f"{row['queries']:.1f}"
+            self.stdout.write(
+                f"{row['endpoint']:<28}{row['requests']:>6}{row['rate']:>8.1f}{errors:>7.1f}{row['throttled']:>5}"
+                f"{row['p50']:>9.1f}{row['p95']:>9.1f}{row['p99']:>9.1f}{queries:>7}"
+            )
+        self.stdout.write(f"{total['requests']} requests in {wall:.2f}s")
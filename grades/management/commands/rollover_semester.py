@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from grades.models import Semester
+from grades.rollover import offered_courses, rollover
+
+
+class Command(BaseCommand):
+    help = (
+        "Carry a semester's course offerings (with their teachers) into the next semester and, with --rosters, "
+        'clone the continuing rosters as new enrollments with empty grades. Safe to re-run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='from_semester', required=True, help='Source semester, e.g. 2026S')
+        parser.add_argument('--to', dest='to_semester', required=True, help='New semester, e.g. 2026F')
+        parser.add_argument('--rosters', action='store_true', help='Also enroll the source rosters in the new semester')
+        parser.add_argument('--courses', nargs='+', metavar='CODE', help='Only these course codes (default: all offered)')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        source, target = options['from_semester'], options['to_semester']
+        if source == target:
+            raise CommandError('--from and --to must differ')
+        if Semester.is_code_closed(target):
+            raise CommandError(f'Semester {target} is closed')
+        if not offered_courses(source, options['courses']).exists():
+            raise CommandError(f'No courses with enrollments in {source}' + (' among --courses' if options['courses'] else ''))
+
+        start = time.perf_counter()
+        courses, created, waitlisted, skipped = rollover(
+            source, target, options['courses'], options['rosters'], options['batch_size'],
+        )
+        elapsed = time.perf_counter() - start
+
+        unassigned = [course.code for course in courses if course.teacher is None]
+        self.stdout.write(f'{source} -> {target}: {len(courses)} courses carried over, {len(courses) - len(unassigned)} with a teacher')
+        if unassigned:
+            self.stdout.write(self.style.WARNING(f"No teacher assigned: {', '.join(unassigned)}"))
+        if options['rosters']:
+            rate = created / elapsed if elapsed else 0
+            line = f'rosters: created {created} enrollments in {elapsed:.2f}s ({rate:.0f} rows/s)'
+            if waitlisted:
+                line += f', waitlisted {waitlisted} over capacity'
+            if skipped:
+                line += f', skipped {skipped} already enrolled or waiting'
+            self.stdout.write(self.style.SUCCESS(line))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'done in {elapsed:.2f}s (rosters not copied; add --rosters)'))
@@ -0,0 +1,60 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from grades import taskqueue
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks (grades.taskqueue) with a pool of worker threads or processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help='Tasks run at the same time')
+        parser.add_argument('--processes', action='store_true', help='Use worker processes instead of threads (CPU-bound tasks)')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds to wait when no task is due')
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='Requeue tasks left running longer than this many seconds (crashed worker)')
+        parser.add_argument('--once', action='store_true', help='Run the tasks that are due now and exit')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        requeued = taskqueue.requeue_stale(timedelta(seconds=options['stale_after']))
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale tasks.')
+
+        if options['processes']:
+            connections.close_all()
+            executor = ProcessPoolExecutor(concurrency, initializer=taskqueue.init_worker_process)
+        else:
+            executor = ThreadPoolExecutor(concurrency, thread_name_prefix='grades-worker')
+
+        inflight, succeeded, failed = set(), 0, 0
+        try:
+            while True:
+                done = {future for future in inflight if future.done()}
+                for future in done:
+                    if future.result():
+                        succeeded += 1
+                    else:
+                        failed += 1
+                inflight -= done
+
+                claimed = taskqueue.claim(concurrency - len(inflight)) if len(inflight) < concurrency else []
+                for task_id in claimed:
+                    inflight.add(executor.submit(taskqueue.run_in_worker, task_id))
+                if claimed:
+                    continue
+                if inflight:
+                    wait(inflight, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping: waiting for running tasks to finish.')
+        finally:
+            executor.shutdown(wait=True)
+        self.stdout.write(self.style.SUCCESS(f'{succeeded} tasks succeeded, {failed} failed or will be retried.'))
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from grades.models import Semester
+from grades.snapshots import SemesterSnapshot, SnapshotError, snapshot_path, write_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Freeze a closed semester into a memory-mappable report snapshot (or verify an existing one).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('semester', help='Semester code, e.g. 2026S')
+        parser.add_argument('--close', action='store_true', help='Mark the semester closed before snapshotting')
+        parser.add_argument('--force', action='store_true', help='Snapshot even if the semester is still open')
+        parser.add_argument('--verify', action='store_true', help='Only check the existing snapshot for corruption/staleness')
+
+    def handle(self, *args, **options):
+        code = options['semester']
+        try:
+            path = snapshot_path(code)
+        except SnapshotError as exc:
+            raise CommandError(str(exc))
+
+        if options['verify']:
+            if not path.exists():
+                raise CommandError(f'No snapshot at {path}')
+            snapshot = SemesterSnapshot(path)
+            if not snapshot.verify():
+                raise CommandError(f'{path} is corrupt (CRC mismatch)')
+            if snapshot.is_stale():
+                raise CommandError(f'{path} is stale: enrollments of {code} changed since {snapshot.header["created_at"]}')
+            self.stdout.write(self.style.SUCCESS(f'{path} is intact and up to date.'))
+            return
+
+        if options['close']:
+            Semester.objects.update_or_create(code=code, defaults={'is_closed': True, 'closed_at': timezone.now()})
+        if not (options['force'] or Semester.is_code_closed(code)):
+            raise CommandError(f'Semester {code} is not closed; use --close or --force')
+
+        start = time.perf_counter()
+        path, rows = write_snapshot(code, path)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {path} ({rows} enrollments, {path.stat().st_size} bytes) in {elapsed:.2f}s'
+        ))
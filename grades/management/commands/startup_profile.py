@@ -0,0 +1,104 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+# Runs in a fresh interpreter: what a worker does before it can answer a request.
+# -X importtime only reports import statements; Django loads settings, apps,
+# models and URLconfs through importlib.import_module, so those are timed here.
+BOOT_SCRIPT = '''
+import importlib, importlib.util, json, sys, time
+before = set(sys.modules)
+dynamic = {{}}
+_import_module = importlib.import_module
+def import_module(name, package=None):
+    fresh = importlib.util.resolve_name(name, package) not in sys.modules
+    start = time.perf_counter()
+    module = _import_module(name, package)
+    if fresh:
+        dynamic[module.__name__] = int((time.perf_counter() - start) * 1e6)
+    return module
+importlib.import_module = import_module
+start = time.perf_counter()
+import django
+django.setup()
+if {load_urls}:
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+elapsed = time.perf_counter() - start
+print(json.dumps({{'elapsed': elapsed, 'modules': sorted(set(sys.modules) - before), 'dynamic': dynamic}}))
+'''
+
+PROJECT_PACKAGES = ('grades', 'locallibrary')
+
+
+def parse_importtime(text):
+    """Parse ``-X importtime`` stderr into (module, self_us, cumulative_us, depth) tuples."""
+    rows = []
+    for line in text.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+class Command(BaseCommand):
+    help = 'Profile worker cold start (django.setup() plus URLconf) with -X importtime, by cumulative cost per module.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=25, help='Rows to show in the cumulative ranking')
+        parser.add_argument('--runs', type=int, default=3, help='Cold starts to time; the fastest is reported')
+        parser.add_argument('--setup-only', action='store_true', help='Stop after django.setup(), skip the URLconf')
+        parser.add_argument('--max-ms', type=float, help='Fail if the fastest cold start exceeds this many milliseconds')
+        parser.add_argument('--max-modules', type=int, help='Fail if booting imports more modules than this')
+
+    def handle(self, *args, **options):
+        runs = [self._boot(not options['setup_only']) for _ in range(max(1, options['runs']))]
+        best = min(runs, key=lambda run: run['elapsed'])
+        imports = parse_importtime(best['importtime'])
+        # modules loaded via import_module: cumulative only, self time unknown
+        imports += [(module, None, us, 0) for module, us in best['dynamic'].items()]
+        elapsed_ms = best['elapsed'] * 1000
+        modules = best['modules']
+
+        self.stdout.write(f"{'cumulative ms':>14}{'self ms':>9}  module")
+        for row in sorted(imports, key=lambda row: -row[2])[:options['limit']]:
+            self._write_row(*row)
+
+        project = [row for row in imports if row[0].split('.')[0] in PROJECT_PACKAGES]
+        self.stdout.write('\nproject modules loaded at boot:')
+        for row in sorted(project, key=lambda row: -row[2]):
+            self._write_row(*row)
+
+        self.stdout.write(
+            f'\ncold start {elapsed_ms:.1f} ms (best of {len(runs)}, importtime overhead included), '
+            f'{len(modules)} modules imported'
+        )
+        if options['max_ms'] is not None and elapsed_ms > options['max_ms']:
+            raise CommandError(f'cold start {elapsed_ms:.1f} ms exceeds the {options["max_ms"]} ms budget')
+        if options['max_modules'] is not None and len(modules) > options['max_modules']:
+            raise CommandError(f'{len(modules)} modules imported at boot exceeds the budget of {options["max_modules"]}')
+
+    def _write_row(self, module, self_us, cumulative_us, depth):
+        self_ms = '-' if self_us is None else f'{self_us / 1000:.1f}'
+        self.stdout.write(f'{cumulative_us / 1000:>14.1f}{self_ms:>9}  {module}')
+
+    def _boot(self, load_urls):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'locallibrary.settings'))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT.format(load_urls=load_urls)],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f'boot failed:\n{result.stderr[-2000:]}')
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        report['importtime'] = result.stderr
+        return report
@@ -0,0 +1,169 @@
+import json
+import logging
+import mimetypes
+import os
+import re
+import time
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.db import connection
+from django.http import FileResponse, HttpResponseNotModified
+from django.middleware.gzip import GZipMiddleware
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^/]+$')
+
+timing_logger = logging.getLogger('grades.timing')
+
+
+class StaticFilesMiddleware:
+    """Serve collected static files in-process, for deployments without a front proxy.
+
+    Enabled with GRADES_SERVE_STATIC. Prefers the ``.br``/``.gz`` files written
+    by CompressedManifestStaticFilesStorage when the client accepts them, and
+    marks content-hashed names as cacheable forever. Place it right after
+    SecurityMiddleware so static requests skip sessions and auth entirely.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'GRADES_SERVE_STATIC', False) or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = urlparse(settings.STATIC_URL).path
+        self.root = str(settings.STATIC_ROOT)
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path.startswith(self.prefix):
+            response = self.serve(request, request.path[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        stat = os.stat(path)
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+            response = HttpResponseNotModified()
+        else:
+            accepted = request.META.get('HTTP_ACCEPT_ENCODING', '')
+            served, encoding = path, None
+            for suffix, token in (('.br', 'br'), ('.gz', 'gzip')):
+                if token in accepted and os.path.isfile(path + suffix):
+                    served, encoding = path + suffix, token
+                    break
+            content_type, _ = mimetypes.guess_type(name)
+            response = FileResponse(open(served, 'rb'), content_type=content_type or 'application/octet-stream')
+            if encoding:
+                response['Content-Encoding'] = encoding
+            response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Vary'] = 'Accept-Encoding'
+        if HASHED_NAME.search(name):
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = 'public, max-age=300'
+        return response
+
+
+class ThresholdGZipMiddleware(GZipMiddleware):
+    """Opt-in GZipMiddleware (GRADES_GZIP) that skips responses under GRADES_GZIP_MIN_LENGTH bytes.
+
+    Small responses gain little from compression and still pay the CPU cost.
+    CSRF tokens are masked per request, so compressed pages do not leak them
+    through BREACH-style length probing.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'GRADES_GZIP', False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.min_length = getattr(settings, 'GRADES_GZIP_MIN_LENGTH', 1024)
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < self.min_length:
+            return response
+        return super().process_response(request, response)
+
+
+class ProfilingMiddleware:
+    """Profile a single request when a staff user asks for it.
+
+    Enabled with GRADES_PROFILING and placed after AuthenticationMiddleware.
+    ``X-Profile: sql`` (or ``?_profile=sql``) records every query with its
+    time and the line that issued it; any other value also runs the view
+    under cProfile. Results are written by grades.profiling, named in the
+    X-Profile-Id response header and listed on the staff profiles page.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'GRADES_PROFILING', False):
+            raise MiddlewareNotUsed
+        from .profiling import profile_request, requested_mode
+        self.get_response = get_response
+        self.profile_request = profile_request
+        self.requested_mode = requested_mode
+
+    def __call__(self, request):
+        mode = self.requested_mode(request)
+        if mode is None or not request.user.is_staff:
+            return self.get_response(request)
+        response, name = self.profile_request(request, self.get_response, mode)
+        response['X-Profile-Id'] = name
+        return response
+
+
+class TimingMiddleware:
+    """Per-request DB, template and total time, without a profiler.
+
+    Enabled with GRADES_TIMING. Every response gets a Server-Timing header
+    (visible in the browser's network panel), every request is logged as one
+    JSON line on the ``grades.timing`` logger with its resolved URL name, and
+    per-view counters are kept for the staff metrics endpoint (see
+    grades.timing). Placed right after the gzip middleware, the total covers
+    sessions, auth and the view but not compression.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'GRADES_TIMING', False):
+            raise MiddlewareNotUsed
+        from . import timing
+        from .instrumentation import QueryRecorder
+        self.get_response = get_response
+        self.timing = timing
+        self.recorder_class = QueryRecorder
+
+    def __call__(self, request):
+        recorder = self.recorder_class()
+        start = time.perf_counter()
+        with self.timing.RequestTiming() as request_timing, connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = recorder.duration * 1000
+        template_ms = request_timing.template * 1000
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        response['Server-Timing'] = self.timing.server_timing(total_ms, db_ms, recorder.queries, template_ms)
+        self.timing.record(view, response.status_code, total_ms, db_ms, recorder.queries, template_ms)
+        timing_logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'user': request.user.pk if getattr(request, 'user', None) and request.user.is_authenticated else None,
+            'total_ms': round(total_ms, 2),
+            'db_ms': round(db_ms, 2),
+            'queries': recorder.queries,
+            'template_ms': round(template_ms, 2),
+        }))
+        return response
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+GRADE_FIELDS = ('midterm_grade', 'final_grade')
+
+
+def _remove_duplicate_enrollments(apps, schema_editor):
+    """Merge the duplicate rows get_or_create races left behind into the oldest one.
+
+    Grades are carried over from whichever duplicate holds them. When two
+    duplicates hold different values for the same grade there is no safe
+    choice, so the migration stops and lists them for manual cleanup.
+    """
+    Enrollment = apps.get_model('grades', 'Enrollment')
+    dupes = (
+        Enrollment.objects.values('student_id', 'course_id', 'semester')
+        .annotate(n=Count('id'))
+        .filter(n__gt=1)
+    )
+    merges, conflicts = [], []
+    for d in dupes:
+        rows = list(Enrollment.objects.filter(
+            student_id=d['student_id'], course_id=d['course_id'], semester=d['semester'],
+        ).order_by('id'))
+        grades = {}
+        for field in GRADE_FIELDS:
+            values = {getattr(row, field) for row in rows} - {None}
+            if len(values) > 1:
+                conflicts.append(f"ids {', '.join(str(row.id) for row in rows)}: {field} {sorted(values)}")
+            grades[field] = values.pop() if values else None
+        merges.append((rows, grades))
+    if conflicts:
+        raise RuntimeError(
+            'Duplicate enrollments hold different grades; keep one row of each group and migrate again:\n'
+            + '\n'.join(conflicts)
+        )
+    for (keep, *rest), grades in merges:
+        Enrollment.objects.filter(id__in=[row.id for row in rest]).delete()
+        Enrollment.objects.filter(id=keep.id).update(**grades)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0008_rename_midtrem_grade_enrollment_midterm_grade_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(_remove_duplicate_enrollments, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='enrollment',
+            constraint=models.UniqueConstraint(fields=('student', 'course', 'semester'), name='unique_enrollment_per_semester'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:43
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F
+
+
+def _backfill_totals(apps, schema_editor):
+    Enrollment = apps.get_model('grades', 'Enrollment')
+    # no course has a policy yet, so every total uses the 50/50 default
+    Enrollment.objects.update(total_grade=ExpressionWrapper(
+        (F('midterm_grade') + F('final_grade')) / 2,
+        output_field=DecimalField(max_digits=9, decimal_places=2),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0009_enrollment_unique_per_semester'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='total_grade',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=9, null=True, verbose_name='總成績'),
+        ),
+        migrations.CreateModel(
+            name='GradingPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('midterm_weight', models.DecimalField(decimal_places=3, default=Decimal('0.5'), max_digits=4, validators=[django.core.validators.MinValueValidator(0)], verbose_name='期中權重')),
+                ('final_weight', models.DecimalField(decimal_places=3, default=Decimal('0.5'), max_digits=4, validators=[django.core.validators.MinValueValidator(0)], verbose_name='期末權重')),
+                ('scale', models.DecimalField(decimal_places=3, default=Decimal('1'), max_digits=5, validators=[django.core.validators.MinValueValidator(0)], verbose_name='縮放倍率')),
+                ('curve', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=6, verbose_name='調分')),
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='grading_policy', to='grades.course', verbose_name='課程')),
+            ],
+            options={
+                'verbose_name': '評分方式',
+                'verbose_name_plural': '評分方式',
+            },
+        ),
+        migrations.RunPython(_backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0010_grading_policy_total_grade'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Semester',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=20, unique=True, verbose_name='學期')),
+                ('is_closed', models.BooleanField(default=False, verbose_name='已結束')),
+                ('closed_at', models.DateTimeField(blank=True, null=True, verbose_name='結束時間')),
+            ],
+            options={
+                'verbose_name': '學期',
+                'verbose_name_plural': '學期',
+                'ordering': ['code'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0011_semester'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnrollmentRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semester', models.CharField(blank=True, default='', max_length=20, verbose_name='學期')),
+                ('action', models.CharField(choices=[('enroll', '加選'), ('drop', '退選')], max_length=10, verbose_name='動作')),
+                ('status', models.CharField(choices=[('pending', '處理中'), ('done', '完成'), ('rejected', '未成功')], default='pending', max_length=10, verbose_name='狀態')),
+                ('message', models.CharField(blank=True, default='', max_length=200, verbose_name='結果')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='送出時間')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='處理時間')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollment_requests', to='grades.course', verbose_name='課程')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollment_requests', to=settings.AUTH_USER_MODEL, verbose_name='學生')),
+            ],
+            options={
+                'verbose_name': '選課佇列',
+                'verbose_name_plural': '選課佇列',
+                'indexes': [models.Index(fields=['status', 'id'], name='enrollment_request_queue')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:07
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0012_enrollment_request'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='工作')),
+                ('args', models.JSONField(blank=True, default=list, verbose_name='參數')),
+                ('kwargs', models.JSONField(blank=True, default=dict, verbose_name='具名參數')),
+                ('status', models.CharField(choices=[('queued', '等待中'), ('running', '執行中'), ('done', '完成'), ('failed', '失敗')], default='queued', max_length=10, verbose_name='狀態')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='嘗試次數')),
+                ('max_attempts', models.PositiveIntegerField(default=3, verbose_name='最多嘗試次數')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='預定執行時間')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='最後錯誤')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立時間')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='開始時間')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='結束時間')),
+            ],
+            options={
+                'verbose_name': '背景工作',
+                'verbose_name_plural': '背景工作',
+                'indexes': [models.Index(fields=['status', 'run_at'], name='task_due')],
+            },
+        ),
+    ]
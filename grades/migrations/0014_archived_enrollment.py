@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0013_task'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedEnrollment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semester', models.CharField(blank=True, default='', max_length=20, verbose_name='學期')),
+                ('midterm_grade', models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True, verbose_name='期中成績')),
+                ('final_grade', models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True, verbose_name='期末成績')),
+                ('total_grade', models.DecimalField(blank=True, decimal_places=2, max_digits=9, null=True, verbose_name='總成績')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='封存時間')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_enrollments', to='grades.course', verbose_name='課程')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_enrollments', to=settings.AUTH_USER_MODEL, verbose_name='學生')),
+            ],
+            options={
+                'verbose_name': '封存選課紀錄',
+                'verbose_name_plural': '封存選課紀錄',
+                'indexes': [models.Index(fields=['semester'], name='archived_enrollment_semester')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'course', 'semester'), name='unique_archived_enrollment_per_semester')],
+            },
+        ),
+    ]
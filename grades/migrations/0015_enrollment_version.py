@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0014_archived_enrollment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='版本'),
+        ),
+    ]
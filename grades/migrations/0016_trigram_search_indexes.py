@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+# icontains compiles to UPPER(column) LIKE UPPER(%s) on PostgreSQL, so the
+# trigram indexes are on UPPER(column) for the planner to use them
+TRIGRAM_INDEXES = [
+    ('grades_course_name_trgm', 'grades_course', 'name'),
+    ('grades_course_code_trgm', 'grades_course', 'code'),
+    ('grades_profile_full_name_trgm', 'grades_profile', 'full_name'),
+    ('auth_user_username_trgm', 'auth_user', 'username'),
+]
+
+
+def _create_trigram_indexes(apps, schema_editor):
+    # PostgreSQL only; SQLite has no index that helps a LIKE '%term%'
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (UPPER({column}::text) gin_trgm_ops)'
+        )
+
+
+def _drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0015_enrollment_version'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(_create_trigram_indexes, _drop_trigram_indexes),
+    ]
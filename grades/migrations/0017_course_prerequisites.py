@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0016_trigram_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Prerequisite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prerequisite_links', to='grades.course', verbose_name='課程')),
+                ('required', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='required_for', to='grades.course', verbose_name='先修課程')),
+            ],
+            options={
+                'verbose_name': '先修課程',
+                'verbose_name_plural': '先修課程',
+                'constraints': [models.UniqueConstraint(fields=('course', 'required'), name='unique_prerequisite'), models.CheckConstraint(condition=models.Q(('course', models.F('required')), _negated=True), name='prerequisite_not_self')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PrerequisiteClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField(default=1)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='grades.course')),
+                ('required', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='grades.course')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('course', 'required'), name='unique_prerequisite_closure')],
+            },
+        ),
+    ]
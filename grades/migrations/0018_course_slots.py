@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0017_course_prerequisites'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(1, '週一'), (2, '週二'), (3, '週三'), (4, '週四'), (5, '週五'), (6, '週六'), (7, '週日')], verbose_name='星期')),
+                ('start_time', models.TimeField(verbose_name='開始時間')),
+                ('end_time', models.TimeField(verbose_name='結束時間')),
+                ('room', models.CharField(blank=True, default='', max_length=50, verbose_name='教室')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='grades.course', verbose_name='課程')),
+            ],
+            options={
+                'verbose_name': '上課時間',
+                'verbose_name_plural': '上課時間',
+                'ordering': ['weekday', 'start_time'],
+                'indexes': [models.Index(fields=['weekday', 'start_time', 'end_time'], name='course_slot_interval')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('end_time__gt', models.F('start_time'))), name='course_slot_positive')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0018_course_slots'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='名額'),
+        ),
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semester', models.CharField(blank=True, default='', max_length=20, verbose_name='學期')),
+                ('joined_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='登記時間')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='grades.course', verbose_name='課程')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL, verbose_name='學生')),
+            ],
+            options={
+                'verbose_name': '候補名單',
+                'verbose_name_plural': '候補名單',
+                'indexes': [models.Index(fields=['course', 'semester', 'joined_at', 'id'], name='waitlist_order')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'course', 'semester'), name='unique_waitlist_entry')],
+            },
+        ),
+    ]
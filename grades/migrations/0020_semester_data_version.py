@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0019_course_capacity_waitlist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='semester',
+            name='data_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='資料版本'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0020_semester_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollmentrequest',
+            name='override',
+            field=models.BooleanField(default=False, verbose_name='略過先修與衝堂檢查'),
+        ),
+    ]
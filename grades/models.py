@@ -1,8 +1,11 @@
+from decimal import Decimal, ROUND_HALF_UP
+
 from django.db import models
 from django.core.validators import MinValueValidator
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
 
 class Profile(models.Model):
@@ -34,6 +37,9 @@ class Course(models.Model):
         related_name='teaching_courses',
         verbose_name="任課教師",
     )
+    # seats per semester; empty means unlimited. Students past it join the
+    # course's waitlist (see grades.waitlist).
+    capacity = models.PositiveIntegerField(null=True, blank=True, verbose_name="名額")
 
     def __str__(self):
         return f"{self.code} - {self.name}"
@@ -42,6 +48,146 @@ class Course(models.Model):
         return User.objects.filter(enrollment__course=self)
 
 
+class CourseSlot(models.Model):
+    """A weekly meeting time of a course, e.g. Monday 09:10-12:00.
+
+    Slots of the courses a student is enrolled in must not overlap; see
+    grades.timetable for the overlap queries.
+    """
+    WEEKDAY_CHOICES = [(1, '週一'), (2, '週二'), (3, '週三'), (4, '週四'), (5, '週五'), (6, '週六'), (7, '週日')]
+
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='slots', verbose_name="課程")
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES, verbose_name="星期")
+    start_time = models.TimeField(verbose_name="開始時間")
+    end_time = models.TimeField(verbose_name="結束時間")
+    room = models.CharField(max_length=50, blank=True, default='', verbose_name="教室")
+
+    def __str__(self):
+        return f"{self.get_weekday_display()} {self.start_time:%H:%M}–{self.end_time:%H:%M}"
+
+    class Meta:
+        verbose_name = "上課時間"
+        verbose_name_plural = "上課時間"
+        ordering = ['weekday', 'start_time']
+        constraints = [
+            models.CheckConstraint(condition=models.Q(end_time__gt=models.F('start_time')), name='course_slot_positive'),
+        ]
+        indexes = [
+            # overlap probes: same weekday, start before the other's end, end after its start
+            models.Index(fields=['weekday', 'start_time', 'end_time'], name='course_slot_interval'),
+        ]
+
+
+class Prerequisite(models.Model):
+    """``course`` may only be taken after passing ``required`` (a direct edge).
+
+    Edges are edited here (admin inline on Course); the transitive pairs live
+    in PrerequisiteClosure, rebuilt whenever an edge changes (see
+    grades.prerequisites).
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='prerequisite_links', verbose_name="課程")
+    required = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='required_for', verbose_name="先修課程")
+
+    def __str__(self):
+        return f"{self.course.code} ← {self.required.code}"
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        from .prerequisites import creates_cycle
+        if self.course_id and self.required_id and creates_cycle(self.course_id, self.required_id):
+            raise ValidationError('先修關係不可形成循環（課程不能直接或間接成為自己的先修課程）')
+
+    class Meta:
+        verbose_name = "先修課程"
+        verbose_name_plural = "先修課程"
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'required'], name='unique_prerequisite'),
+            models.CheckConstraint(condition=~models.Q(course=models.F('required')), name='prerequisite_not_self'),
+        ]
+
+
+class PrerequisiteClosure(models.Model):
+    """Every (course, required) pair of the transitive prerequisite relation.
+
+    Derived data: never edited directly, rebuilt from Prerequisite by
+    grades.prerequisites.rebuild_closure(). Eligibility is then a single
+    "no closure row whose required course the student has not passed" query.
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    required = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    depth = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'required'], name='unique_prerequisite_closure'),
+        ]
+
+
+class Semester(models.Model):
+    """A term code as used in Enrollment.semester, e.g. 2026S.
+
+    Closed semesters are frozen: their reports are served from precomputed
+    snapshots (see grades.snapshots). ``data_version`` is bumped by every
+    write to the semester's enrollments (``touch``), so a snapshot knows it
+    is stale from one lookup.
+    """
+    code = models.CharField(max_length=20, unique=True, verbose_name="學期")
+    is_closed = models.BooleanField(default=False, verbose_name="已結束")
+    closed_at = models.DateTimeField(null=True, blank=True, verbose_name="結束時間")
+    data_version = models.PositiveIntegerField(default=0, editable=False, verbose_name="資料版本")
+
+    def __str__(self):
+        return self.code
+
+    @classmethod
+    def is_code_closed(cls, code):
+        return cls.objects.filter(code=code, is_closed=True).exists()
+
+    @classmethod
+    def touch(cls, codes):
+        """Bump ``data_version`` of the semesters in ``codes`` (a list or a ``values('semester')`` subquery).
+
+        Single saves are covered by a post_save receiver; bulk updates, bulk
+        creates and deletes call this themselves.
+        """
+        cls.objects.filter(code__in=codes).update(data_version=models.F('data_version') + 1)
+
+    class Meta:
+        verbose_name = "學期"
+        verbose_name_plural = "學期"
+        ordering = ['code']
+
+
+class GradingPolicy(models.Model):
+    """Per-course weighting: total = (midterm * w_mid + final * w_final) * scale + curve.
+
+    Courses without a policy use the defaults (50/50, no scaling or curve).
+    Saving a policy recomputes the stored totals of that course only.
+    """
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, related_name='grading_policy', verbose_name="課程")
+    midterm_weight = models.DecimalField(max_digits=4, decimal_places=3, default=Decimal('0.5'),
+                                         validators=[MinValueValidator(0)], verbose_name="期中權重")
+    final_weight = models.DecimalField(max_digits=4, decimal_places=3, default=Decimal('0.5'),
+                                       validators=[MinValueValidator(0)], verbose_name="期末權重")
+    scale = models.DecimalField(max_digits=5, decimal_places=3, default=Decimal('1'),
+                                validators=[MinValueValidator(0)], verbose_name="縮放倍率")
+    curve = models.DecimalField(max_digits=6, decimal_places=2, default=Decimal('0'), verbose_name="調分")
+
+    def __str__(self):
+        return f"{self.course.code}: 期中 {self.midterm_weight} / 期末 {self.final_weight}"
+
+    def compute_total(self, midterm, final):
+        """Total for one enrollment, or None until both scores are entered."""
+        if midterm is None or final is None:
+            return None
+        total = (Decimal(midterm) * self.midterm_weight + Decimal(final) * self.final_weight) * self.scale + self.curve
+        return total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+    class Meta:
+        verbose_name = "評分方式"
+        verbose_name_plural = "評分方式"
+
+
 class Enrollment(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="學生", related_name='enrollments')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, verbose_name="課程", related_name='enrollments')
@@ -63,13 +209,156 @@ class Enrollment(models.Model):
         verbose_name="期末成績",
         validators=[MinValueValidator(0)],
     )
+    # Weighted total under the course's GradingPolicy; maintained on save and
+    # by grades.grading.recompute_course() so views never recompute it.
+    total_grade = models.DecimalField(
+        max_digits=9,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="總成績",
+    )
+    # Bumped by every grade write; the inline grade editor only writes when
+    # the version it loaded is still current (see patch_enrollment_grade).
+    version = models.PositiveIntegerField(default=0, editable=False, verbose_name="版本")
 
     def __str__(self):
         return f"{self.student.username} 選修 {self.course.code} ({self.semester})"
 
+    def save(self, *args, **kwargs):
+        policy = getattr(self.course, 'grading_policy', None) or GradingPolicy()
+        self.total_grade = policy.compute_total(self.midterm_grade, self.final_grade)
+        if not self._state.adding:
+            self.version += 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'midterm_grade', 'final_grade'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'total_grade', 'version'}
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "選課紀錄"
         verbose_name_plural = "選課紀錄管理"
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'course', 'semester'], name='unique_enrollment_per_semester'),
+        ]
+
+
+class ArchivedEnrollment(models.Model):
+    """An enrollment of a closed semester, moved out of the live Enrollment table.
+
+    Rows are moved in bulk by ``manage.py archive_enrollments`` (see
+    grades.archive) and are read-only; transcripts and averages in
+    grades.grading read both tables.
+    """
+    student = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="學生", related_name='archived_enrollments')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, verbose_name="課程", related_name='archived_enrollments')
+    semester = models.CharField(max_length=20, blank=True, default='', verbose_name="學期")
+    midterm_grade = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True, verbose_name="期中成績")
+    final_grade = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True, verbose_name="期末成績")
+    total_grade = models.DecimalField(max_digits=9, decimal_places=2, null=True, blank=True, verbose_name="總成績")
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="封存時間")
+
+    def __str__(self):
+        return f"{self.student.username} 選修 {self.course.code} ({self.semester}, 已封存)"
+
+    class Meta:
+        verbose_name = "封存選課紀錄"
+        verbose_name_plural = "封存選課紀錄"
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'course', 'semester'], name='unique_archived_enrollment_per_semester'),
+        ]
+        indexes = [
+            models.Index(fields=['semester'], name='archived_enrollment_semester'),
+        ]
+
+
+class EnrollmentRequest(models.Model):
+    """A queued enroll/drop, written in rush mode and applied in batches.
+
+    See grades.enrollment.apply_enrollment_requests and the
+    ``process_enrollment_queue`` command.
+    """
+    PENDING, DONE, REJECTED = 'pending', 'done', 'rejected'
+    STATUS_CHOICES = [(PENDING, '處理中'), (DONE, '完成'), (REJECTED, '未成功')]
+    ACTION_CHOICES = [('enroll', '加選'), ('drop', '退選')]
+
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='enrollment_requests', verbose_name="學生")
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='enrollment_requests', verbose_name="課程")
+    semester = models.CharField(max_length=20, blank=True, default='', verbose_name="學期")
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, verbose_name="動作")
+    # set when a teacher or staff enrolls the student, who may skip the
+    # prerequisite and timetable checks the worker applies to self-enrollment
+    override = models.BooleanField(default=False, verbose_name="略過先修與衝堂檢查")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name="狀態")
+    message = models.CharField(max_length=200, blank=True, default='', verbose_name="結果")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="送出時間")
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name="處理時間")
+
+    def __str__(self):
+        return f"#{self.pk} {self.student.username} {self.action} {self.course.code} ({self.status})"
+
+    class Meta:
+        verbose_name = "選課佇列"
+        verbose_name_plural = "選課佇列"
+        indexes = [
+            # the worker scans pending requests oldest first
+            models.Index(fields=['status', 'id'], name='enrollment_request_queue'),
+        ]
+
+
+class WaitlistEntry(models.Model):
+    """A student waiting for a seat in a full course, first come first served.
+
+    grades.waitlist.promote() moves the front of the line into Enrollment
+    whenever seats free up.
+    """
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='waitlist_entries', verbose_name="學生")
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='waitlist_entries', verbose_name="課程")
+    semester = models.CharField(max_length=20, blank=True, default='', verbose_name="學期")
+    joined_at = models.DateTimeField(default=timezone.now, verbose_name="登記時間")
+
+    def __str__(self):
+        return f"{self.student.username} 候補 {self.course.code} ({self.semester})"
+
+    class Meta:
+        verbose_name = "候補名單"
+        verbose_name_plural = "候補名單"
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'course', 'semester'], name='unique_waitlist_entry'),
+        ]
+        indexes = [
+            # the line of one course: promotion takes its head, positions count the entries ahead
+            models.Index(fields=['course', 'semester', 'joined_at', 'id'], name='waitlist_order'),
+        ]
+
+
+class Task(models.Model):
+    """A queued call of a grades.taskqueue task, run by ``manage.py run_workers``."""
+    QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+    STATUS_CHOICES = [(QUEUED, '等待中'), (RUNNING, '執行中'), (DONE, '完成'), (FAILED, '失敗')]
+
+    name = models.CharField(max_length=200, verbose_name="工作")
+    args = models.JSONField(default=list, blank=True, verbose_name="參數")
+    kwargs = models.JSONField(default=dict, blank=True, verbose_name="具名參數")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, verbose_name="狀態")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="嘗試次數")
+    max_attempts = models.PositiveIntegerField(default=3, verbose_name="最多嘗試次數")
+    run_at = models.DateTimeField(default=timezone.now, verbose_name="預定執行時間")
+    last_error = models.TextField(blank=True, default='', verbose_name="最後錯誤")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="建立時間")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="開始時間")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="結束時間")
+
+    def __str__(self):
+        return f"#{self.pk} {self.name} ({self.status})"
+
+    class Meta:
+        verbose_name = "背景工作"
+        verbose_name_plural = "背景工作"
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='task_due'),
+        ]
 
 
 class Comment(models.Model):
@@ -83,50 +372,41 @@ class Comment(models.Model):
         return f"{self.user.username} @ {self.course.code}: {self.content[:30]}"
 
 
-# Helper: compute a student's average grade across all enrollments (both midterm and final)
-def _user_avg_grade(self):
-    qs = Enrollment.objects.filter(student=self)
-    total = 0.0
-    count = 0
-    for e in qs:
-        for g in (e.midterm_grade, e.final_grade):
-            if g is not None:
-                try:
-                    total += float(g)
-                    count += 1
-                except (TypeError, ValueError):
-                    continue
-    if count == 0:
-        return None
-    return round(total / count, 2)
-
-
-def _user_avg_for_semester(self, semester):
-    qs = Enrollment.objects.filter(student=self, semester=semester)
-    total = 0.0
-    count = 0
-    for e in qs:
-        for g in (e.midterm_grade, e.final_grade):
-            if g is not None:
-                try:
-                    total += float(g)
-                    count += 1
-                except (TypeError, ValueError):
-                    continue
-    if count == 0:
-        return None
-    return round(total / count, 2)
-
-
-# Attach helpers to User
-User.avg_grade = _user_avg_grade
-User.avg_grade_for_semester = _user_avg_for_semester
-
-
 @receiver(post_save, sender=User)
-def create_or_update_user_profile(sender, instance, created, **kwargs):
+def create_user_profile(sender, instance, created, **kwargs):
+    # Only on creation: User is also saved on every login (last_login), and a
+    # lookup there would cost each login an extra query. Users that predate the
+    # signal are covered by `manage.py backfill_profiles`.
     if created:
         Profile.objects.create(user=instance)
-    else:
-        # ensure a profile exists for existing users
-        Profile.objects.get_or_create(user=instance)
\ No newline at end of file
+
+
+@receiver(post_save, sender=GradingPolicy)
+def recompute_course_totals(sender, instance, **kwargs):
+    # one batched UPDATE for this course once the policy change is committed
+    from . import tasks
+    tasks.recompute_course_totals.delay(instance.course_id)
+
+
+@receiver(post_save, sender=Prerequisite)
+@receiver(post_delete, sender=Prerequisite)
+def rebuild_prerequisite_closure(sender, instance, **kwargs):
+    from .prerequisites import rebuild_closure
+    rebuild_closure()
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_save, sender=ArchivedEnrollment)
+def touch_semester(sender, instance, **kwargs):
+    Semester.touch([instance.semester])
+
+
+@receiver(post_save, sender=Enrollment)
+def forget_coalesced_enrollment(sender, instance, created, **kwargs):
+    # a cached enroll/drop outcome for this pair is stale once the row is
+    # created by any other path (admin, roster, another view). Deletes forget
+    # their keys at the call site: a post_delete receiver would turn every
+    # queryset delete into a SELECT plus one signal per row.
+    if created:
+        from .throttle import enrollment_key, forget
+        forget(enrollment_key(instance.student_id, instance.course_id))
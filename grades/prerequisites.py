@@ -0,0 +1,93 @@
+"""Course prerequisites: the closure index and enrollment eligibility.
+
+Prerequisite rows are the direct edges ("B requires A"); PrerequisiteClosure
+holds every pair of the transitive relation ("C requires B, and through it
+A") and is rebuilt from the edges whenever one changes, which is rare and
+cheap next to the enrollment checks it serves. A student may take a course
+when every course in its closure has been passed — a final grade of at
+least GRADES_PASS_GRADE in a live or archived enrollment — so the check is
+one NOT EXISTS subquery, also usable to filter whole course listings.
+"""
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import ArchivedEnrollment, Course, Enrollment, Prerequisite, PrerequisiteClosure
+
+
+def _edges():
+    graph = {}
+    for course_id, required_id in Prerequisite.objects.values_list('course_id', 'required_id'):
+        graph.setdefault(course_id, []).append(required_id)
+    return graph
+
+
+def creates_cycle(course_id, required_id):
+    """Whether adding the edge ``course requires required`` would close a loop."""
+    return course_id == required_id or PrerequisiteClosure.objects.filter(
+        course_id=required_id, required_id=course_id,
+    ).exists()
+
+
+def rebuild_closure():
+    """Bring PrerequisiteClosure in line with the current edges; returns (added, removed).
+
+    Breadth-first from every course, so ``depth`` is the shortest chain;
+    only the difference to the stored rows is written.
+    """
+    graph = _edges()
+    wanted = {}
+    for start in graph:
+        queue = deque((required, 1) for required in graph[start])
+        while queue:
+            required, depth = queue.popleft()
+            if required == start or (start, required) in wanted:
+                continue
+            wanted[start, required] = depth
+            queue.extend((nxt, depth + 1) for nxt in graph.get(required, ()))
+    with transaction.atomic():
+        stored = {
+            (c, r): (pk, depth)
+            for pk, c, r, depth in PrerequisiteClosure.objects.values_list('id', 'course_id', 'required_id', 'depth')
+        }
+        stale = [pk for pair, (pk, depth) in stored.items() if wanted.get(pair) != depth]
+        PrerequisiteClosure.objects.filter(id__in=stale).delete()
+        kept = {pair for pair, (pk, depth) in stored.items() if pk not in stale}
+        added = [
+            PrerequisiteClosure(course_id=c, required_id=r, depth=depth)
+            for (c, r), depth in wanted.items() if (c, r) not in kept
+        ]
+        PrerequisiteClosure.objects.bulk_create(added)
+    return len(added), len(stale)
+
+
+def _passed(model, student):
+    return model.objects.filter(
+        student=student, final_grade__gte=settings.GRADES_PASS_GRADE,
+    ).values('course_id')
+
+
+def unmet_prerequisites(student):
+    """Closure rows whose required course the student has not passed yet."""
+    return (
+        PrerequisiteClosure.objects
+        .exclude(required_id__in=_passed(Enrollment, student))
+        .exclude(required_id__in=_passed(ArchivedEnrollment, student))
+    )
+
+
+def eligible_courses(student, queryset=None):
+    """``queryset`` (default all courses) narrowed to those the student may enroll in."""
+    if queryset is None:
+        queryset = Course.objects.all()
+    return queryset.exclude(Exists(unmet_prerequisites(student).filter(course_id=OuterRef('pk'))))
+
+
+def missing_prerequisites(student, course):
+    """Codes of the courses still to pass before ``course``, nearest first; empty when eligible."""
+    return list(
+        unmet_prerequisites(student).filter(course=course)
+        .order_by('depth', 'required__code').values_list('required__code', flat=True)
+    )
@@ -0,0 +1,185 @@
+"""On-demand profiles of single requests (see ProfilingMiddleware).
+
+A profile is stored under GRADES_PROFILE_DIR as ``<name>.json`` (request,
+timings, top functions and every SQL query with the line of our code that
+issued it) plus, in cProfile mode, ``<name>.prof`` for ``python -m pstats``
+or snakeviz. Only the newest GRADES_PROFILE_KEEP profiles are kept.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+
+MODES = ('cprofile', 'sql')
+# <timestamp to the microsecond>-<random>, so names sort oldest to newest
+NAME = re.compile(r'^\d{8}-\d{12}-[0-9a-f]{8}$')
+TOP_FUNCTIONS = 30
+
+# frames from these files never count as a query's origin
+_SKIP = {__file__, os.path.join(os.path.dirname(__file__), 'middleware.py')}
+
+
+def profile_dir():
+    return Path(getattr(settings, 'GRADES_PROFILE_DIR', Path(settings.BASE_DIR) / 'profiles'))
+
+
+def requested_mode(request):
+    """The mode asked for by the X-Profile header or ``_profile`` parameter, else None."""
+    value = request.headers.get('X-Profile') or request.GET.get('_profile')
+    if not value:
+        return None
+    return value if value in MODES else 'cprofile'
+
+
+def _origin():
+    """``file:line in function`` of the innermost project frame outside this module."""
+    base = str(settings.BASE_DIR)
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(base) and filename not in _SKIP and 'site-packages' not in filename:
+            return f'{os.path.relpath(filename, base)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return '?'
+
+
+class QueryLog:
+    """``connection.execute_wrapper`` that keeps each query's SQL, time and origin."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({'sql': sql, 'ms': (time.perf_counter() - start) * 1000, 'origin': _origin()})
+
+    def duplicates(self):
+        """Statements run more than once (same SQL, any parameters), most repeated first."""
+        groups = {}
+        for query in self.queries:
+            group = groups.setdefault(query['sql'], {'sql': query['sql'], 'count': 0, 'ms': 0.0, 'origins': {}})
+            group['count'] += 1
+            group['ms'] += query['ms']
+            group['origins'][query['origin']] = group['origins'].get(query['origin'], 0) + 1
+        repeated = [g for g in groups.values() if g['count'] > 1]
+        for group in repeated:
+            group['origins'] = sorted(group['origins'].items(), key=lambda item: -item[1])
+        return sorted(repeated, key=lambda g: (-g['count'], -g['ms']))
+
+
+def _top_functions(profiler):
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, lineno, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': f'{name} ({os.path.basename(filename)}:{lineno})' if lineno else name,
+            'calls': ncalls,
+            'tottime_ms': tottime * 1000,
+            'cumtime_ms': cumtime * 1000,
+        })
+    rows.sort(key=lambda row: -row['cumtime_ms'])
+    return rows[:TOP_FUNCTIONS]
+
+
+def profile_request(request, get_response, mode):
+    """Run ``get_response(request)`` under the profiler; returns (response, profile name)."""
+    log = QueryLog()
+    profiler = cProfile.Profile() if mode == 'cprofile' else None
+    if profiler:
+        try:
+            profiler.enable()
+        except ValueError:
+            # another profiler is already active (e.g. the server itself runs under one)
+            profiler, mode = None, 'sql'
+    start = time.perf_counter()
+    with connection.execute_wrapper(log):
+        try:
+            response = get_response(request)
+        finally:
+            if profiler:
+                profiler.disable()
+    elapsed = (time.perf_counter() - start) * 1000
+
+    now = timezone.now()
+    name = f"{now:%Y%m%d-%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    summary = {
+        'name': name,
+        'mode': mode,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'user': request.user.get_username(),
+        'status': response.status_code,
+        'created_at': now.isoformat(),
+        'duration_ms': elapsed,
+        'sql_ms': sum(q['ms'] for q in log.queries),
+        'queries': log.queries,
+        'duplicates': log.duplicates(),
+        'functions': _top_functions(profiler) if profiler else [],
+    }
+    if profiler:
+        profiler.dump_stats(directory / f'{name}.prof')
+    (directory / f'{name}.json').write_text(json.dumps(summary, ensure_ascii=False), encoding='utf-8')
+    _prune(directory)
+    return response, name
+
+
+def _prune(directory):
+    keep = getattr(settings, 'GRADES_PROFILE_KEEP', 100)
+    for path in sorted(directory.glob('*.json'), reverse=True)[keep:]:
+        path.unlink(missing_ok=True)
+        path.with_suffix('.prof').unlink(missing_ok=True)
+
+
+def recent_profiles(limit=50):
+    """Summaries (without the per-query list) of the newest profiles, newest first."""
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    rows = []
+    for path in sorted(directory.glob('*.json'), reverse=True)[:limit]:
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            continue
+        data['query_count'] = len(data.pop('queries'))
+        data['duplicate_count'] = sum(g['count'] - 1 for g in data.pop('duplicates'))
+        data.pop('functions')
+        rows.append(data)
+    return rows
+
+
+def load_profile(name):
+    """The full summary of one profile, or None for an unknown or malformed name."""
+    if not NAME.match(name):
+        return None
+    path = profile_dir() / f'{name}.json'
+    try:
+        data = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    data['has_pstats'] = path.with_suffix('.prof').exists()
+    return data
+
+
+def pstats_path(name):
+    if not NAME.match(name):
+        return None
+    path = profile_dir() / f'{name}.prof'
+    return path if path.exists() else None
+
@@ -0,0 +1,131 @@
+"""Carry a semester's course offerings and rosters into the next one.
+
+Courses are not per-semester here: a Course row, with its teacher (the
+Course.teacher FK), slots, prerequisites and capacity, is reused every
+term, and what a semester offers is the set of courses with enrollments in
+it. Rolling over therefore registers the new Semester and, for continuing
+courses, clones the old roster as fresh Enrollment rows with empty grades.
+
+Rows are cloned in id-ordered batches, one transaction and one bulk_create
+per batch; pairs already enrolled or waitlisted in the new semester are
+skipped, so a re-run (or a run after an interruption) only adds what is
+missing. Students beyond a course's capacity join its waitlist instead.
+"""
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import ArchivedEnrollment, Course, Enrollment, Semester, WaitlistEntry
+
+
+def offered_courses(semester, codes=None):
+    """Courses with live or archived enrollments in ``semester``, optionally limited to ``codes``."""
+    courses = Course.objects.filter(
+        Q(enrollments__semester=semester) | Q(archived_enrollments__semester=semester)
+    ).distinct()
+    if codes:
+        courses = courses.filter(code__in=codes)
+    return courses.select_related('teacher').order_by('code')
+
+
+def _free_seats(courses, semester):
+    """``{course id: seats a cloned student may take}`` for the capped ``courses``.
+
+    A course that already has a line in ``semester`` gives no seats: the
+    clones queue behind it and the promoter seats everyone in order.
+    """
+    capped = [course for course in courses if course.capacity is not None]
+    taken = dict(
+        Enrollment.objects.filter(semester=semester, course__in=capped)
+        .values_list('course_id').annotate(n=Count('id'))
+    )
+    lines = set(WaitlistEntry.objects.filter(semester=semester, course__in=capped).values_list('course_id', flat=True))
+    return {
+        course.id: 0 if course.id in lines else max(0, course.capacity - taken.get(course.id, 0))
+        for course in capped
+    }
+
+
+def _clone(source, from_semester, to_semester, course_ids, seats, batch_size):
+    """Clone ``source`` rows into ``to_semester``; returns (created, waitlisted, skipped).
+
+    ``seats`` (see _free_seats) is used up as rows are placed; students past
+    a course's capacity join its waitlist in roster order.
+    """
+    from .throttle import enrollment_key, forget_many
+
+    created = waitlisted = skipped = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                source.objects.filter(semester=from_semester, course_id__in=course_ids, id__gt=last_id)
+                .order_by('id').values_list('id', 'student_id', 'course_id')[:batch_size]
+            )
+            if not batch:
+                return created, waitlisted, skipped
+            last_id = batch[-1][0]
+            lookup = {
+                'semester': to_semester,
+                'student_id__in': {student for _, student, _ in batch},
+                'course_id__in': {course for _, _, course in batch},
+            }
+            taken = set(Enrollment.objects.filter(**lookup).values_list('student_id', 'course_id'))
+            taken |= set(WaitlistEntry.objects.filter(**lookup).values_list('student_id', 'course_id'))
+            enroll, wait = [], []
+            for _, student, course in batch:
+                if (student, course) in taken:
+                    continue
+                if course not in seats:
+                    enroll.append((student, course))
+                elif seats[course]:
+                    seats[course] -= 1
+                    enroll.append((student, course))
+                else:
+                    wait.append((student, course))
+            Enrollment.objects.bulk_create(
+                [Enrollment(student_id=student, course_id=course, semester=to_semester) for student, course in enroll],
+                ignore_conflicts=True,
+            )
+            # one timestamp, so the line follows the ids, i.e. roster order
+            now = timezone.now()
+            WaitlistEntry.objects.bulk_create(
+                [
+                    WaitlistEntry(student_id=student, course_id=course, semester=to_semester, joined_at=now)
+                    for student, course in wait
+                ],
+                ignore_conflicts=True,
+            )
+            if enroll:
+                Semester.touch([to_semester])
+            created += len(enroll)
+            waitlisted += len(wait)
+            skipped += len(batch) - len(enroll) - len(wait)
+        # bulk writes send no signals, so drop replayed outcomes here
+        forget_many(enrollment_key(student, course) for student, course in enroll)
+
+
+def rollover(from_semester, to_semester, codes=None, rosters=False, batch_size=2000):
+    """Register ``to_semester`` and optionally clone rosters; returns (courses, created, waitlisted, skipped).
+
+    Cloned rosters respect Course.capacity: the overflow joins the course's
+    waitlist, and capped courses with a line get a promotion for any seats
+    still free.
+    """
+    from .waitlist import seats_freed
+
+    Semester.objects.get_or_create(code=to_semester)
+    courses = list(offered_courses(from_semester, codes))
+    created = waitlisted = skipped = 0
+    if rosters and courses:
+        course_ids = [course.id for course in courses]
+        seats = _free_seats(courses, to_semester)
+        for source in (Enrollment, ArchivedEnrollment):
+            c, w, s = _clone(source, from_semester, to_semester, course_ids, seats, batch_size)
+            created += c
+            waitlisted += w
+            skipped += s
+        # seats the clones could not take because a line was already waiting
+        for course_id in seats:
+            seats_freed(course_id, to_semester)
+    return courses, created, waitlisted, skipped
@@ -0,0 +1,282 @@
+"""Precomputed report snapshots for closed semesters.
+
+A snapshot file is a small header followed by fixed-width columns:
+
+    b'GRSNAP01' | uint32 header length | JSON header | padding | columns...
+
+The JSON header holds the semester, the Semester.data_version and source
+checksum it was built from, a CRC of the column data, the student/course
+lookup tables and each column's typecode, offset and length. Columns are plain ``array`` buffers aligned to 8 bytes, so a reader
+memory-maps the file and casts slices with ``memoryview`` without copying.
+Missing grades are stored as NaN.
+"""
+import array
+import hashlib
+import itertools
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import zlib
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ArchivedEnrollment, Enrollment, Semester
+
+
+MAGIC = b'GRSNAP01'
+ALIGN = 8
+NAN = float('nan')
+
+ENROLLMENT_COLUMNS = (('e_student', 'i'), ('e_course', 'i'), ('e_midterm', 'd'), ('e_final', 'd'), ('e_total', 'd'))
+STUDENT_COLUMNS = (('s_count', 'i'), ('s_avg', 'd'), ('s_rank', 'i'))
+COURSE_COLUMNS = (('c_count', 'i'), ('c_graded', 'i'), ('c_avg', 'd'), ('c_min', 'd'), ('c_max', 'd'))
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def snapshot_dir():
+    return Path(getattr(settings, 'GRADES_SNAPSHOT_DIR', settings.BASE_DIR / 'snapshots'))
+
+
+def snapshot_path(semester):
+    if not re.fullmatch(r'[A-Za-z0-9_-]+', semester):
+        raise SnapshotError(f'invalid semester code: {semester!r}')
+    return snapshot_dir() / f'{semester}.gsnap'
+
+
+def source_checksum(semester):
+    """SHA-256 over every (student, course, grades) row of the semester, live and archived.
+
+    It reads the whole semester, so it is only used by ``snapshot_semester
+    --verify``; report requests compare Semester.data_version instead. Rows
+    are sorted first, so moving them between the two tables (grades.archive)
+    does not change it.
+    """
+    lines = sorted(
+        '|'.join(map(str, row))
+        for model in (Enrollment, ArchivedEnrollment)
+        for row in model.objects.filter(semester=semester)
+        .values_list('student_id', 'course_id', 'midterm_grade', 'final_grade', 'total_grade')
+        .iterator(chunk_size=2000)
+    )
+    return hashlib.sha256('\n'.join(lines).encode()).hexdigest()
+
+
+def data_version(semester):
+    """Current Semester.data_version of ``semester`` (0 without a Semester row)."""
+    return Semester.objects.filter(code=semester).values_list('data_version', flat=True).first() or 0
+
+
+def _float(value):
+    return NAN if value is None else float(value)
+
+
+def _clean(value):
+    return None if value is None or math.isnan(value) else round(value, 2)
+
+
+def compute_report(semester):
+    """Aggregate a semester's enrollments (live, then archived) in a single pass."""
+    students, courses = {}, {}
+    e_cols = {name: array.array(code) for name, code in ENROLLMENT_COLUMNS}
+    student_counts = defaultdict(int)
+    student_totals = defaultdict(list)
+    course_totals = defaultdict(list)
+    course_counts = defaultdict(int)
+    sources = [
+        model.objects.filter(semester=semester)
+        .order_by('id')
+        .values_list('student_id', 'student__username', 'course_id', 'course__code', 'course__name',
+                     'midterm_grade', 'final_grade', 'total_grade')
+        .iterator(chunk_size=2000)
+        for model in (Enrollment, ArchivedEnrollment)
+    ]
+    for student_id, username, course_id, code, name, mid, fin, total in itertools.chain(*sources):
+        s_idx = students.setdefault(student_id, (len(students), username))[0]
+        c_idx = courses.setdefault(course_id, (len(courses), code, name))[0]
+        e_cols['e_student'].append(s_idx)
+        e_cols['e_course'].append(c_idx)
+        e_cols['e_midterm'].append(_float(mid))
+        e_cols['e_final'].append(_float(fin))
+        e_cols['e_total'].append(_float(total))
+        student_counts[s_idx] += 1
+        course_counts[c_idx] += 1
+        if total is not None:
+            student_totals[s_idx].append(float(total))
+            course_totals[c_idx].append(float(total))
+
+    s_cols = {name: array.array(code) for name, code in STUDENT_COLUMNS}
+    averages = []
+    for s_idx in range(len(students)):
+        totals = student_totals.get(s_idx, [])
+        avg = sum(totals) / len(totals) if totals else NAN
+        averages.append(avg)
+        s_cols['s_count'].append(student_counts[s_idx])
+        s_cols['s_avg'].append(avg)
+    # competition ranking (1, 2, 2, 4) by average; students without grades rank 0
+    order = sorted((i for i, a in enumerate(averages) if not math.isnan(a)), key=lambda i: -averages[i])
+    ranks = [0] * len(students)
+    for pos, i in enumerate(order):
+        ranks[i] = ranks[order[pos - 1]] if pos and averages[order[pos - 1]] == averages[i] else pos + 1
+    s_cols['s_rank'].extend(ranks)
+
+    c_cols = {name: array.array(code) for name, code in COURSE_COLUMNS}
+    for c_idx in range(len(courses)):
+        totals = course_totals.get(c_idx, [])
+        c_cols['c_count'].append(course_counts[c_idx])
+        c_cols['c_graded'].append(len(totals))
+        c_cols['c_avg'].append(sum(totals) / len(totals) if totals else NAN)
+        c_cols['c_min'].append(min(totals) if totals else NAN)
+        c_cols['c_max'].append(max(totals) if totals else NAN)
+
+    return {
+        'students': [[sid, username] for sid, (_, username) in students.items()],
+        'courses': [[cid, code, name] for cid, (_, code, name) in courses.items()],
+        'columns': {**e_cols, **s_cols, **c_cols},
+    }
+
+
+def report_rows(report):
+    """Turn column data (arrays or memoryviews) into the rows the report template shows."""
+    cols = report['columns']
+    courses = [
+        {'code': code, 'name': name, 'count': cols['c_count'][i], 'graded': cols['c_graded'][i],
+         'avg': _clean(cols['c_avg'][i]), 'min': _clean(cols['c_min'][i]), 'max': _clean(cols['c_max'][i])}
+        for i, (_, code, name) in enumerate(report['courses'])
+    ]
+    students = [
+        {'username': username, 'count': cols['s_count'][i], 'avg': _clean(cols['s_avg'][i]), 'rank': cols['s_rank'][i]}
+        for i, (_, username) in enumerate(report['students'])
+    ]
+    students.sort(key=lambda r: (r['rank'] == 0, r['rank'], r['username']))
+    return {'courses': courses, 'students': students}
+
+
+def write_snapshot(semester, path=None):
+    """Freeze ``semester`` into a snapshot file; returns (path, number of enrollments)."""
+    path = Path(path) if path else snapshot_path(semester)
+    # read first: a write while the report is computed leaves the snapshot stale
+    version = data_version(semester)
+    checksum = source_checksum(semester)
+    report = compute_report(semester)
+
+    layout, blobs, offset = {}, [], 0
+    for name, column in report['columns'].items():
+        data = column.tobytes()
+        layout[name] = {'typecode': column.typecode, 'offset': offset, 'length': len(column)}
+        pad = -len(data) % ALIGN
+        blobs.append(data + b'\0' * pad)
+        offset += len(data) + pad
+    body = b''.join(blobs)
+    header = json.dumps({
+        'semester': semester,
+        'created_at': timezone.now().isoformat(),
+        'data_version': version,
+        'source_checksum': checksum,
+        'data_crc32': zlib.crc32(body),
+        'students': report['students'],
+        'courses': report['courses'],
+        'columns': layout,
+    }, ensure_ascii=False).encode('utf-8')
+    header += b' ' * (-(len(MAGIC) + 4 + len(header)) % ALIGN)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(header)) + header + body)
+    os.replace(tmp, path)
+    return path, len(report['columns']['e_student'])
+
+
+class SemesterSnapshot:
+    """Read-only, memory-mapped view of a snapshot file."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise SnapshotError(f'{self.path} is not a snapshot file')
+        (header_len,) = struct.unpack_from('<I', self._mm, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(bytes(self._mm[start:start + header_len]))
+        self._data_start = start + header_len
+        self._student_index = {sid: i for i, (sid, _) in enumerate(self.header['students'])}
+
+    @property
+    def semester(self):
+        return self.header['semester']
+
+    @property
+    def source_checksum(self):
+        return self.header['source_checksum']
+
+    def column(self, name):
+        meta = self.header['columns'][name]
+        start = self._data_start + meta['offset']
+        size = array.array(meta['typecode']).itemsize * meta['length']
+        return memoryview(self._mm)[start:start + size].cast(meta['typecode'])
+
+    def verify(self):
+        """True if the column data is intact (CRC matches the header)."""
+        return zlib.crc32(self._mm[self._data_start:]) == self.header['data_crc32']
+
+    @property
+    def data_version(self):
+        return self.header.get('data_version')
+
+    def is_stale(self):
+        """True if the semester's rows no longer match what was frozen (full checksum)."""
+        return source_checksum(self.semester) != self.source_checksum
+
+    def rows(self):
+        columns = {name: self.column(name) for name in self.header['columns']}
+        return report_rows({'students': self.header['students'], 'courses': self.header['courses'], 'columns': columns})
+
+    def student_average(self, student_id):
+        i = self._student_index.get(student_id)
+        return None if i is None else _clean(self.column('s_avg')[i])
+
+
+_open_snapshots = {}
+
+
+def load_snapshot(semester):
+    """Return the fresh snapshot for a closed semester, or None if reports must be computed live.
+
+    Opened files are kept per process and reopened when the file changes; the
+    closed and staleness checks are one lookup of the Semester row.
+    """
+    version = Semester.objects.filter(code=semester, is_closed=True).values_list('data_version', flat=True).first()
+    if version is None:
+        return None
+    try:
+        path = snapshot_path(semester)
+        mtime = path.stat().st_mtime_ns
+    except (SnapshotError, OSError):
+        return None
+    cached = _open_snapshots.get(path)
+    if cached is None or cached[0] != mtime:
+        try:
+            cached = (mtime, SemesterSnapshot(path))
+        except (SnapshotError, ValueError, OSError):
+            return None
+        _open_snapshots[path] = cached
+    snapshot = cached[1]
+    return snapshot if snapshot.data_version == version else None
+
+
+def semester_report(semester):
+    """Report rows for ``semester`` plus whether they came from a snapshot."""
+    snapshot = load_snapshot(semester)
+    if snapshot is not None:
+        return snapshot.rows(), True
+    return report_rows(compute_report(semester)), False
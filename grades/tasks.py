@@ -0,0 +1,54 @@
+"""Background tasks (see grades.taskqueue). Call them with ``.delay(...)``."""
+import io
+import os
+
+from .taskqueue import task
+
+
+AVATAR_SIZE = (256, 256)
+
+
+@task(max_attempts=3, backoff=30)
+def process_avatar(profile_id):
+    """Shrink an uploaded avatar to AVATAR_SIZE and store it in place of the original."""
+    from PIL import Image, ImageOps
+    from django.core.files.base import ContentFile
+    from .models import Profile
+
+    profile = Profile.objects.filter(id=profile_id).first()
+    if profile is None or not profile.avatar:
+        return
+    with profile.avatar.open('rb') as f:
+        image = Image.open(f)
+        if image.width <= AVATAR_SIZE[0] and image.height <= AVATAR_SIZE[1]:
+            return
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(AVATAR_SIZE)
+        fmt = 'PNG' if image.mode in ('RGBA', 'LA', 'P') else 'JPEG'
+        buffer = io.BytesIO()
+        image.convert('RGBA' if fmt == 'PNG' else 'RGB').save(buffer, fmt, optimize=True)
+    old_name = profile.avatar.name
+    stem = os.path.splitext(old_name)[0]
+    # store the resized file first: if this fails the original is still in place for a retry
+    profile.avatar.save(f'{os.path.basename(stem)}.{fmt.lower()}', ContentFile(buffer.getvalue()), save=False)
+    profile.save(update_fields=['avatar'])
+    if profile.avatar.name != old_name:
+        profile.avatar.storage.delete(old_name)
+
+
+@task
+def recompute_course_totals(course_id):
+    from .grading import recompute_course
+    recompute_course(course_id)
+
+
+@task(max_attempts=2, backoff=60)
+def rebuild_semester_snapshot(semester):
+    from .snapshots import write_snapshot
+    write_snapshot(semester)
+
+
+@task
+def promote_waitlist(course_id, semester=''):
+    from .waitlist import promote
+    promote(course_id, semester)
@@ -0,0 +1,47 @@
+"""Template loaders that strip layout whitespace from template sources.
+
+The source is minified once when it is loaded (and kept by the cached
+loader), so rendering pays nothing extra. Only indentation, trailing spaces,
+blank lines and the line break after a line holding a single template tag
+are removed. Other line breaks stay, so text that wraps across lines keeps
+its word spacing. ``<pre>`` and ``<textarea>`` blocks are left untouched.
+"""
+import re
+
+from django.template.loaders import app_directories, filesystem
+
+
+_PRESERVE = re.compile(r'(<(pre|textarea)\b.*?</\2>)', re.IGNORECASE | re.DOTALL)
+_INDENT = re.compile(r'\n[ \t]+')
+_TRAILING = re.compile(r'[ \t]+\n')
+_BLANK_LINES = re.compile(r'\n{2,}')
+_TAG_ONLY_LINE = re.compile(r'^(\{%[^\n]*?%\}|\{#[^\n]*?#\})\n', re.MULTILINE)
+
+
+def minify_source(source):
+    parts = _PRESERVE.split(source)
+    out = []
+    # re.split with two groups yields [text, block, tagname, text, block, tagname, ...]
+    for i in range(0, len(parts), 3):
+        text = parts[i]
+        text = _TRAILING.sub('\n', text)
+        text = _INDENT.sub('\n', text)
+        text = _BLANK_LINES.sub('\n', text)
+        text = _TAG_ONLY_LINE.sub(r'\1', text)
+        out.append(text)
+        if i + 1 < len(parts):
+            out.append(parts[i + 1])
+    return ''.join(out)
+
+
+class MinifyingMixin:
+    def get_contents(self, origin):
+        return minify_source(super().get_contents(origin))
+
+
+class FilesystemLoader(MinifyingMixin, filesystem.Loader):
+    pass
+
+
+class AppDirectoriesLoader(MinifyingMixin, app_directories.Loader):
+    pass
@@ -1,4 +1,5 @@
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, Client
 from django.urls import reverse
 from django.contrib.auth.models import User
 from .models import Course, Enrollment, Profile
@@ -6,6 +7,7 @@ from .models import Course, Enrollment, Profile
 
 class FlowTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = Client()
 
         # create teacher user
@@ -103,3 +105,1256 @@ class FlowTests(TestCase):
 from django.test import TestCase
 
 # Create your tests here.
+
+
+class SessionModeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(username='student1', password='pass')
+        self.course = Course.objects.create(name='Test Course', code='T100')
+
+    def test_signed_cookie_sessions_write_no_session_rows(self):
+        from django.contrib.sessions.models import Session
+        with self.settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies'):
+            client = Client()
+            client.post(reverse('login'), {'username': 'student1', 'password': 'pass'})
+            resp = client.post(reverse('enroll_course'), {'course_id': str(self.course.id), 'action': 'enroll'})
+        self.assertEqual(resp.status_code, 302)
+        self.assertTrue(Enrollment.objects.filter(student=self.student, course=self.course).exists())
+        self.assertEqual(Session.objects.count(), 0)
+
+    def test_messages_do_not_modify_session(self):
+        self.client.login(username='student1', password='pass')
+        resp = self.client.post(reverse('enroll_course'), {'course_id': str(self.course.id), 'action': 'enroll'})
+        self.assertIn('messages', resp.cookies)
+        self.assertNotIn('_messages', self.client.session)
+
+    def test_bench_session_writes_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('bench_session_writes', '--modes', 'db', 'signed_cookies', stdout=out)
+        self.assertIn('signed_cookies', out.getvalue())
+        self.assertFalse(Course.objects.filter(code='__BENCH').exists())
+
+
+class EnrollmentAdminTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.admin = User.objects.create_superuser(username='admin', password='pass')
+        self.course = Course.objects.create(name='Test Course', code='T100')
+        self.other = Course.objects.create(name='Other Course', code='T200')
+        self.enrollments = [
+            Enrollment.objects.create(
+                student=User.objects.create_user(username=f's{i}', password='pass'),
+                course=self.course, semester='2026S', midterm_grade=70, final_grade=80,
+            )
+            for i in range(5)
+        ]
+        self.client.login(username='admin', password='pass')
+        self.url = reverse('admin:grades_enrollment_changelist')
+
+    def test_changelist_query_count_does_not_grow_with_rows(self):
+        from django.core.cache import cache
+        from django.test.utils import CaptureQueriesContext
+        from django.db import connection
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(self.url)
+        for i in range(10):
+            Enrollment.objects.create(student=User.objects.create_user(username=f'x{i}'), course=self.other)
+        cache.clear()
+        with CaptureQueriesContext(connection) as large:
+            resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(small), len(large))
+        # the COUNT(*) is served from cache on the next hit
+        with CaptureQueriesContext(connection) as cached:
+            self.client.get(self.url)
+        self.assertEqual(len(cached), len(large) - 1)
+
+    def _run_action(self, action, follow=False, **extra):
+        data = {'action': action, '_selected_action': [e.id for e in self.enrollments], **extra}
+        return self.client.post(self.url, data, follow=follow)
+
+    def test_bulk_actions(self):
+        self._run_action('set_semester', semester='2026F')
+        self.assertEqual(Enrollment.objects.filter(semester='2026F').count(), 5)
+        self._run_action('clear_grades')
+        self.assertFalse(Enrollment.objects.filter(final_grade__isnull=False).exists())
+        # an inline edit from a page loaded before the clear must get a conflict
+        self.assertEqual(set(Enrollment.objects.values_list('version', flat=True)), {1})
+        self._run_action('move_to_course', course_code='T200')
+        self.assertEqual(Enrollment.objects.filter(course=self.other).count(), 5)
+
+    def test_actions_skip_rows_that_would_collide(self):
+        student = self.enrollments[0].student
+        Enrollment.objects.create(student=student, course=self.course, semester='2026F')
+        Enrollment.objects.create(student=student, course=self.other, semester='2026S')
+        resp = self._run_action('set_semester', semester='2026F')
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(Enrollment.objects.filter(course=self.course, semester='2026F').count(), 5)
+        self.assertEqual(Enrollment.objects.get(id=self.enrollments[0].id).semester, '2026S')
+        resp = self._run_action('move_to_course', course_code='T200', follow=True)
+        self.assertContains(resp, '已將 4 筆選課紀錄移至 T200；1 筆因學生已有相同課程與學期的選課紀錄而略過')
+
+    def test_reassign_resolves_collisions_in_sql(self):
+        from django.contrib.admin.sites import site
+        student = self.enrollments[0].student
+        # a second row of s0 in the selection: only the lower id may move into 2026F
+        extra = Enrollment.objects.create(student=student, course=self.course, semester='2025F')
+        model_admin = site._registry[Enrollment]
+        with self.assertNumQueries(6):
+            result = model_admin._reassign(None, Enrollment.objects.filter(course=self.course), semester='2026F')
+        self.assertEqual(result, (5, 1))
+        self.assertEqual(Enrollment.objects.get(id=extra.id).semester, '2025F')
+        for i in range(10):
+            Enrollment.objects.create(student=User.objects.create_user(username=f'x{i}'), course=self.course, semester='2026S')
+        # the query count does not grow with the selection
+        with self.assertNumQueries(6):
+            result = model_admin._reassign(None, Enrollment.objects.filter(course=self.course), semester='2026F')
+        self.assertEqual(result, (15, 1))
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher1', password='pass')
+        self.teacher.profile.is_teacher = True
+        self.teacher.profile.save()
+        self.student = User.objects.create_user(username='student1', password='pass')
+        self.other = User.objects.create_user(username='student2', password='pass')
+        self.course = Course.objects.create(name='Test Course', code='T100', teacher=self.teacher)
+        self.unrelated = Course.objects.create(name='Other Course', code='T200')
+        Enrollment.objects.create(student=self.student, course=self.course, semester='2026S', midterm_grade=70, final_grade=90)
+        Enrollment.objects.create(student=self.other, course=self.unrelated, semester='2026S')
+
+    def test_course_fields_and_cursor_pagination(self):
+        resp = self.client.get(reverse('api_courses'), {'fields': 'code', 'limit': 1})
+        data = resp.json()
+        self.assertEqual(data['results'], [{'code': 'T100'}])
+        resp = self.client.get(reverse('api_courses'), {'fields': 'code', 'limit': 1, 'cursor': data['next_cursor']})
+        data = resp.json()
+        self.assertEqual(data['results'], [{'code': 'T200'}])
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual(self.client.get(reverse('api_courses'), {'fields': 'secret'}).status_code, 400)
+
+    def test_etag_and_gzip(self):
+        Course.objects.bulk_create(Course(name=f'Filler Course {i}', code=f'F{i:03}') for i in range(20))
+        resp = self.client.get(reverse('api_courses'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        resp = self.client.get(reverse('api_courses'), HTTP_IF_NONE_MATCH=resp['ETag'])
+        self.assertEqual(resp.status_code, 304)
+
+    def test_enrollment_permissions(self):
+        self.assertEqual(self.client.get(reverse('api_enrollments')).status_code, 403)
+        self.client.login(username='student1', password='pass')
+        rows = self.client.get(reverse('api_enrollments')).json()['results']
+        self.assertEqual([r['student'] for r in rows], ['student1'])
+        self.client.login(username='teacher1', password='pass')
+        rows = self.client.get(reverse('api_enrollments')).json()['results']
+        self.assertEqual([r['course'] for r in rows], ['T100'])
+
+    def test_student_summary(self):
+        self.client.login(username='student1', password='pass')
+        data = self.client.get(reverse('api_student_summary', args=[self.student.id])).json()
+        self.assertEqual(data['average'], 80.0)
+        self.assertEqual(data['semesters'][0]['semester'], '2026S')
+        resp = self.client.get(reverse('api_student_summary', args=[self.other.id]))
+        self.assertEqual(resp.status_code, 403)
+
+
+class BulkEnrollTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(username='teacher1', password='pass')
+        self.course = Course.objects.create(name='Test Course', code='T100', teacher=self.teacher)
+        self.students = [User.objects.create_user(username=f's{i}', password='pass') for i in range(3)]
+        Enrollment.objects.create(student=self.students[0], course=self.course)
+
+    def test_bulk_enroll_summary(self):
+        from .enrollment import bulk_enroll
+        with self.assertNumQueries(6):  # users, existing, savepoint, insert, semester version, release
+            summary = bulk_enroll(self.course, 's0, s1\ns2 ghost s1')
+        self.assertEqual(summary, {'inserted': ['s1', 's2'], 'skipped': ['s0'], 'unknown': ['ghost']})
+        self.assertEqual(Enrollment.objects.filter(course=self.course).count(), 3)
+
+    def test_bulk_enroll_forgets_replayed_outcomes(self):
+        from .enrollment import bulk_enroll
+        from .throttle import coalesce, enrollment_key
+        # s1's drop before being enrolled must not be replayed once the teacher enrolls them
+        key = enrollment_key(self.students[1].id, self.course.id)
+        coalesce(key, 'drop', lambda: 'not enrolled')
+        bulk_enroll(self.course, 's1')
+        self.assertEqual(coalesce(key, 'drop', lambda: 'dropped'), 'dropped')
+
+    def test_view_accepts_csv_and_requires_teacher(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        url = reverse('bulk_enroll_course', args=[self.course.id])
+        self.client.login(username='s1', password='pass')
+        self.client.post(url, {'usernames': 's1'})
+        self.assertFalse(Enrollment.objects.filter(student=self.students[1]).exists())
+
+        self.client.login(username='teacher1', password='pass')
+        upload = SimpleUploadedFile('cohort.csv', b'username\ns1\ns2\n', content_type='text/csv')
+        resp = self.client.post(url, {'csv_file': upload, 'semester': ''})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context['summary']['inserted'], ['s1', 's2'])
+
+        upload = SimpleUploadedFile('cohort.csv', 'username\ns1\n'.encode('big5') + b'\xff\xfe', content_type='text/csv')
+        resp = self.client.post(url, {'csv_file': upload, 'semester': ''})
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('csv_file', resp.context['form'].errors)
+
+    def test_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('bulk_enroll', 'T100', 's1', 's2', '--semester', '2026F', stdout=out)
+        self.assertIn('Inserted 2', out.getvalue())
+        self.assertEqual(Enrollment.objects.filter(semester='2026F').count(), 2)
+
+
+class LoginPathTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username='student1', password='pass')
+
+    def test_user_save_does_not_touch_profile(self):
+        with self.assertNumQueries(1):
+            self.student.save(update_fields=['last_login'])
+
+    def test_request_user_loaded_with_profile(self):
+        from .backends import ProfileModelBackend
+        user = ProfileModelBackend().get_user(self.student.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(user.profile.user_id, self.student.id)
+
+    def test_backfill_profiles(self):
+        from io import StringIO
+        from django.core.management import call_command
+        other = User.objects.create_user(username='student2', password='pass')
+        Profile.objects.filter(user__in=[self.student, other]).delete()
+        out = StringIO()
+        call_command('backfill_profiles', '--batch-size', '1', stdout=out)
+        self.assertIn('Created 2 profiles', out.getvalue())
+        self.assertEqual(Profile.objects.filter(user__in=[self.student, other]).count(), 2)
+
+    def test_bench_login_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('bench_login', '--logins', '2', stdout=out)
+        self.assertIn('legacy', out.getvalue())
+        self.assertIn('current', out.getvalue())
+
+
+class GradingTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(name='Test Course', code='T100')
+        self.students = [User.objects.create_user(username=f's{i}', password='pass') for i in range(3)]
+        self.enrollments = [
+            Enrollment.objects.create(student=s, course=self.course, semester='2026S', midterm_grade=60, final_grade=80)
+            for s in self.students
+        ]
+
+    def test_total_stored_on_save(self):
+        from decimal import Decimal
+        self.assertEqual(self.enrollments[0].total_grade, Decimal('70.00'))
+        e = Enrollment.objects.create(student=self.students[0], course=self.course, semester='2026F', midterm_grade=60)
+        self.assertIsNone(e.total_grade)
+
+    def test_policy_change_recomputes_course_in_one_update(self):
+        from decimal import Decimal
+        from .models import GradingPolicy
+        with self.captureOnCommitCallbacks(execute=True):
+            GradingPolicy.objects.create(course=self.course, midterm_weight=Decimal('0.4'),
+                                         final_weight=Decimal('0.6'), scale=Decimal('1.1'), curve=Decimal('2'))
+        totals = set(Enrollment.objects.values_list('total_grade', flat=True))
+        self.assertEqual(totals, {Decimal('81.20')})  # (24 + 48) * 1.1 + 2
+
+    def test_recompute_semester(self):
+        from decimal import Decimal
+        from .grading import recompute_semester
+        Enrollment.objects.update(total_grade=None)
+        with self.assertNumQueries(6):  # policies, course ids, savepoint, one UPDATE per course, semester version, release
+            self.assertEqual(recompute_semester('2026S'), 3)
+        self.assertEqual(Enrollment.objects.filter(total_grade=Decimal('70')).count(), 3)
+
+    def test_averages_use_stored_totals(self):
+        from .grading import student_average, semester_averages
+        self.assertEqual(student_average(self.students[0]), 70.0)
+        self.assertEqual(semester_averages(self.students[0]), {'2026S': 70.0})
+
+    def test_main_overview_queries_do_not_grow_with_students(self):
+        User.objects.create_user(username='admin', password='pass', is_staff=True)
+        self.client.login(username='admin', password='pass')
+        self.client.get(reverse('main'))
+        from django.test.utils import CaptureQueriesContext
+        from django.db import connection
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(reverse('main'))
+        for i in range(5):
+            Enrollment.objects.create(student=User.objects.create_user(username=f'x{i}'), course=self.course)
+        with CaptureQueriesContext(connection) as after:
+            resp = self.client.get(reverse('main'))
+        self.assertEqual(len(before), len(after))
+        self.assertContains(resp, '70.0')
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from .models import Semester
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        settings_override = self.settings(GRADES_SNAPSHOT_DIR=self.tmp.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.course = Course.objects.create(name='Test Course', code='T100')
+        self.students = [User.objects.create_user(username=f's{i}', password='pass') for i in range(3)]
+        for s, (mid, fin) in zip(self.students, [(80, 90), (60, 70), (80, 90)]):
+            Enrollment.objects.create(student=s, course=self.course, semester='2026S', midterm_grade=mid, final_grade=fin)
+        Semester.objects.create(code='2026S', is_closed=True)
+
+    def test_snapshot_roundtrip_and_ranks(self):
+        from .snapshots import SemesterSnapshot, write_snapshot
+        path, rows = write_snapshot('2026S')
+        self.assertEqual(rows, 3)
+        snap = SemesterSnapshot(path)
+        self.assertTrue(snap.verify())
+        self.assertFalse(snap.is_stale())
+        report = snap.rows()
+        self.assertEqual([(r['username'], r['rank']) for r in report['students']], [('s0', 1), ('s2', 1), ('s1', 3)])
+        self.assertEqual(report['courses'][0]['avg'], 78.33)
+        self.assertEqual(snap.student_average(self.students[1].id), 65.0)
+
+    def test_stale_snapshot_falls_back_to_live_query(self):
+        from .snapshots import load_snapshot, write_snapshot
+        write_snapshot('2026S')
+        self.assertIsNotNone(load_snapshot('2026S'))
+        with self.assertNumQueries(1):
+            self.assertIsNotNone(load_snapshot('2026S'))
+        e = Enrollment.objects.get(student=self.students[1])
+        e.final_grade = 100
+        e.save()
+        self.assertIsNone(load_snapshot('2026S'))
+
+    def test_verify_checksum_catches_swapped_grades(self):
+        from .snapshots import SemesterSnapshot, write_snapshot
+        path, _ = write_snapshot('2026S')
+        # same sums, different rows: only a full checksum notices
+        Enrollment.objects.filter(student=self.students[0]).update(midterm_grade=60, final_grade=70)
+        Enrollment.objects.filter(student=self.students[1]).update(midterm_grade=80, final_grade=90)
+        self.assertTrue(SemesterSnapshot(path).is_stale())
+
+    def test_report_view_reads_snapshot(self):
+        from io import StringIO
+        from django.core.management import call_command
+        call_command('snapshot_semester', '2026S', stdout=StringIO())
+        User.objects.create_user(username='admin', password='pass', is_staff=True)
+        self.client.login(username='admin', password='pass')
+        resp = self.client.get(reverse('semester_report', args=['2026S']))
+        self.assertTrue(resp.context['from_snapshot'])
+        self.assertContains(resp, '78.33')
+        self.client.login(username='s1', password='pass')
+        resp = self.client.get(reverse('semester_average', args=['2026S']))
+        self.assertEqual(resp.context['avg'], 65.0)
+
+
+class StaticAssetTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = self.settings(
+            STATIC_ROOT=tmp.name,
+            GRADES_SERVE_STATIC=True,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'grades.storage.CompressedManifestStaticFilesStorage'},
+            },
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        call_command('collectstatic', interactive=False, stdout=StringIO())
+
+    def test_pages_reference_hashed_local_bootstrap(self):
+        resp = self.client.get(reverse('login'))
+        self.assertNotContains(resp, 'cdn.jsdelivr.net')
+        self.assertRegex(resp.content.decode(), r'/static/grades/vendor/bootstrap-5\.3\.8/css/bootstrap\.min\.[0-9a-f]{12}\.css')
+
+    def test_precompressed_variant_served_with_far_future_cache(self):
+        from django.templatetags.static import static
+        url = static('grades/vendor/bootstrap-5.3.8/css/bootstrap.min.css')
+        resp = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        self.assertEqual(resp['Content-Type'], 'text/css')
+        self.assertIn('immutable', resp['Cache-Control'])
+        resp.close()
+        resp = self.client.get(url)
+        self.assertNotIn('Content-Encoding', resp)
+        resp.close()
+
+
+class PayloadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(username='t1', password='pass')
+        self.teacher.profile.is_teacher = True
+        self.teacher.profile.save()
+        self.course = Course.objects.create(name='Course', code='P100', teacher=self.teacher)
+        self.students = [User.objects.create_user(username=f's{i}', password='pass') for i in range(5)]
+        self.enrollments = [Enrollment.objects.create(student=s, course=self.course) for s in self.students]
+
+    def test_gzip_only_above_threshold(self):
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .middleware import ThresholdGZipMiddleware
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        with self.settings(GRADES_GZIP=True, GRADES_GZIP_MIN_LENGTH=1024):
+            small = ThresholdGZipMiddleware(lambda r: HttpResponse('x' * 500))(request)
+            large = ThresholdGZipMiddleware(lambda r: HttpResponse('x' * 5000))(request)
+        self.assertNotIn('Content-Encoding', small)
+        self.assertEqual(large['Content-Encoding'], 'gzip')
+
+    def test_minifying_loader_keeps_output_and_pre(self):
+        from .template_loaders import minify_source
+        source = '<ul>\n  {% for i in items %}\n    <li>{{ i }}</li>\n  {% endfor %}\n\n</ul>\n<pre>\n  a\n</pre>\n'
+        self.assertEqual(minify_source(source), '<ul>\n{% for i in items %}<li>{{ i }}</li>\n{% endfor %}</ul>\n<pre>\n  a\n</pre>\n')
+
+    def test_staff_main_page_shares_one_drop_form(self):
+        User.objects.create_superuser(username='admin', password='pass')
+        self.client.login(username='admin', password='pass')
+        resp = self.client.get(reverse('main'))
+        # enroll form + drop form + logout form in base.html, regardless of row count
+        self.assertEqual(resp.content.decode().count('csrfmiddlewaretoken'), 3)
+        resp = self.client.post(reverse('enroll_course'), {'enrollment_id': self.enrollments[0].id})
+        self.assertEqual(resp.status_code, 302)
+        self.assertFalse(Enrollment.objects.filter(id=self.enrollments[0].id).exists())
+
+    def test_roster_form_saves_changed_rows(self):
+        self.client.login(username='t1', password='pass')
+        first, second = self.enrollments[:2]
+        data = {f'midterm_{e.id}': '' for e in self.enrollments}
+        data.update({f'final_{e.id}': '' for e in self.enrollments})
+        data.update({f'version_{e.id}': '0' for e in self.enrollments})
+        data.update({f'midterm_{first.id}': '80', f'final_{first.id}': '90', f'midterm_{second.id}': '-1'})
+        self.client.post(reverse('update_course_grades', args=[self.course.id]), data)
+        first.refresh_from_db()
+        self.assertIsNone(first.midterm_grade)  # negative grade rejected the whole submission
+
+        data[f'midterm_{second.id}'] = '70'
+        data[f'final_{second.id}'] = '60'
+        resp = self.client.post(reverse('update_course_grades', args=[self.course.id]), data)
+        self.assertEqual(resp.status_code, 302)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.total_grade, 85)
+        self.assertEqual(second.total_grade, 65)
+        self.assertIsNone(Enrollment.objects.get(id=self.enrollments[2].id).midterm_grade)
+
+    def test_roster_form_rejects_non_finite_and_out_of_range_grades(self):
+        self.client.login(username='t1', password='pass')
+        first = self.enrollments[0]
+        url = reverse('update_course_grades', args=[self.course.id])
+        for raw in ('NaN', 'Infinity', 'sNaN', '1e400', '100000'):
+            resp = self.client.post(url, {f'midterm_{first.id}': raw, f'final_{first.id}': '', f'version_{first.id}': '0'}, follow=True)
+            self.assertEqual(resp.status_code, 200, raw)
+            self.assertContains(resp, f'{first.student.username} 的期中成績')
+            first.refresh_from_db()
+            self.assertIsNone(first.midterm_grade)
+
+
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(username='s1', password='pass')
+        self.course = Course.objects.create(name='Course', code='R100')
+        self.client.login(username='s1', password='pass')
+
+    def test_token_bucket_returns_429_when_empty(self):
+        url = reverse('enroll_student_course', args=[self.course.id])
+        with self.settings(GRADES_THROTTLE_RATES={'enroll': (3, 0.001)}):
+            codes = [self.client.get(url).status_code for _ in range(4)]
+        self.assertEqual(codes, [302, 302, 302, 429])
+
+    def test_concurrent_requests_cannot_spend_the_same_token(self):
+        import threading
+        import time
+        from unittest import mock
+        from . import throttle
+
+        class SlowCache:
+            """The test cache, with a pause after each read to widen the race window."""
+            def __getattr__(self, name):
+                return getattr(cache, name)
+
+            def get(self, *args):
+                value = cache.get(*args)
+                time.sleep(0.01)
+                return value
+
+        taken, barrier = [], threading.Barrier(10)
+
+        def request():
+            barrier.wait()
+            taken.append(throttle.take_token('enroll', 'u1', 3, 0.001) == 0)
+
+        with mock.patch.object(throttle, '_cache', SlowCache):
+            threads = [threading.Thread(target=request) for _ in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(taken.count(True), 3)
+
+    def test_repeated_enroll_reuses_outcome_until_state_changes(self):
+        from django.test.utils import CaptureQueriesContext
+        from django.db import connection
+        url = reverse('enroll_course')
+        data = {'course_id': self.course.id, 'action': 'enroll'}
+        self.client.post(url, data)
+        with CaptureQueriesContext(connection) as repeat:
+            self.client.post(url, data)
+        self.assertFalse(any('enrollment' in q['sql'].lower() for q in repeat.captured_queries))
+
+        # a drop elsewhere invalidates the replayed outcome, so enrolling again hits the database
+        enrollment = Enrollment.objects.get(student=self.student)
+        self.client.get(reverse('drop_course', args=[enrollment.id]))
+        self.client.post(url, data)
+        self.assertTrue(Enrollment.objects.filter(student=self.student, course=self.course).exists())
+
+    def test_in_flight_duplicate_waits_for_first_outcome(self):
+        import threading
+        from .throttle import coalesce
+        started, release, calls = threading.Event(), threading.Event(), []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'done'
+
+        first = threading.Thread(target=lambda: calls.append(coalesce('k', 'enroll', slow)))
+        first.start()
+        started.wait(5)
+        with self.settings(GRADES_COALESCE_WAIT=0):
+            self.assertIsNone(coalesce('k', 'enroll', slow))
+        release.set()
+        first.join()
+        self.assertEqual(coalesce('k', 'enroll', slow), 'done')
+        self.assertEqual(calls, [1, 'done'])
+
+
+class StartupTests(TestCase):
+    def test_boot_stays_lazy_and_within_import_budget(self):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        # a worker boot (setup + URLconf) must not pull in forms, view modules or report helpers
+        call_command('startup_profile', '--runs', '1', '--max-modules', '600', stdout=out)
+        report = out.getvalue()
+        self.assertIn('grades.models', report)
+        for module in ('grades.forms', 'grades.views.teacher', 'grades.views.public', 'grades.snapshots', 'grades.enrollment'):
+            self.assertNotIn(module, report)
+
+    def test_views_package_resolves_names_lazily(self):
+        from . import views
+        from .views.teacher import teacher_courses
+        self.assertIs(views.teacher_courses, teacher_courses)
+        self.assertEqual(views.lazy_view('main').__name__, 'main')
+        with self.assertRaises(AttributeError):
+            views.no_such_view
+
+
+class RushModeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.students = [User.objects.create_user(username=f's{i}', password='pass') for i in range(3)]
+        self.hot = Course.objects.create(name='Hot', code='H100')
+        self.quiet = Course.objects.create(name='Quiet', code='Q100')
+
+    def test_rush_mode_queues_and_status_endpoint_reports_pending(self):
+        from .models import EnrollmentRequest
+        self.client.login(username='s0', password='pass')
+        with self.settings(GRADES_RUSH_MODE=True):
+            resp = self.client.post(reverse('enroll_course'), {'course_id': self.hot.id, 'action': 'enroll'})
+        self.assertEqual(resp.status_code, 302)
+        self.assertFalse(Enrollment.objects.exists())
+        req = EnrollmentRequest.objects.get()
+        status = self.client.get(reverse('enrollment_request_status', args=[req.id])).json()
+        self.assertEqual((status['status'], status['position']), ('pending', 0))
+
+        from django.core.management import call_command
+        from io import StringIO
+        call_command('process_enrollment_queue', '--once', stdout=StringIO())
+        status = self.client.get(reverse('enrollment_request_status', args=[req.id])).json()
+        self.assertEqual(status['status'], 'done')
+        self.assertTrue(Enrollment.objects.filter(student=self.students[0], course=self.hot).exists())
+
+    def test_batches_are_fair_across_courses_and_ordered_within_a_pair(self):
+        from .enrollment import apply_enrollment_requests, enqueue_request, next_request_batch
+        for s in self.students:
+            enqueue_request(s, self.hot, 'enroll')
+        late = enqueue_request(self.students[0], self.quiet, 'enroll')
+        enqueue_request(self.students[1], self.hot, 'drop')
+        enqueue_request(self.students[2], self.quiet, 'drop')
+
+        batch = next_request_batch(2)
+        self.assertEqual([r.course_id for r in batch], [self.hot.id, self.quiet.id])
+        self.assertIn(late, batch)
+
+        counts = apply_enrollment_requests(next_request_batch(100))
+        self.assertEqual(counts, {'done': 5, 'rejected': 1})
+        self.assertEqual(
+            sorted(Enrollment.objects.values_list('student__username', 'course__code')),
+            [('s0', 'H100'), ('s0', 'Q100'), ('s2', 'H100')],
+        )
+
+
+flaky_calls = []
+
+
+def _flaky(x):
+    flaky_calls.append(x)
+    if len(flaky_calls) == 1:
+        raise RuntimeError('first attempt fails')
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        from .taskqueue import task
+        flaky_calls.clear()
+        self.flaky = task(max_attempts=2, backoff=0)(_flaky)
+
+    def test_eager_mode_runs_after_commit(self):
+        with self.settings(GRADES_TASKS_EAGER=True):
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                self.assertIsNone(self.flaky.delay(1))
+            self.assertEqual(flaky_calls, [])
+            callbacks[0]()
+        self.assertEqual(flaky_calls, [1])
+
+    def test_eager_failure_is_recorded_not_raised(self):
+        from .models import Task
+        from .taskqueue import claim, execute
+        with self.settings(GRADES_TASKS_EAGER=True):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.flaky.delay(3)
+            row = Task.objects.get()
+            self.assertEqual((row.name, row.args, row.status, row.attempts), (self.flaky.name, [3], Task.QUEUED, 1))
+            self.assertIn('first attempt fails', row.last_error)
+            # a successful eager call leaves no row behind
+            with self.captureOnCommitCallbacks(execute=True):
+                self.flaky.delay(4)
+        self.assertEqual(Task.objects.count(), 1)
+        # the worker picks up the retry like any other queued task
+        self.assertTrue(execute(claim(5)[0]))
+        self.assertEqual(flaky_calls, [3, 4, 3])
+
+    def test_retry_with_backoff_then_success(self):
+        from .models import Task
+        from .taskqueue import claim, execute
+        with self.settings(GRADES_TASKS_EAGER=False):
+            row = self.flaky.delay(7)
+        self.assertEqual(row.status, Task.QUEUED)
+
+        self.assertFalse(execute(claim(5)[0]))
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), (Task.QUEUED, 1))
+        self.assertIn('first attempt fails', row.last_error)
+
+        self.assertTrue(execute(claim(5)[0]))
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), (Task.DONE, 2))
+        self.assertEqual(claim(5), [])
+
+    def test_avatar_processed_by_task(self):
+        from io import BytesIO
+        from PIL import Image
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        import tempfile
+        user = User.objects.create_user(username='s1', password='pass')
+        self.client.login(username='s1', password='pass')
+        buffer = BytesIO()
+        Image.new('RGB', (800, 600), 'red').save(buffer, 'JPEG')
+        upload = SimpleUploadedFile('me.jpg', buffer.getvalue(), content_type='image/jpeg')
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('edit_profile'), {'full_name': 'S', 'avatar': upload})
+            user.profile.refresh_from_db()
+            with user.profile.avatar.open('rb') as f:
+                self.assertEqual(Image.open(f).size, (256, 192))
+            # the resized file replaced the upload
+            import os
+            self.assertEqual([name for _, _, names in os.walk(media) for name in names], [os.path.basename(user.profile.avatar.name)])
+
+
+class RunWorkersTests(TransactionTestCase):
+    def test_thread_pool_drains_queue(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import GradingPolicy, Task
+        course = Course.objects.create(name='C', code='W100')
+        student = User.objects.create_user(username='w1')
+        Enrollment.objects.create(student=student, course=course, midterm_grade=50, final_grade=100)
+        with self.settings(GRADES_TASKS_EAGER=False):
+            GradingPolicy.objects.create(course=course, curve=5)
+        self.assertEqual(Task.objects.get().status, Task.QUEUED)
+        call_command('run_workers', '--once', '--concurrency', '2', stdout=StringIO())
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+        self.assertEqual(Enrollment.objects.get().total_grade, 80)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        from .models import Semester
+        self.course = Course.objects.create(name='Test Course', code='T100')
+        self.student = User.objects.create_user(username='s1', password='pass')
+        self.other = User.objects.create_user(username='s2', password='pass')
+        Enrollment.objects.create(student=self.student, course=self.course, semester='2025F', midterm_grade=60, final_grade=80)
+        Enrollment.objects.create(student=self.other, course=self.course, semester='2025F', midterm_grade=90, final_grade=90)
+        Enrollment.objects.create(student=self.student, course=self.course, semester='2026S', midterm_grade=100, final_grade=100)
+        Semester.objects.create(code='2025F', is_closed=True)
+
+    def test_archive_and_restore_round_trip(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from .models import ArchivedEnrollment
+        with self.assertRaises(CommandError):
+            call_command('archive_enrollments', '2026S', stdout=StringIO())
+        call_command('archive_enrollments', '--all-closed', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(list(Enrollment.objects.values_list('semester', flat=True)), ['2026S'])
+        archived = ArchivedEnrollment.objects.get(student=self.student)
+        self.assertEqual((archived.semester, archived.total_grade), ('2025F', 70))
+        call_command('archive_enrollments', '2025F', '--restore', stdout=StringIO())
+        self.assertEqual(Enrollment.objects.count(), 3)
+        self.assertFalse(ArchivedEnrollment.objects.exists())
+
+    def test_averages_and_reports_unchanged(self):
+        from .archive import archive_semester
+        from .grading import semester_summary, student_average
+        from .snapshots import source_checksum
+        User.objects.create_superuser(username='admin', password='pass')
+        self.client.login(username='admin', password='pass')
+
+        def overview():
+            return {row['username']: row['avg'] for row in self.client.get(reverse('main')).context['rows']}
+
+        before = (student_average(self.student), semester_summary(self.student), source_checksum('2025F'), overview())
+        self.assertEqual(archive_semester('2025F'), (2, 0))
+        after = (student_average(self.student), semester_summary(self.student), source_checksum('2025F'), overview())
+        self.assertEqual(before, after)
+        self.assertEqual(after[3], {'s1': 85.0, 's2': 90.0})
+
+        self.client.login(username='s1', password='pass')
+        data = self.client.get(reverse('api_student_summary', args=[self.student.id])).json()
+        self.assertEqual([s['semester'] for s in data['semesters']], ['2025F', '2026S'])
+        resp = self.client.get(reverse('student_courses'))
+        self.assertEqual(len(resp.context['rows']), 2)
+        self.assertContains(resp, '已封存')
+
+
+class ReplayLoadTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _replay(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('replay_load', '--students', '3', '--teachers', '1', '--staff', '1', *args, stdout=out)
+        # endpoint -> (n, err%) from the table between the header and the summary line
+        return {cols[0]: (int(cols[1]), float(cols[3])) for cols in map(str.split, out.getvalue().splitlines()[1:-1])}
+
+    def test_synthetic_mix_keeps_teacher_grade_writes_valid(self):
+        # student drops go to the electives, so the graded rows stay and no grade write 404s
+        rows = self._replay('--users', '10', '--requests', '40', '--concurrency', '1', '--seed', '6')
+        self.assertGreater(rows['update_enrollment_grade'][0], 0)
+        self.assertEqual(rows['update_enrollment_grade'][1], 0.0)
+        self.assertGreater(rows['enroll_course'][0], 0)
+
+    def test_percentile_is_nearest_rank(self):
+        from .loadtest import percentile
+        values = list(range(1, 11))
+        self.assertEqual([percentile(values, p) for p in (0, 50, 90, 95, 100)], [1, 5, 9, 10, 10])
+        self.assertEqual(percentile(list(range(1, 21)), 95), 19)
+
+    def test_synthetic_mix_and_recorded_stream(self):
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        stream = os.path.join(tmp.name, 'stream.jsonl')
+
+        # one worker: SQLite test databases do not take concurrent writers well
+        rows = self._replay('--users', '3', '--requests', '4', '--concurrency', '1', '--seed', '7', '--save-stream', stream)
+        self.assertEqual(rows['TOTAL'], (15, 0.0))
+        self.assertEqual(rows['login'], (3, 0.0))
+        with open(stream) as fh:
+            self.assertEqual(len(fh.readlines()), 12)
+        self.assertEqual(Course.objects.filter(code__startswith='LOAD').exclude(code__startswith='LOADE').count(), 1)
+        self.assertEqual(Course.objects.filter(code__startswith='LOADE').count(), 3)
+
+        with open(stream, 'w') as fh:
+            fh.write('{"user": "student:1", "path": "/accounts/courses/"}\n{"user": "student:1", "path": "/no-such-page/"}\n')
+        rows = self._replay('--stream', stream)
+        self.assertEqual(rows['student_courses'], (1, 0.0))
+        self.assertEqual(rows['/no-such-page/'], (1, 100.0))
+
+        call_command('replay_load', '--cleanup', stdout=StringIO())
+        self.assertFalse(User.objects.filter(username__startswith='load_').exists())
+
+
+class TeacherDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(username='teacher1', password='pass')
+        self.teacher.profile.is_teacher = True
+        self.teacher.profile.save()
+        self.course = Course.objects.create(name='Graded', code='T100', teacher=self.teacher)
+        Course.objects.create(name='Empty', code='T200', teacher=self.teacher)
+        Course.objects.create(name='Someone else', code='T300')
+        for i, final in enumerate([90, 70, None]):
+            student = User.objects.create_user(username=f's{i}')
+            Enrollment.objects.create(student=student, course=self.course, midterm_grade=50, final_grade=final)
+        self.client.login(username='teacher1', password='pass')
+
+    def test_overview_is_one_cached_query(self):
+        resp = self.client.get(reverse('teacher_courses'))
+        graded, empty = resp.context['courses']
+        self.assertEqual((graded['code'], graded['students'], graded['graded'], graded['completion']), ('T100', 3, 2, 67))
+        self.assertEqual(graded['average'], 65)
+        self.assertEqual((empty['students'], empty['completion'], empty['average']), (0, None, None))
+
+        from .views.teacher import _course_overview
+        with self.assertNumQueries(0):
+            self.assertEqual(_course_overview(self.teacher.id), resp.context['courses'])
+        cache.clear()
+        with self.assertNumQueries(1):
+            _course_overview(self.teacher.id)
+
+        enrollment = Enrollment.objects.get(final_grade__isnull=True)
+        self.client.post(reverse('update_enrollment_grade', args=[enrollment.id]), {'midterm_grade': '50', 'final_grade': '50'})
+        graded = self.client.get(reverse('teacher_courses')).context['courses'][0]
+        self.assertEqual((graded['graded'], graded['completion']), (3, 100))
+
+
+class InlineGradeTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher1', password='pass')
+        self.teacher.profile.is_teacher = True
+        self.teacher.profile.save()
+        course = Course.objects.create(name='Test Course', code='T100', teacher=self.teacher)
+        student = User.objects.create_user(username='s1')
+        self.enrollment = Enrollment.objects.create(student=student, course=course, midterm_grade=60)
+        self.url = reverse('patch_enrollment_grade', args=[self.enrollment.id])
+        self.client.login(username='teacher1', password='pass')
+
+    def _patch(self, **payload):
+        import json
+        return self.client.patch(self.url, json.dumps(payload), content_type='application/json')
+
+    def test_patch_returns_row_and_detects_stale_version(self):
+        resp = self._patch(final_grade='80', version=0)
+        self.assertEqual(resp.json(), {'id': self.enrollment.id, 'midterm_grade': '60.00', 'final_grade': '80.00',
+                                       'total_grade': '70.00', 'version': 1})
+        # a second editor still holding version 0 must not overwrite it
+        resp = self._patch(final_grade='10', version=0)
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(resp.json()['row']['final_grade'], '80.00')
+        self.assertEqual(Enrollment.objects.get().final_grade, 80)
+        self.assertEqual(self._patch(final_grade='-5', version=1).status_code, 400)
+        self.assertEqual(self._patch(final_grade='NaN', version=1).status_code, 400)
+
+    def test_patch_rejects_grades_the_column_cannot_hold(self):
+        for value in (100000, '1e400', 'Infinity', 1001):
+            resp = self._patch(midterm_grade=value, version=0)
+            self.assertEqual(resp.status_code, 400, value)
+            self.assertTrue(resp.json()['detail'].startswith('期中成績'))
+        resp = self._patch(midterm_grade='88.555', version=0)
+        self.assertEqual(resp.json()['midterm_grade'], '88.56')
+        self.assertEqual(str(Enrollment.objects.get().midterm_grade), '88.56')
+
+    def test_form_saves_bump_version_and_skip_stale_rows(self):
+        e = self.enrollment
+        e.final_grade = 70
+        e.save()
+        self.assertEqual(Enrollment.objects.get().version, 1)
+        url = reverse('update_course_grades', args=[e.course_id])
+        self.client.post(url, {f'midterm_{e.id}': '90', f'final_{e.id}': '90', f'version_{e.id}': '0'})
+        self.assertEqual(Enrollment.objects.get().final_grade, 70)
+        self.client.post(url, {f'midterm_{e.id}': '90', f'final_{e.id}': '90', f'version_{e.id}': '1'})
+        self.assertEqual((Enrollment.objects.get().final_grade, Enrollment.objects.get().version), (90, 2))
+        # a post without the row's version cannot prove it saw the current grades
+        self.client.post(url, {f'midterm_{e.id}': '50', f'final_{e.id}': '50'})
+        self.assertEqual(Enrollment.objects.get().final_grade, 90)
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        import tempfile
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = self.settings(GRADES_PROFILING=True, GRADES_PROFILE_DIR=tmp.name, GRADES_PROFILE_KEEP=2)
+        override.enable()
+        self.addCleanup(override.disable)
+        # middleware is loaded on the first request, so start from a fresh client
+        self.client = Client()
+        self.staff = User.objects.create_user(username='admin1', password='pass', is_staff=True)
+        User.objects.create_user(username='student1', password='pass')
+
+    def test_staff_request_is_profiled_and_listed(self):
+        from .profiling import load_profile
+        self.client.login(username='admin1', password='pass')
+        resp = self.client.get(reverse('profiles'), {'_profile': 'cprofile'})
+        name = resp['X-Profile-Id']
+        profile = load_profile(name)
+        self.assertTrue(profile['has_pstats'])
+        self.assertTrue(profile['functions'])
+        self.assertTrue(all(q['origin'] != '?' for q in profile['queries']))
+
+        resp = self.client.get(reverse('main'), HTTP_X_PROFILE='sql')
+        self.assertFalse(load_profile(resp['X-Profile-Id'])['has_pstats'])
+        self.assertContains(self.client.get(reverse('profiles')), resp['X-Profile-Id'])
+        self.assertEqual(self.client.get(reverse('profile_detail', args=[name])).status_code, 200)
+        self.assertEqual(self.client.get(reverse('profile_pstats', args=[name])).status_code, 200)
+
+        # GRADES_PROFILE_KEEP=2: the first profile is pruned by the third
+        self.client.get(reverse('main'), HTTP_X_PROFILE='sql')
+        self.assertIsNone(load_profile(name))
+        self.assertEqual(self.client.get(reverse('profile_detail', args=['..'])).status_code, 404)
+
+    def test_non_staff_requests_are_not_profiled(self):
+        self.client.login(username='student1', password='pass')
+        resp = self.client.get(reverse('main'), {'_profile': 'cprofile'})
+        self.assertNotIn('X-Profile-Id', resp)
+        self.assertNotEqual(self.client.get(reverse('profiles')).status_code, 200)
+
+    def test_duplicate_queries_are_grouped(self):
+        from .profiling import QueryLog
+        log = QueryLog()
+        from django.db import connection
+        with connection.execute_wrapper(log):
+            for user in User.objects.all():
+                Enrollment.objects.filter(student=user).count()
+        duplicate, = log.duplicates()
+        self.assertEqual(duplicate['count'], 2)
+        self.assertIn('grades/tests.py', duplicate['origins'][0][0])
+
+
+class TimingTests(TestCase):
+    def setUp(self):
+        from . import timing
+        override = self.settings(GRADES_TIMING=True, GRADES_METRICS_TOKEN='scrape-me')
+        override.enable()
+        self.addCleanup(override.disable)
+        timing.reset()
+        self.client = Client()
+        Course.objects.create(name='Test Course', code='T100')
+        User.objects.create_user(username='admin1', password='pass', is_staff=True)
+
+    def test_header_log_line_and_metrics(self):
+        import json
+        with self.assertLogs('grades.timing', 'INFO') as logs:
+            resp = self.client.get(reverse('main'))
+            denied = self.client.get(reverse('metrics'))
+            data = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-me').json()
+        self.assertRegex(resp['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+;desc="templates", total;dur=[\d.]+$')
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line['view'], line['status']), ('main', 200))
+        self.assertGreater(line['queries'], 0)
+        self.assertGreater(line['template_ms'], 0)
+
+        self.assertEqual(denied.status_code, 403)
+        self.assertEqual(data['views']['main']['requests'], 1)
+        self.assertEqual(data['views']['metrics']['requests'], 1)
+        self.assertEqual(data['views']['main']['queries'], line['queries'])
+
+
+class ListingTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='t1', password='pass')
+        self.admin = User.objects.create_user(username='admin1', password='pass', is_staff=True)
+        self.course = Course.objects.create(name='Listing', code='L100', teacher=self.teacher)
+        self.students = [User.objects.create_user(username=f's{i}', password='pass') for i in range(3)]
+        for student in self.students:
+            Enrollment.objects.create(student=student, course=self.course, midterm_grade=60, final_grade=80)
+
+    def test_pages_render_plain_rows_with_constant_queries(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.db import connection
+
+        def call_bench(**options):
+            out = StringIO()
+            call_command('bench_templates', repeat=1, stdout=out, **options)
+            # queries column of every page: the templates never reach the database
+            return sum(float(line.split()[-1]) for line in out.getvalue().splitlines()[1:])
+        from django.test.utils import CaptureQueriesContext
+        self.client.login(username='admin1', password='pass')
+        with CaptureQueriesContext(connection) as few:
+            resp = self.client.get(reverse('main'))
+        self.assertContains(resp, 't1')  # teacher column from the course's own FK
+        for i in range(3, 8):
+            Enrollment.objects.create(student=User.objects.create_user(username=f's{i}'), course=self.course)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(reverse('main'))
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(call_bench(rows=40), 0)
+
+        self.client.login(username='s0', password='pass')
+        resp = self.client.get(reverse('course_detail', args=[self.course.id]))
+        visible = {row['student_name']: row['visible'] for row in resp.context['enrollments']}
+        self.assertEqual(visible, {f's{i}': i == 0 for i in range(8)})
+        self.assertFalse(resp.context['can_self_enroll'])
+        resp = self.client.get(reverse('student_courses'))
+        self.assertEqual([g['semester'] for g in resp.context['semesters']], [''])
+        self.assertContains(resp, '未指定學期')
+
+
+class DatabaseProfileTests(TransactionTestCase):
+    def test_bench_database_cleans_up_and_copy_refuses_same_database(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        out = StringIO()
+        call_command('bench_database', students=20, courses=10, ops=5, threads=1, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[2] for line in lines[1:]], ['grade_write', 'enroll_toggle', 'dashboard', 'search', 'stream'])
+        self.assertTrue(all(line.split()[-1] == '0' for line in lines[1:]))
+        self.assertFalse(User.objects.filter(username__startswith='bench_db_').exists())
+        self.assertFalse(Course.objects.filter(code__startswith='BDB').exists())
+
+        with self.assertRaises(CommandError):
+            call_command('copy_database', source='default', target='default', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('copy_database', source='nope', stdout=StringIO())
+
+
+class PrerequisiteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        from .models import Prerequisite
+        self.a = Course.objects.create(name='A', code='A100')
+        self.b = Course.objects.create(name='B', code='B200')
+        self.c = Course.objects.create(name='C', code='C300')
+        Prerequisite.objects.create(course=self.b, required=self.a)
+        self.edge = Prerequisite.objects.create(course=self.c, required=self.b)
+        self.student = User.objects.create_user(username='s1', password='pass')
+        self.client.login(username='s1', password='pass')
+
+    def test_closure_and_cycle_check(self):
+        from django.core.exceptions import ValidationError
+        from .models import Prerequisite, PrerequisiteClosure
+        pairs = set(PrerequisiteClosure.objects.values_list('course__code', 'required__code', 'depth'))
+        self.assertEqual(pairs, {('B200', 'A100', 1), ('C300', 'B200', 1), ('C300', 'A100', 2)})
+        with self.assertRaises(ValidationError):
+            Prerequisite(course=self.a, required=self.c).full_clean()
+        self.edge.delete()
+        self.assertEqual(PrerequisiteClosure.objects.count(), 1)
+
+    def test_enrollment_requires_passed_prerequisites(self):
+        from .models import ArchivedEnrollment
+        Enrollment.objects.create(student=self.student, course=self.a, midterm_grade=50, final_grade=55)
+        codes = [c.code for c in self.client.get(reverse('available_courses')).context['courses']]
+        self.assertEqual(codes, [])
+        resp = self.client.post(reverse('enroll_student_course', args=[self.b.id]), follow=True)
+        self.assertContains(resp, '先修課程：A100')
+        self.assertFalse(Enrollment.objects.filter(student=self.student, course=self.b).exists())
+
+        Enrollment.objects.filter(course=self.a).update(final_grade=75)
+        codes = [c.code for c in self.client.get(reverse('available_courses')).context['courses']]
+        self.assertEqual(codes, ['B200'])
+        # a pass kept in the archive counts too
+        ArchivedEnrollment.objects.create(student=self.student, course=self.b, semester='2025F', final_grade=80)
+        codes = [c.code for c in self.client.get(reverse('available_courses')).context['courses']]
+        self.assertEqual(codes, ['B200', 'C300'])
+        self.client.post(reverse('enroll_student_course', args=[self.c.id]))
+        self.assertTrue(Enrollment.objects.filter(student=self.student, course=self.c).exists())
+
+    def test_queued_enroll_rechecks_prerequisites_when_applied(self):
+        from .enrollment import apply_enrollment_requests, enqueue_request
+        passed = Enrollment.objects.create(student=self.student, course=self.a, final_grade=75)
+        queued = enqueue_request(self.student, self.b, 'enroll')
+        # the grade is corrected to a fail after the request was queued
+        Enrollment.objects.filter(id=passed.id).update(final_grade=40)
+        forced = enqueue_request(self.student, self.c, 'enroll', override=True)
+        apply_enrollment_requests([queued, forced])
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.message), ('rejected', '尚未通過 B200 的先修課程：A100'))
+        self.assertEqual(
+            sorted(Enrollment.objects.values_list('course__code', flat=True)), ['A100', 'C300'],
+        )
+
+
+class TimetableTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        from datetime import time
+        from .models import CourseSlot
+        self.student = User.objects.create_user(username='s1', password='pass')
+        self.math = Course.objects.create(name='Math', code='M100')
+        self.art = Course.objects.create(name='Art', code='A100')
+        self.music = Course.objects.create(name='Music', code='U100')
+        CourseSlot.objects.create(course=self.math, weekday=1, start_time=time(9), end_time=time(11))
+        # overlaps the last hour of math; music starts exactly when math ends
+        CourseSlot.objects.create(course=self.art, weekday=1, start_time=time(10), end_time=time(12))
+        CourseSlot.objects.create(course=self.music, weekday=1, start_time=time(11), end_time=time(12))
+        Enrollment.objects.create(student=self.student, course=self.math)
+        self.client.login(username='s1', password='pass')
+
+    def test_enroll_rejects_clash_and_listing_hides_it(self):
+        from .timetable import clashes
+        self.assertEqual([s.course.code for s in clashes(self.student, self.art)], ['M100'])
+        self.assertEqual(clashes(self.student, self.music), [])
+
+        resp = self.client.post(reverse('enroll_student_course', args=[self.art.id]), follow=True)
+        self.assertContains(resp, '上課時間衝突：M100（週一 09:00–11:00）')
+        self.assertFalse(Enrollment.objects.filter(student=self.student, course=self.art).exists())
+
+        url = reverse('available_courses')
+        self.assertEqual([c.code for c in self.client.get(url).context['courses']], ['A100', 'U100'])
+        self.assertEqual([c.code for c in self.client.get(url, {'hide_clashes': '1'}).context['courses']], ['U100'])
+        self.client.post(reverse('enroll_student_course', args=[self.music.id]))
+        self.assertTrue(Enrollment.objects.filter(student=self.student, course=self.music).exists())
+
+    def test_queued_enrolls_are_checked_against_the_batch_timetable(self):
+        from .enrollment import apply_enrollment_requests, enqueue_request
+        other = User.objects.create_user(username='s2', password='pass')
+        requests = [
+            # both clash with math; the second is fine once the first drops it
+            enqueue_request(self.student, self.art, 'enroll'),
+            enqueue_request(self.student, self.math, 'drop'),
+            enqueue_request(self.student, self.art, 'enroll'),
+            # queued together, so neither saw the other when it was checked
+            enqueue_request(other, self.math, 'enroll'),
+            enqueue_request(other, self.art, 'enroll'),
+        ]
+        with self.assertNumQueries(13):
+            counts = apply_enrollment_requests(requests)
+        self.assertEqual(counts, {'rejected': 2, 'done': 3})
+        self.assertEqual(requests[0].message, 'A100 與已選課程上課時間衝突：M100（週一 09:00–11:00）')
+        self.assertEqual(requests[4].status, 'rejected')
+        self.assertEqual(
+            sorted(Enrollment.objects.values_list('student__username', 'course__code')),
+            [('s1', 'A100'), ('s2', 'M100')],
+        )
+
+
+class WaitlistTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.students = [User.objects.create_user(username=f's{i}', password='pass') for i in range(4)]
+        self.course = Course.objects.create(name='Full', code='F100', capacity=1)
+
+    def _enroll(self, i):
+        self.client.login(username=f's{i}', password='pass')
+        return self.client.post(reverse('enroll_student_course', args=[self.course.id]), follow=True)
+
+    def test_full_course_waitlists_and_drop_promotes_in_order(self):
+        self._enroll(0)
+        self._enroll(1)
+        resp = self._enroll(2)
+        self.assertContains(resp, '已加入候補名單（第 2 位）')
+        self.assertEqual(Enrollment.objects.filter(course=self.course).count(), 1)
+        status = self.client.get(reverse('waitlist_status', args=[self.course.id])).json()
+        self.assertEqual((status['status'], status['position']), ('waiting', 2))
+
+        self.client.login(username='s0', password='pass')
+        enrollment = Enrollment.objects.get(student=self.students[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('drop_course', args=[enrollment.id]))
+        self.assertEqual(list(Enrollment.objects.values_list('student__username', flat=True)), ['s1'])
+
+        self.client.login(username='s2', password='pass')
+        status = self.client.get(reverse('waitlist_status', args=[self.course.id])).json()
+        self.assertEqual((status['status'], status['position']), ('waiting', 1))
+        self.assertContains(self.client.get(reverse('student_courses')), '第 <span class="waitlist-position">1</span> 位')
+        self.client.post(reverse('leave_waitlist', args=[self.course.id]))
+        self.assertEqual(self.client.get(reverse('waitlist_status', args=[self.course.id])).json()['status'], 'none')
+
+    def test_rush_batch_respects_capacity_and_promotes_after_drop(self):
+        from .enrollment import apply_enrollment_requests, enqueue_request
+        from .models import WaitlistEntry
+        requests = [enqueue_request(s, self.course, 'enroll') for s in self.students[:3]]
+        apply_enrollment_requests(requests)
+        self.assertEqual(list(Enrollment.objects.values_list('student__username', flat=True)), ['s0'])
+        self.assertEqual(
+            list(WaitlistEntry.objects.order_by('joined_at', 'id').values_list('student__username', flat=True)),
+            ['s1', 's2'],
+        )
+        # capacity raised to 2 and s0 drops: two seats for the line, filled in one batch
+        Course.objects.filter(id=self.course.id).update(capacity=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_enrollment_requests([enqueue_request(self.students[0], self.course, 'drop')])
+        self.assertEqual(sorted(Enrollment.objects.values_list('student__username', flat=True)), ['s1', 's2'])
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+
+class RolloverTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(username='t1', password='pass')
+        self.course = Course.objects.create(name='Continuing', code='R100', teacher=self.teacher)
+        self.other = Course.objects.create(name='Other', code='R200')
+        self.students = [User.objects.create_user(username=f's{i}', password='pass') for i in range(3)]
+        for student in self.students:
+            Enrollment.objects.create(student=student, course=self.course, semester='2026S', midterm_grade=80, final_grade=90)
+        Enrollment.objects.create(student=self.students[0], course=self.other, semester='2025F', final_grade=70)
+
+    def _rollover(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('rollover_semester', '--from', '2026S', '--to', '2026F', '--batch-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_rosters_cloned_with_empty_grades_and_rerun_is_idempotent(self):
+        from .models import Semester
+        out = self._rollover('--rosters')
+        self.assertIn('1 courses carried over, 1 with a teacher', out)
+        self.assertIn('created 3 enrollments', out)
+        self.assertTrue(Semester.objects.filter(code='2026F', is_closed=False).exists())
+        cloned = Enrollment.objects.filter(semester='2026F')
+        self.assertEqual(sorted(cloned.values_list('student__username', flat=True)), ['s0', 's1', 's2'])
+        self.assertEqual(set(cloned.values_list('course_id', 'midterm_grade', 'final_grade')), {(self.course.id, None, None)})
+
+        out = self._rollover('--rosters')
+        self.assertIn('created 0 enrollments', out)
+        self.assertIn('skipped 3 already enrolled or waiting', out)
+        self.assertEqual(Enrollment.objects.filter(semester='2026F').count(), 3)
+
+    def test_cloned_rows_forget_replayed_outcomes(self):
+        from .throttle import coalesce, enrollment_key
+        key = enrollment_key(self.students[1].id, self.course.id)
+        coalesce(key, 'enroll', lambda: 'enrolled last term')
+        self._rollover('--rosters')
+        self.assertEqual(coalesce(key, 'enroll', lambda: 'already enrolled'), 'already enrolled')
+
+    def test_capacity_caps_clones_and_waitlists_the_rest_in_roster_order(self):
+        from .models import WaitlistEntry
+        Course.objects.filter(id=self.course.id).update(capacity=2)
+        out = self._rollover('--rosters')
+        self.assertIn('created 2 enrollments', out)
+        self.assertIn('waitlisted 1 over capacity', out)
+        self.assertEqual(sorted(Enrollment.objects.filter(semester='2026F').values_list('student__username', flat=True)), ['s0', 's1'])
+        self.assertEqual(list(WaitlistEntry.objects.values_list('student__username', 'semester')), [('s2', '2026F')])
+        self.assertIn('skipped 3 already enrolled or waiting', self._rollover('--rosters'))
+        self.assertEqual(WaitlistEntry.objects.count(), 1)
+
+    def test_refuses_closed_target_and_empty_source(self):
+        from django.core.management.base import CommandError
+        from .models import Semester
+        with self.assertRaises(CommandError):
+            self._rollover('--courses', 'R200')
+        Semester.objects.create(code='2026F', is_closed=True)
+        with self.assertRaises(CommandError):
+            self._rollover('--rosters')
+        self.assertFalse(Enrollment.objects.filter(semester='2026F').exists())
@@ -0,0 +1,142 @@
+"""Cache-backed rate limiting and request coalescing for the enrollment endpoints.
+
+Both use plain get/set/add on a Django cache (GRADES_THROTTLE_CACHE), so they
+work with the local-memory and file backends; ``add`` doubles as a per-key
+lock around each bucket update and each coalesced operation. Local memory is per process:
+with several workers each one keeps its own buckets, which still bounds the
+database load per worker. The file backend is shared between processes on
+one host, but its ``add`` is not atomic, so two processes can occasionally
+both run a coalesced operation (the unique enrollment constraint keeps that
+harmless) or spend the same token.
+"""
+import functools
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+
+LOCK_TIMEOUT = 10
+POLL_INTERVAL = 0.05
+# a bucket is only locked for one get and set
+BUCKET_LOCK_TIMEOUT = 1
+BUCKET_POLL_INTERVAL = 0.005
+
+
+def _cache():
+    return caches[getattr(settings, 'GRADES_THROTTLE_CACHE', 'default')]
+
+
+def take_token(scope, ident, burst, refill):
+    """Take one token from the (scope, ident) bucket.
+
+    The bucket holds up to ``burst`` tokens and regains ``refill`` tokens per
+    second. Returns 0 when a token was taken, otherwise the seconds until the
+    next one is available (or BUCKET_LOCK_TIMEOUT when the bucket stayed
+    locked that long).
+    """
+    cache = _cache()
+    key = f'grades:bucket:{scope}:{ident}'
+    # the read-refill-write below runs under a per-bucket lock, so
+    # concurrent requests cannot both spend the same token
+    deadline = time.monotonic() + BUCKET_LOCK_TIMEOUT
+    while not cache.add(f'{key}:lock', 1, timeout=BUCKET_LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            return BUCKET_LOCK_TIMEOUT
+        time.sleep(BUCKET_POLL_INTERVAL)
+    try:
+        now = time.time()
+        tokens, stamp = cache.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - stamp) * refill)
+        if tokens < 1:
+            return (1 - tokens) / refill
+        cache.set(key, (tokens - 1, now), timeout=math.ceil(burst / refill) + 1)
+        return 0
+    finally:
+        cache.delete(f'{key}:lock')
+
+
+def rate_limited(scope):
+    """Limit a view with the token bucket configured in GRADES_THROTTLE_RATES[scope].
+
+    Buckets are per user (per client address for anonymous requests). An
+    empty bucket answers 429 with Retry-After before the view touches the
+    database.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped(request, *args, **kwargs):
+            rate = getattr(settings, 'GRADES_THROTTLE_RATES', {}).get(scope)
+            if rate:
+                if request.user.is_authenticated:
+                    ident = f'u{request.user.pk}'
+                else:
+                    ident = f"ip{request.META.get('REMOTE_ADDR', '')}"
+                retry_after = take_token(scope, ident, *rate)
+                if retry_after:
+                    response = HttpResponse('選課請求過於頻繁，請稍後再試。', status=429, content_type='text/plain; charset=utf-8')
+                    response['Retry-After'] = str(math.ceil(retry_after))
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
+
+
+def request_key(request, default):
+    """Coalescing key: the client's Idempotency-Key header if sent, else ``default``."""
+    header = request.headers.get('Idempotency-Key')
+    if header:
+        return f'idem:{request.user.pk}:{header[:64]}'
+    return default
+
+
+def enrollment_key(student_id, course_id):
+    return f'enrollment:{student_id}:{course_id}'
+
+
+def forget(key):
+    _cache().delete(f'grades:coalesce:{key}')
+
+
+def forget_many(keys):
+    """``forget`` for a batch of keys in one cache call, for bulk writes."""
+    _cache().delete_many([f'grades:coalesce:{key}' for key in keys])
+
+
+def coalesce(key, action, fn):
+    """Run ``fn()`` once for a burst of identical requests and share its outcome.
+
+    The outcome is cached as (action, outcome) under ``key`` for
+    GRADES_COALESCE_TTL seconds; repeating the same action returns it without
+    calling ``fn``, while a different action on the same key (drop after
+    enroll) runs normally and replaces it. A duplicate that arrives while the
+    first is still running waits up to GRADES_COALESCE_WAIT seconds for its
+    outcome and gets None if it is still not available.
+    """
+    cache = _cache()
+    result_key, lock_key = f'grades:coalesce:{key}', f'grades:coalesce:{key}:lock'
+    ttl = getattr(settings, 'GRADES_COALESCE_TTL', 10)
+    deadline = time.monotonic() + getattr(settings, 'GRADES_COALESCE_WAIT', 2)
+
+    while True:
+        cached = cache.get(result_key)
+        if cached is not None and cached[0] == action:
+            return cached[1]
+        if cache.add(lock_key, action, timeout=LOCK_TIMEOUT):
+            break
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(POLL_INTERVAL)
+
+    try:
+        # a duplicate may have finished between our read and taking the lock
+        cached = cache.get(result_key)
+        if cached is not None and cached[0] == action:
+            return cached[1]
+        outcome = fn()
+        cache.set(result_key, (action, outcome), ttl)
+        return outcome
+    finally:
+        cache.delete(lock_key)
@@ -0,0 +1,47 @@
+"""Timetable clashes between courses, answered by the database.
+
+Two slots clash when they share a weekday and each starts before the other
+ends. A student's busy time in a semester is the slots of the courses they
+are enrolled in; both the single-course check at enroll time and hiding
+clashing courses from a listing are correlated EXISTS subqueries over the
+(weekday, start_time, end_time) index, never a pairwise comparison in Python.
+"""
+from django.db.models import Exists, OuterRef
+
+from .models import CourseSlot
+
+
+def busy_slots(student, semester=''):
+    """Slots of the courses ``student`` is enrolled in for ``semester``."""
+    return CourseSlot.objects.filter(
+        course__enrollments__student=student, course__enrollments__semester=semester,
+    )
+
+
+def _overlapping(slots):
+    """``slots`` narrowed to those clashing with the slot in ``OuterRef``."""
+    return slots.filter(
+        weekday=OuterRef('weekday'), start_time__lt=OuterRef('end_time'), end_time__gt=OuterRef('start_time'),
+    )
+
+
+def without_clashes(student, queryset, semester=''):
+    """``queryset`` of courses minus those meeting while the student is already in class."""
+    clashing = CourseSlot.objects.filter(course_id=OuterRef('pk')).filter(
+        Exists(_overlapping(busy_slots(student, semester)))
+    )
+    return queryset.exclude(Exists(clashing))
+
+
+def clashes(student, course, semester=''):
+    """The student's enrolled slots (other courses) that overlap one of ``course``'s slots."""
+    return list(
+        busy_slots(student, semester).exclude(course=course)
+        .filter(Exists(_overlapping(CourseSlot.objects.filter(course=course))))
+        .select_related('course').order_by('weekday', 'start_time')
+    )
+
+
+def describe(slots):
+    """``C100（週一 09:00–11:00）、...`` for messages."""
+    return '、'.join(f'{slot.course.code}（{slot}）' for slot in slots)
@@ -0,0 +1,88 @@
+"""Per-request timing breakdown: DB, template rendering and total time.
+
+TimingMiddleware starts a ``RequestTiming`` for each request; queries are
+counted and timed through ``connection.execute_wrapper`` and template
+rendering through the ``grades.template_backend`` backend, which adds to the
+timing of the request being served (a context variable, so threads and
+async tasks never mix requests up).
+
+Each finished request is added to per-view counters kept in this process;
+``snapshot()`` returns them for the metrics endpoint. With several worker
+processes every worker reports its own counters.
+"""
+import threading
+from contextvars import ContextVar
+
+from django.utils import timezone
+
+
+_current = ContextVar('grades_request_timing', default=None)
+_lock = threading.Lock()
+_views = {}
+_since = timezone.now()
+
+
+class RequestTiming:
+    def __init__(self):
+        self.template = 0.0
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _current.reset(self._token)
+
+
+def add_template_time(seconds):
+    timing = _current.get()
+    if timing is not None:
+        timing.template += seconds
+
+
+def record(view, status, total_ms, db_ms, queries, template_ms):
+    """Add one request to the per-view counters."""
+    with _lock:
+        stats = _views.get(view)
+        if stats is None:
+            stats = _views[view] = {
+                'requests': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                'db_ms': 0.0, 'queries': 0, 'template_ms': 0.0,
+            }
+        stats['requests'] += 1
+        stats['errors'] += status >= 500
+        stats['total_ms'] += total_ms
+        stats['max_ms'] = max(stats['max_ms'], total_ms)
+        stats['db_ms'] += db_ms
+        stats['queries'] += queries
+        stats['template_ms'] += template_ms
+
+
+def snapshot():
+    """Per-view totals and averages since this process started (or the last reset)."""
+    with _lock:
+        views = {name: dict(stats) for name, stats in _views.items()}
+        since = _since
+    for stats in views.values():
+        n = stats['requests']
+        stats['avg_ms'] = stats['total_ms'] / n
+        stats['avg_db_ms'] = stats['db_ms'] / n
+        stats['avg_queries'] = stats['queries'] / n
+        stats['avg_template_ms'] = stats['template_ms'] / n
+    return {'since': since.isoformat(), 'views': views}
+
+
+def reset():
+    global _since
+    with _lock:
+        _views.clear()
+        _since = timezone.now()
+
+
+def server_timing(total_ms, db_ms, queries, template_ms):
+    """The Server-Timing header value for one request."""
+    return (
+        f'db;dur={db_ms:.1f};desc="{queries} queries", '
+        f'tpl;dur={template_ms:.1f};desc="templates", '
+        f'total;dur={total_ms:.1f}'
+    )
@@ -1,29 +1,40 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from .views import lazy_view
 
 urlpatterns = [
     path('login/', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(next_page='/'), name='logout'),
-    path('register/', views.register, name='register'),
-    path('profile/edit/', views.edit_profile, name='edit_profile'),
-    path('courses/', views.student_courses, name='student_courses'),
-    path('courses/available/', views.available_courses, name='available_courses'),
-    path('courses/<int:course_id>/enroll/', views.enroll_student_course, name='enroll_student_course'),
-    path('enrollment/<int:enrollment_id>/drop/', views.drop_course, name='drop_course'),
+    path('register/', lazy_view('register'), name='register'),
+    path('profile/edit/', lazy_view('edit_profile'), name='edit_profile'),
+    path('courses/', lazy_view('student_courses'), name='student_courses'),
+    path('courses/available/', lazy_view('available_courses'), name='available_courses'),
+    path('courses/<int:course_id>/enroll/', lazy_view('enroll_student_course'), name='enroll_student_course'),
+    path('enrollment/<int:enrollment_id>/drop/', lazy_view('drop_course'), name='drop_course'),
+    path('enrollment-requests/<int:request_id>/', lazy_view('enrollment_request_status'), name='enrollment_request_status'),
+    path('courses/<int:course_id>/waitlist/', lazy_view('waitlist_status'), name='waitlist_status'),
+    path('courses/<int:course_id>/waitlist/leave/', lazy_view('leave_waitlist'), name='leave_waitlist'),
+    path('course/<int:course_id>/bulk-enroll/', lazy_view('bulk_enroll_course'), name='bulk_enroll_course'),
     # teacher routes
-    path('teacher/courses/', views.teacher_courses, name='teacher_courses'),
-    path('teacher/course/create/', views.create_course, name='create_course'),
-    path('teacher/course/<int:course_id>/students/', views.teacher_course_students, name='teacher_course_students'),
-    path('teacher/course/<int:course_id>/delete/', views.remove_course, name='remove_course'),
+    path('teacher/courses/', lazy_view('teacher_courses'), name='teacher_courses'),
+    path('teacher/course/create/', lazy_view('create_course'), name='create_course'),
+    path('teacher/course/<int:course_id>/students/', lazy_view('teacher_course_students'), name='teacher_course_students'),
+    path('teacher/course/<int:course_id>/delete/', lazy_view('remove_course'), name='remove_course'),
     # admin-only course creation
-    path('admin/course/add/', views.admin_add_course, name='admin_add_course'),
-    path('teacher/enrollment/<int:enrollment_id>/grade/', views.update_enrollment_grade, name='update_enrollment_grade'),
-    path('student/semester/<str:semester>/avg/', views.semester_average, name='semester_average'),
+    path('admin/course/add/', lazy_view('admin_add_course'), name='admin_add_course'),
+    path('teacher/course/<int:course_id>/grades/', lazy_view('update_course_grades'), name='update_course_grades'),
+    path('teacher/enrollment/<int:enrollment_id>/grade/', lazy_view('update_enrollment_grade'), name='update_enrollment_grade'),
+    path('teacher/enrollment/<int:enrollment_id>/', lazy_view('patch_enrollment_grade'), name='patch_enrollment_grade'),
+    path('student/semester/<str:semester>/avg/', lazy_view('semester_average'), name='semester_average'),
+    path('admin/semester/<str:semester>/report/', lazy_view('semester_report'), name='semester_report'),
+    path('admin/profiles/', lazy_view('profiles'), name='profiles'),
+    path('admin/profiles/<str:name>/', lazy_view('profile_detail'), name='profile_detail'),
+    path('admin/profiles/<str:name>/pstats/', lazy_view('profile_pstats'), name='profile_pstats'),
+    path('admin/metrics/', lazy_view('metrics'), name='metrics'),
     # comments
-    path('course/<int:course_id>/comment/add/', views.add_comment, name='add_comment'),
-    path('comment/<int:comment_id>/edit/', views.edit_comment, name='edit_comment'),
-    path('comment/<int:comment_id>/delete/', views.delete_comment, name='delete_comment'),
+    path('course/<int:course_id>/comment/add/', lazy_view('add_comment'), name='add_comment'),
+    path('comment/<int:comment_id>/edit/', lazy_view('edit_comment'), name='edit_comment'),
+    path('comment/<int:comment_id>/delete/', lazy_view('delete_comment'), name='delete_comment'),
     # admin routes
-    path('admin/create-teacher/', views.create_teacher, name='create_teacher'),
+    path('admin/create-teacher/', lazy_view('create_teacher'), name='create_teacher'),
 ]
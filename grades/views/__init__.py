@@ -0,0 +1,64 @@
+"""Views, split into one module per audience.
+
+    common    role checks shared with grades.api
+    public    index, main page, course detail and the enroll/drop endpoint
+    accounts  registration and profile editing
+    student   the student dashboard and self-service enrollment
+    teacher   course management and grading
+    staff     admin-only pages
+    comments  course comments
+
+Nothing here is imported eagerly: the URLconfs route through ``lazy_view`` so a
+view module (and the forms it uses) is loaded by the first request that needs
+it, not when a worker boots or a management command starts. ``views.<name>``
+still works and imports the owning module on access.
+"""
+import functools
+from importlib import import_module
+
+
+_VIEW_MODULES = {
+    'public': ('index', 'main', 'course_detail', 'enroll_course'),
+    'accounts': ('register', 'edit_profile'),
+    'student': (
+        'student_courses', 'semester_average', 'drop_course', 'available_courses', 'enroll_student_course',
+        'enrollment_request_status', 'waitlist_status', 'leave_waitlist',
+    ),
+    'teacher': (
+        'teacher_courses', 'teacher_course_students', 'update_enrollment_grade', 'update_course_grades',
+        'patch_enrollment_grade',
+        'add_course', 'create_course', 'remove_course', 'bulk_enroll_course',
+    ),
+    'staff': (
+        'admin_add_course', 'semester_report', 'create_teacher', 'profiles', 'profile_detail', 'profile_pstats',
+        'metrics',
+    ),
+    'comments': ('add_comment', 'edit_comment', 'delete_comment'),
+    'common': ('_is_teacher', '_is_teacher_or_staff'),
+}
+_OWNER = {name: module for module, names in _VIEW_MODULES.items() for name in names}
+
+
+def __getattr__(name):
+    module = _OWNER.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    return getattr(import_module(f'{__name__}.{module}'), name)
+
+
+def lazy_view(name):
+    """Return a view callable that imports the real view on its first call."""
+    if name not in _OWNER:
+        raise ValueError(f'unknown view {name!r}')
+
+    def view(request, *args, **kwargs):
+        return _resolve(name)(request, *args, **kwargs)
+
+    view.__name__ = view.__qualname__ = name
+    view.__module__ = f'{__name__}.{_OWNER[name]}'
+    return view
+
+
+@functools.cache
+def _resolve(name):
+    return getattr(import_module(f'{__name__}.{_OWNER[name]}'), name)
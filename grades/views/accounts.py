@@ -0,0 +1,36 @@
+from django.contrib import messages
+from django.contrib.auth import login
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import render, redirect
+
+
+def register(request):
+    from ..forms import StudentRegistrationForm
+    if request.method == 'POST':
+        form = StudentRegistrationForm(request.POST)
+        if form.is_valid():
+            user = form.save()
+            login(request, user)
+            return redirect('main')
+    else:
+        form = StudentRegistrationForm()
+    return render(request, 'registration/register.html', {'form': form})
+
+
+@login_required
+def edit_profile(request):
+    from ..forms import ProfileForm
+    profile = getattr(request.user, 'profile', None)
+    if request.method == 'POST':
+        form = ProfileForm(request.POST, request.FILES, instance=profile)
+        if form.is_valid():
+            profile = form.save()
+            if 'avatar' in form.changed_data and profile.avatar:
+                # resizing a phone photo is slow; do it after the response
+                from ..tasks import process_avatar
+                process_avatar.delay(profile.id)
+            messages.success(request, '個人資料已更新')
+            return redirect('edit_profile')
+    else:
+        form = ProfileForm(instance=profile)
+    return render(request, 'profile_edit.html', {'form': form})
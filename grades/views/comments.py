@@ -0,0 +1,51 @@
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import render, redirect, get_object_or_404
+
+from ..models import Course, Comment
+
+
+@login_required
+def add_comment(request, course_id):
+    from ..forms import CommentForm
+    course = get_object_or_404(Course, id=course_id)
+    if request.method == 'POST':
+        form = CommentForm(request.POST)
+        if form.is_valid():
+            c = form.save(commit=False)
+            c.user = request.user
+            c.course = course
+            c.save()
+            messages.success(request, '留言已新增')
+    return redirect('course_detail', course_id=course_id)
+
+
+@login_required
+def edit_comment(request, comment_id):
+    from ..forms import CommentForm
+    comment = get_object_or_404(Comment, id=comment_id)
+    if comment.user != request.user:
+        messages.error(request, '沒有權限編輯這則留言')
+        return redirect('course_detail', course_id=comment.course.id)
+
+    if request.method == 'POST':
+        form = CommentForm(request.POST, instance=comment)
+        if form.is_valid():
+            form.save()
+            messages.success(request, '留言已更新')
+            return redirect('course_detail', course_id=comment.course.id)
+    else:
+        form = CommentForm(instance=comment)
+    return render(request, 'comment_edit.html', {'form': form, 'comment': comment})
+
+
+@login_required
+def delete_comment(request, comment_id):
+    comment = get_object_or_404(Comment, id=comment_id)
+    if comment.user != request.user and not request.user.is_staff:
+        messages.error(request, '沒有權限刪除這則留言')
+        return redirect('course_detail', course_id=comment.course.id)
+    course_id = comment.course.id
+    comment.delete()
+    messages.success(request, '留言已刪除')
+    return redirect('course_detail', course_id=course_id)
@@ -0,0 +1,45 @@
+from django.contrib import messages
+
+
+def _is_teacher_or_staff(user):
+    if not user.is_authenticated:
+        return False
+    if user.is_staff:
+        return True
+    profile = getattr(user, 'profile', None)
+    return bool(profile and profile.is_teacher)
+
+
+def _is_teacher(user):
+    if not user.is_authenticated:
+        return False
+    # prefer group membership; fallback to profile flag for compatibility
+    try:
+        if user.groups.filter(name='Teacher').exists():
+            return True
+    except Exception:
+        pass
+    profile = getattr(user, 'profile', None)
+    return bool(profile and profile.is_teacher)
+
+
+
+def _report_outcome(request, outcome):
+    """Flash the (level, text) outcome of a coalesced operation; None means a duplicate is still running."""
+    if outcome is None:
+        messages.info(request, '選課請求處理中，請稍後重新整理')
+    else:
+        messages.add_message(request, *outcome)
+
+
+def _enroll_refusal(student, course, semester=''):
+    """Why ``student`` may not enroll themselves in ``course`` (prerequisites, timetable), or None."""
+    from ..prerequisites import missing_prerequisites
+    from ..timetable import clashes, describe
+    missing = missing_prerequisites(student, course)
+    if missing:
+        return f"尚未通過 {course.code} 的先修課程：{'、'.join(missing)}"
+    clashing = clashes(student, course, semester)
+    if clashing:
+        return f"{course.code} 與已選課程上課時間衝突：{describe(clashing)}"
+    return None
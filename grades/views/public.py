@@ -0,0 +1,171 @@
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+
+from ..enrollment import enqueue_request
+from ..grading import student_averages
+from ..listing import comment_rows, roster_rows, student_rows
+from ..models import Course, Enrollment, Comment, Semester
+from ..throttle import coalesce, enrollment_key, forget, rate_limited, request_key
+from ..waitlist import WAITLISTED, enroll_or_wait, seats_freed
+from .common import _enroll_refusal, _is_teacher, _report_outcome
+
+
+def index(request):
+    """Index page with link to main grade system."""
+    return render(request, 'index.html')
+
+
+def main(request):
+    """Main page: show students, their enrolled courses and average score."""
+    # Redirect based on role: teachers -> teacher dashboard; students -> student dashboard
+    if request.user.is_authenticated:
+        if _is_teacher(request.user):
+            return redirect('teacher_courses')
+        if not request.user.is_staff:
+            return redirect('student_courses')
+    # exclude staff/admin users from the student listing; students, their
+    # averages (archived semesters included, see grades.grading), their
+    # enrollments and the courses are .values() queries shaped into plain
+    # rows, so rendering touches no model instances
+    listed = User.objects.filter(is_staff=False)
+    averages = student_averages(listed)
+    students = [
+        {**student, 'avg': averages.get(student['id'])}
+        for student in listed.order_by('username').values('id', 'username')
+    ]
+    enrollments = (
+        Enrollment.objects.filter(student__is_staff=False)
+        .order_by('id')
+        .values(
+            'id', 'student_id', 'midterm_grade', 'final_grade', 'total_grade',
+            course_code=F('course__code'), course_name=F('course__name'),
+        )
+    )
+    courses = Course.objects.order_by('code').values('id', 'code', 'name', teacher_name=F('teacher__username'))
+    return render(request, 'main.html', {'rows': student_rows(students, enrollments), 'courses': courses})
+
+
+def course_detail(request, course_id):
+    from ..forms import CommentForm
+    course = get_object_or_404(Course.objects.select_related('teacher'), id=course_id)
+    user = request.user
+    can_manage = user.is_authenticated and (user.is_staff or course.teacher_id == user.id)
+    enrollments = roster_rows(
+        list(
+            Enrollment.objects.filter(course=course).order_by('id')
+            .values('id', 'student_id', 'midterm_grade', 'final_grade', student_name=F('student__username'))
+        ),
+        user.id, can_manage,
+    )
+    enrolled = {e['student_id'] for e in enrollments}
+    # students not enrolled (for the quick enroll form)
+    other_students = (
+        User.objects.filter(is_staff=False).exclude(enrollments__course=course)
+        .order_by('username').values('id', 'username')
+    ) if can_manage else []
+    comments = comment_rows(
+        list(
+            Comment.objects.filter(course=course).order_by('-created_at')
+            .values('id', 'user_id', 'content', 'created_at', author=F('user__username'))
+        ),
+        user.id, user.is_staff,
+    )
+    return render(request, 'course.html', {
+        'course': course,
+        'enrollments': enrollments,
+        'can_manage': can_manage,
+        'can_self_enroll': user.is_authenticated and not user.is_staff and user.id not in enrolled,
+        'other_students': other_students,
+        'comments': comments,
+        'comment_form': CommentForm(),
+    })
+
+
+@rate_limited('enroll')
+def enroll_course(request):
+    """Toggle enroll/drop for a student in a course via POST.
+
+    Expects POST keys: course_id, student_id, action ('enroll'|'drop').
+    A drop may instead send just enrollment_id, which is how the shared
+    per-page forms identify the row whose button was pressed.
+    """
+    if request.method == 'POST':
+        course_id = request.POST.get('course_id')
+        student_id = request.POST.get('student_id')
+        action = request.POST.get('action')
+        enrollment_id = request.POST.get('enrollment_id')
+        if enrollment_id:
+            try:
+                enrollment = get_object_or_404(Enrollment, id=int(enrollment_id))
+            except (ValueError, TypeError):
+                messages.error(request, '選取的選課紀錄無效')
+                return redirect(request.META.get('HTTP_REFERER', reverse('main')))
+            course_id, student_id, action = enrollment.course_id, enrollment.student_id, 'drop'
+        course = get_object_or_404(Course, id=course_id)
+
+        # determine student: if student_id provided, use it (admin/teacher action);
+        # otherwise require login and use the current user.
+        if student_id:
+            try:
+                student = get_object_or_404(User, id=int(student_id))
+            except (ValueError, TypeError):
+                messages.error(request, '選取的學生無效')
+                return redirect(request.META.get('HTTP_REFERER', reverse('main')))
+            # If acting on behalf of someone else, require staff/instructor/teacher
+            if not request.user.is_authenticated:
+                messages.error(request, '請先登入以加退選課程')
+                return redirect('login')
+            if student != request.user:
+                course_teacher_user = getattr(course, 'teacher', None)
+                if not (
+                    request.user.is_staff or request.user == course_teacher_user or
+                    (hasattr(request.user, 'profile') and getattr(request.user.profile, 'is_teacher', False))
+                ):
+                    messages.error(request, '只有授課教師或管理員可以替學生加退選')
+                    return redirect(request.META.get('HTTP_REFERER', reverse('main')))
+        else:
+            if not request.user.is_authenticated:
+                messages.error(request, '請先登入以加退選課程')
+                return redirect('login')
+            student = request.user
+
+        action = 'enroll' if action == 'enroll' else 'drop'
+        # students enrolling themselves need the prerequisites and a free
+        # timetable; teachers and staff enrolling someone else may override them
+        self_enroll = action == 'enroll' and student == request.user and not request.user.is_staff
+
+        def apply():
+            refusal = self_enroll and _enroll_refusal(student, course)
+            if refusal:
+                return messages.ERROR, refusal
+            if settings.GRADES_RUSH_MODE:
+                req = enqueue_request(student, course, action, override=not self_enroll)
+                label = '加選' if action == 'enroll' else '退選'
+                return messages.INFO, f"{student.username} 的 {course.code} {label}申請已排入佇列（#{req.id}），稍後於「修習課程」查看結果"
+            if action == 'enroll' and self_enroll:
+                outcome, place = enroll_or_wait(student, course)
+                if outcome == WAITLISTED:
+                    return messages.INFO, f"{course.code} 已額滿，{student.username} 已加入候補名單（第 {place} 位）"
+                return messages.SUCCESS, f"{student.username} 已加入 {course.code}"
+            if action == 'enroll':
+                # teachers and staff may enroll past the capacity
+                Enrollment.objects.get_or_create(student=student, course=course)
+                return messages.SUCCESS, f"{student.username} 已加入 {course.code}"
+            dropped = Enrollment.objects.filter(student=student, course=course)
+            semesters = set(dropped.values_list('semester', flat=True))
+            dropped.delete()
+            Semester.touch(semesters)
+            forget(enrollment_key(student.id, course.id))
+            for semester in semesters:
+                seats_freed(course.id, semester)
+            return messages.SUCCESS, f"{student.username} 已從 {course.code} 退選"
+
+        # repeated clicks collapse into one database operation and share its outcome
+        key = request_key(request, enrollment_key(student.id, course.id))
+        _report_outcome(request, coalesce(key, action, apply))
+
+    return redirect(request.META.get('HTTP_REFERER', reverse('main')))
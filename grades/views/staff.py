@@ -0,0 +1,98 @@
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.conf import settings
+from django.http import FileResponse, Http404, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.shortcuts import render, redirect
+
+
+@user_passes_test(lambda u: u.is_authenticated and u.is_staff)
+def admin_add_course(request):
+    """Admin-only: create a course and assign a Teacher."""
+    from ..forms import CourseForm
+    if request.method == 'POST':
+        form = CourseForm(request.POST)
+        if form.is_valid():
+            form.save()
+            messages.success(request, '課程已由管理者建立')
+            return redirect('main')
+    else:
+        form = CourseForm()
+    return render(request, 'add_course.html', {'form': form})
+
+
+@user_passes_test(lambda u: u.is_authenticated and u.is_staff)
+def semester_report(request, semester):
+    """Staff dashboard: per-course statistics and student ranking for one semester."""
+    from ..snapshots import semester_report as build_semester_report
+    report, from_snapshot = build_semester_report(semester)
+    return render(request, 'semester_report.html', {
+        'semester': semester,
+        'courses': report['courses'],
+        'students': report['students'],
+        'from_snapshot': from_snapshot,
+    })
+
+
+@user_passes_test(lambda u: u.is_authenticated and u.is_staff)
+def profiles(request):
+    """Staff: recent request profiles recorded by ProfilingMiddleware."""
+    from ..profiling import recent_profiles
+    return render(request, 'profiles.html', {'profiles': recent_profiles()})
+
+
+@user_passes_test(lambda u: u.is_authenticated and u.is_staff)
+def profile_detail(request, name):
+    """Staff: top functions, duplicate queries and the full query log of one profile."""
+    from ..profiling import load_profile
+    profile = load_profile(name)
+    if profile is None:
+        raise Http404('找不到此效能分析紀錄')
+    return render(request, 'profile_detail.html', {'profile': profile})
+
+
+@user_passes_test(lambda u: u.is_authenticated and u.is_staff)
+def profile_pstats(request, name):
+    """Staff: download the raw cProfile dump (open with ``python -m pstats`` or snakeviz)."""
+    from ..profiling import pstats_path
+    path = pstats_path(name)
+    if path is None:
+        raise Http404('找不到此效能分析紀錄')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
+
+
+def metrics(request):
+    """Per-view request counters from TimingMiddleware, as JSON (this worker process only).
+
+    Open to staff sessions, or to scrapers sending ``Authorization: Bearer
+    <GRADES_METRICS_TOKEN>``. ``?reset=1`` (staff only) starts a new window.
+    """
+    from .. import timing
+    token = getattr(settings, 'GRADES_METRICS_TOKEN', '')
+    bearer = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    is_staff = request.user.is_authenticated and request.user.is_staff
+    if not (is_staff or (token and constant_time_compare(bearer, token))):
+        return JsonResponse({'detail': '沒有權限'}, status=403)
+    if is_staff and request.GET.get('reset'):
+        timing.reset()
+    return JsonResponse({'enabled': getattr(settings, 'GRADES_TIMING', False), **timing.snapshot()})
+
+
+@login_required
+def create_teacher(request):
+    """Admin-only view to create a new teacher account."""
+    from ..forms import CreateTeacherForm
+    if not request.user.is_staff:
+        messages.error(request, '只有管理員可以建立教師帳號')
+        return redirect('main')
+
+    if request.method == 'POST':
+        form = CreateTeacherForm(request.POST)
+        if form.is_valid():
+            form.save()
+            messages.success(request, '教師帳號建立成功')
+            return redirect('create_teacher')
+    else:
+        form = CreateTeacherForm()
+
+    return render(request, 'create_teacher.html', {'form': form})
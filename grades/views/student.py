@@ -0,0 +1,153 @@
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.db.models import Q
+from django.http import JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.views.decorators.http import require_POST
+
+from ..enrollment import enqueue_request, queue_position
+from ..grading import semester_averages, student_average
+from ..listing import TRANSCRIPT_ALIASES, TRANSCRIPT_FIELDS, semester_groups
+from ..models import ArchivedEnrollment, Course, Enrollment, EnrollmentRequest, Semester, WaitlistEntry
+from ..prerequisites import eligible_courses
+from ..throttle import coalesce, enrollment_key, forget, rate_limited, request_key
+from ..timetable import without_clashes
+from ..waitlist import ENROLLED, WAITLISTED, enroll_or_wait, position, seats_freed
+from .common import _enroll_refusal, _report_outcome
+
+
+@login_required
+def student_courses(request):
+    """Show student's enrolled courses with grades and semester average.
+
+    Archived (closed-semester) enrollments are listed too, read-only.
+    """
+    rows = [
+        dict(row, archived=model is ArchivedEnrollment)
+        for model in (Enrollment, ArchivedEnrollment)
+        for row in model.objects.filter(student=request.user).order_by('id')
+        .values(*TRANSCRIPT_FIELDS, **TRANSCRIPT_ALIASES)
+    ]
+    waitlist = [
+        {'entry': entry, 'position': position(entry)}
+        for entry in WaitlistEntry.objects.filter(student=request.user).select_related('course').order_by('joined_at')
+    ]
+    pending = EnrollmentRequest.objects.filter(
+        student=request.user, status=EnrollmentRequest.PENDING,
+    ).select_related('course').order_by('id')
+
+    return render(request, 'student_courses.html', {
+        'rows': rows,
+        'semesters': semester_groups(rows, semester_averages(request.user)),
+        'pending_requests': pending,
+        'waitlist': waitlist,
+    })
+
+
+@login_required
+def semester_average(request, semester):
+    from ..snapshots import load_snapshot
+    # closed semesters are answered from the frozen snapshot when it is current
+    snapshot = load_snapshot(semester)
+    if snapshot is not None:
+        avg = snapshot.student_average(request.user.id)
+    else:
+        avg = student_average(request.user, semester)
+    return render(request, 'semester_average.html', {'semester': semester, 'avg': avg})
+
+
+@login_required
+def drop_course(request, enrollment_id):
+    """Drop course for the logged-in student."""
+    enrollment = get_object_or_404(Enrollment, id=enrollment_id, student=request.user)
+    course = enrollment.course
+    enrollment.delete()
+    Semester.touch([enrollment.semester])
+    forget(enrollment_key(request.user.id, course.id))
+    seats_freed(course.id, enrollment.semester)
+    messages.success(request, f'已從 {course.code} 退選')
+    return redirect('student_courses')
+
+
+@login_required
+def available_courses(request):
+    """Show all courses available to enroll, with search functionality."""
+    enrolled_course_ids = Enrollment.objects.filter(student=request.user).values_list('course_id', flat=True)
+    # courses with unmet prerequisites (and, on request, timetable clashes) drop out in the same query
+    available = eligible_courses(request.user, Course.objects.exclude(id__in=enrolled_course_ids))
+    hide_clashes = request.GET.get('hide_clashes') == '1'
+    if hide_clashes:
+        available = without_clashes(request.user, available)
+    available = available.select_related('teacher').prefetch_related('slots').order_by('code')
+
+    # Handle search query
+    search_query = request.GET.get('search', '').strip()
+    if search_query:
+        available = available.filter(
+            Q(name__icontains=search_query) | Q(code__icontains=search_query)
+        )
+
+    return render(request, 'available_courses.html', {
+        'courses': available,
+        'search_query': search_query,
+        'hide_clashes': hide_clashes,
+    })
+
+
+@login_required
+@rate_limited('enroll')
+def enroll_student_course(request, course_id):
+    """Student enrolls in a course."""
+    course = get_object_or_404(Course, id=course_id)
+
+    def apply():
+        refusal = _enroll_refusal(request.user, course)
+        if refusal:
+            return messages.ERROR, refusal
+        if settings.GRADES_RUSH_MODE:
+            req = enqueue_request(request.user, course, 'enroll')
+            return messages.INFO, f'{course.code} 加選申請已排入佇列（#{req.id}），稍後於「修習課程」查看結果'
+        outcome, place = enroll_or_wait(request.user, course)
+        if outcome == ENROLLED:
+            return messages.SUCCESS, f'已加選 {course.code}'
+        if outcome == WAITLISTED:
+            return messages.INFO, f'{course.code} 已額滿，已加入候補名單（第 {place} 位），有名額時會自動加選'
+        return messages.INFO, f'您已經加選 {course.code}'
+
+    key = request_key(request, enrollment_key(request.user.id, course.id))
+    _report_outcome(request, coalesce(key, 'enroll', apply))
+    return redirect('available_courses')
+
+
+@login_required
+def enrollment_request_status(request, request_id):
+    """JSON status of one of the user's queued (rush mode) enroll/drop requests, for polling."""
+    req = get_object_or_404(EnrollmentRequest.objects.select_related('course'), id=request_id, student=request.user)
+    return JsonResponse({
+        'id': req.id,
+        'course': req.course.code,
+        'action': req.action,
+        'status': req.status,
+        'message': req.message,
+        'position': queue_position(req),
+    })
+
+
+@login_required
+def waitlist_status(request, course_id):
+    """JSON place of the user in a course's waitlist, for polling (one indexed lookup and count)."""
+    entry = WaitlistEntry.objects.filter(student=request.user, course_id=course_id, semester='').first()
+    if entry is not None:
+        return JsonResponse({'course_id': course_id, 'status': 'waiting', 'position': position(entry)})
+    enrolled = Enrollment.objects.filter(student=request.user, course_id=course_id, semester='').exists()
+    return JsonResponse({'course_id': course_id, 'status': 'enrolled' if enrolled else 'none', 'position': None})
+
+
+@login_required
+@require_POST
+def leave_waitlist(request, course_id):
+    deleted, _ = WaitlistEntry.objects.filter(student=request.user, course_id=course_id).delete()
+    if deleted:
+        messages.success(request, '已取消候補')
+    return redirect('student_courses')
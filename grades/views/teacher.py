@@ -0,0 +1,276 @@
+import json
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, F, Q
+from django.http import JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.views.decorators.http import require_http_methods
+
+from ..grading import GradeError, parse_grade
+from ..models import Course, Enrollment, GradingPolicy, Semester
+from .common import _is_teacher
+
+
+def _dashboard_key(teacher_id):
+    return f'grades:teacher-dashboard:{teacher_id}'
+
+
+def _forget_dashboard(teacher_id):
+    cache.delete(_dashboard_key(teacher_id))
+
+
+def _course_overview(teacher_id):
+    """Per-course enrollment count, grading completion and average total, from one query.
+
+    Cached for GRADES_DASHBOARD_TTL seconds; the teacher's own grade and
+    course edits drop the entry so they show up immediately.
+    """
+    key = _dashboard_key(teacher_id)
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(
+            Course.objects.filter(teacher_id=teacher_id).order_by('code').annotate(
+                students=Count('enrollments'),
+                graded=Count('enrollments', filter=Q(enrollments__final_grade__isnull=False)),
+                average=Avg('enrollments__total_grade'),
+            ).values('id', 'code', 'name', 'students', 'graded', 'average')
+        )
+        for row in rows:
+            row['completion'] = round(100 * row['graded'] / row['students']) if row['students'] else None
+        cache.set(key, rows, getattr(settings, 'GRADES_DASHBOARD_TTL', 30))
+    return rows
+
+
+@user_passes_test(_is_teacher)
+def teacher_courses(request):
+    """List courses taught by the logged-in teacher with their enrollment and grading overview."""
+    return render(request, 'teacher_courses.html', {'courses': _course_overview(request.user.id)})
+
+
+@user_passes_test(_is_teacher)
+def teacher_course_students(request, course_id):
+    """Show students for a course and allow the teacher to enter grades."""
+    course = get_object_or_404(Course, id=course_id, teacher=request.user)
+    enrollments = Enrollment.objects.filter(course=course).select_related('student')
+    return render(request, 'teacher_course_students.html', {'course': course, 'enrollments': enrollments})
+
+
+@user_passes_test(_is_teacher)
+def update_enrollment_grade(request, enrollment_id):
+    """Handle grade updates for an enrollment (POST)."""
+    if request.method != 'POST':
+        return redirect('teacher_courses')
+    enrollment = get_object_or_404(Enrollment, id=enrollment_id)
+    # ensure the current user is the instructor for the course (or staff)
+    course_teacher_user = getattr(enrollment.course, 'teacher', None)
+    if not (course_teacher_user == request.user):
+        messages.error(request, '沒有權限修改成績')
+        return redirect('teacher_courses')
+
+    mid = request.POST.get('midterm_grade')
+    fin = request.POST.get('final_grade')
+    # empty means null; NaN, infinities, negatives and out-of-range values are refused
+    try:
+        enrollment.midterm_grade = parse_grade(mid)
+    except GradeError as exc:
+        messages.error(request, f'期中{exc}')
+        return redirect('teacher_course_students', course_id=enrollment.course.id)
+    try:
+        enrollment.final_grade = parse_grade(fin)
+    except GradeError as exc:
+        messages.error(request, f'期末{exc}')
+        return redirect('teacher_course_students', course_id=enrollment.course.id)
+
+    enrollment.save()
+    _forget_dashboard(request.user.id)
+    messages.success(request, '成績已更新')
+    return redirect('teacher_course_students', course_id=enrollment.course.id)
+
+
+def _grade_row(enrollment):
+    return {
+        'id': enrollment.id,
+        'midterm_grade': enrollment.midterm_grade,
+        'final_grade': enrollment.final_grade,
+        'total_grade': enrollment.total_grade,
+        'version': enrollment.version,
+    }
+
+
+@require_http_methods(['PATCH'])
+def patch_enrollment_grade(request, enrollment_id):
+    """Inline grade edit from the roster: JSON in, the updated row out.
+
+    The body carries ``version`` (as rendered on the page) and any of
+    ``midterm_grade`` / ``final_grade``; omitted grades keep their value and
+    null or "" clears one. The write is an UPDATE conditional on that version,
+    so if anyone saved the row in between nothing is written and 409 returns
+    the current row instead.
+    """
+    if not _is_teacher(request.user):
+        return JsonResponse({'detail': '沒有權限修改成績'}, status=403)
+    enrollment = get_object_or_404(Enrollment.objects.select_related('course__grading_policy'), id=enrollment_id)
+    if enrollment.course.teacher_id != request.user.id:
+        return JsonResponse({'detail': '沒有權限修改成績'}, status=403)
+    try:
+        payload = json.loads(request.body)
+        version = int(payload['version'])
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'detail': '請求格式錯誤，需包含 version'}, status=400)
+
+    grades = {}
+    for field, label in (('midterm_grade', '期中'), ('final_grade', '期末')):
+        try:
+            grades[field] = parse_grade(payload.get(field, getattr(enrollment, field)))
+        except GradeError as exc:
+            return JsonResponse({'detail': f'{label}{exc}'}, status=400)
+
+    conflict = {'detail': '此筆成績已被其他人修改，請確認後再儲存', 'row': _grade_row(enrollment)}
+    if enrollment.version != version:
+        return JsonResponse(conflict, status=409)
+    policy = getattr(enrollment.course, 'grading_policy', None) or GradingPolicy()
+    total = policy.compute_total(grades['midterm_grade'], grades['final_grade'])
+    updated = Enrollment.objects.filter(id=enrollment.id, version=version).update(
+        total_grade=total, version=F('version') + 1, **grades,
+    )
+    if not updated:
+        # saved by someone else between our read and the UPDATE
+        enrollment.refresh_from_db()
+        conflict['row'] = _grade_row(enrollment)
+        return JsonResponse(conflict, status=409)
+
+    Semester.touch([enrollment.semester])
+    _forget_dashboard(request.user.id)
+    # as stored, i.e. rounded to the column's decimal places
+    enrollment.refresh_from_db(fields=['midterm_grade', 'final_grade', 'total_grade', 'version'])
+    return JsonResponse(_grade_row(enrollment))
+
+
+@user_passes_test(_is_teacher)
+def update_course_grades(request, course_id):
+    """Save the whole roster form of teacher_course_students in one POST.
+
+    Inputs are named midterm_<enrollment id> / final_<enrollment id>, with the
+    row's version in version_<enrollment id>. A row button sends
+    enrollment_id to save just that row. Every changed row is written in one
+    transaction with an UPDATE conditioned on its posted version, so a row
+    saved by someone else after the page loaded (or posted without a
+    version) is left alone and reported.
+    """
+    course = get_object_or_404(Course, id=course_id, teacher=request.user)
+    if request.method != 'POST':
+        return redirect('teacher_course_students', course_id=course.id)
+
+    enrollments = Enrollment.objects.filter(course=course).select_related('student')
+    only = request.POST.get('enrollment_id')
+    if only:
+        enrollments = enrollments.filter(id=only if only.isdigit() else 0)
+    policy = getattr(course, 'grading_policy', None) or GradingPolicy()
+
+    changed = []
+    stale = []
+    for e in enrollments:
+        values = {}
+        for field, prefix, label in (('midterm_grade', 'midterm', '期中'), ('final_grade', 'final', '期末')):
+            raw = request.POST.get(f'{prefix}_{e.id}')
+            if raw is None:
+                values[field] = getattr(e, field)
+                continue
+            try:
+                values[field] = parse_grade(raw)
+            except GradeError as exc:
+                messages.error(request, f'{e.student.username} 的{label}{exc}')
+                return redirect('teacher_course_students', course_id=course.id)
+        if values['midterm_grade'] == e.midterm_grade and values['final_grade'] == e.final_grade:
+            continue
+        version = request.POST.get(f'version_{e.id}', '')
+        if not version.isdigit():
+            stale.append(e.student.username)
+            continue
+        values['total_grade'] = policy.compute_total(values['midterm_grade'], values['final_grade'])
+        changed.append((e, int(version), values))
+
+    saved = []
+    with transaction.atomic():
+        for e, version, values in changed:
+            if Enrollment.objects.filter(pk=e.pk, version=version).update(version=F('version') + 1, **values):
+                saved.append(e)
+            else:
+                stale.append(e.student.username)
+        if saved:
+            Semester.touch({e.semester for e in saved})
+    if saved:
+        _forget_dashboard(request.user.id)
+    messages.success(request, f'已更新 {len(saved)} 筆成績')
+    if stale:
+        messages.warning(request, f"{'、'.join(stale)} 的成績已被其他人修改，未覆寫，請確認後再儲存")
+    return redirect('teacher_course_students', course_id=course.id)
+
+
+@user_passes_test(_is_teacher)
+def add_course(request):
+    from ..forms import CourseForm
+    if request.method == 'POST':
+        form = CourseForm(request.POST)
+        if form.is_valid():
+            form.save()
+            messages.success(request, '課程已新增')
+            return redirect('main')
+    else:
+        form = CourseForm()
+    return render(request, 'add_course.html', {'form': form})
+
+
+@user_passes_test(_is_teacher)
+def create_course(request):
+    """Allow a logged-in teacher to create a course assigned to themselves."""
+    if request.method == 'POST':
+        course_name = request.POST.get('course_name')
+        course_code = request.POST.get('course_code')
+        Course.objects.create(name=course_name, code=course_code, teacher=request.user)
+        _forget_dashboard(request.user.id)
+        messages.success(request, '課程已建立')
+        return redirect('teacher_courses')
+
+    return render(request, 'create_course.html')
+
+
+@user_passes_test(_is_teacher)
+def remove_course(request, course_id):
+    course = get_object_or_404(Course, id=course_id, teacher=request.user)
+    if request.method == 'POST':
+        course.delete()
+        _forget_dashboard(request.user.id)
+        messages.success(request, '課程已刪除')
+        return redirect('teacher_courses')
+    return render(request, 'confirm_delete_course.html', {'course': course})
+
+
+@login_required
+def bulk_enroll_course(request, course_id):
+    """Staff or the course teacher: enroll a cohort from a username list or CSV in one transaction."""
+    from ..enrollment import bulk_enroll
+    from ..forms import BulkEnrollForm
+    course = get_object_or_404(Course, id=course_id)
+    if not (request.user.is_staff or course.teacher_id == request.user.id):
+        messages.error(request, '只有授課教師或管理員可以批次加選')
+        return redirect('course_detail', course_id=course.id)
+
+    summary = None
+    if request.method == 'POST':
+        form = BulkEnrollForm(request.POST, request.FILES)
+        if form.is_valid():
+            summary = bulk_enroll(course, form.cleaned_data['username_list'], semester=form.cleaned_data['semester'])
+            _forget_dashboard(course.teacher_id)
+            messages.success(
+                request,
+                f"{course.code}：新增 {len(summary['inserted'])} 人，已選修 {len(summary['skipped'])} 人，"
+                f"查無帳號 {len(summary['unknown'])} 人",
+            )
+    else:
+        form = BulkEnrollForm()
+    return render(request, 'bulk_enroll.html', {'course': course, 'form': form, 'summary': summary})
@@ -0,0 +1,97 @@
+"""Course capacity and waitlists.
+
+A student enrolling themselves in a full course (Course.capacity reached for
+the semester) joins its waitlist instead, so there is nothing to retry. When
+seats free up — a drop through any view or the rush-mode queue — the
+``promote_waitlist`` task moves the head of the line into Enrollment, up to
+GRADES_WAITLIST_BATCH students per transaction. Positions are counted on the
+(course, semester, joined_at, id) index, cheap enough to poll.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Course, Enrollment, Semester, WaitlistEntry
+
+
+ENROLLED, ALREADY, WAITLISTED = 'enrolled', 'already', 'waitlisted'
+
+
+def seats_left(course, semester=''):
+    """Free seats of ``course`` in ``semester``, or None when it has no capacity."""
+    if course.capacity is None:
+        return None
+    return max(0, course.capacity - Enrollment.objects.filter(course=course, semester=semester).count())
+
+
+def enroll_or_wait(student, course, semester=''):
+    """Enroll ``student`` if a seat is free, else put them on the waitlist.
+
+    Returns ``(ENROLLED | ALREADY | WAITLISTED, position or None)``. The
+    course row is locked (PostgreSQL; SQLite transactions already take the
+    write lock up front), so two requests cannot both take the last seat.
+    """
+    with transaction.atomic():
+        course = Course.objects.select_for_update().get(pk=course.pk)
+        if Enrollment.objects.filter(student=student, course=course, semester=semester).exists():
+            return ALREADY, None
+        free = seats_left(course, semester)
+        if free is None or free > 0 and not waiting(course, semester).exists():
+            Enrollment.objects.create(student=student, course=course, semester=semester)
+            return ENROLLED, None
+        entry, _ = WaitlistEntry.objects.get_or_create(student=student, course=course, semester=semester)
+        if free:
+            # seats are free but others were first: let the promoter seat the line in order
+            seats_freed(course.id, semester)
+    return WAITLISTED, position(entry)
+
+
+def waiting(course, semester=''):
+    """The waitlist of ``course``, first in line first."""
+    return WaitlistEntry.objects.filter(course=course, semester=semester).order_by('joined_at', 'id')
+
+
+def position(entry):
+    """1-based place of ``entry`` in its course's line."""
+    ahead = WaitlistEntry.objects.filter(course_id=entry.course_id, semester=entry.semester).filter(
+        Q(joined_at__lt=entry.joined_at) | Q(joined_at=entry.joined_at, id__lt=entry.id)
+    )
+    return ahead.count() + 1
+
+
+def promote(course_id, semester=''):
+    """Fill the free seats of a course from its waitlist; returns the promoted student ids.
+
+    Each batch of at most GRADES_WAITLIST_BATCH students is one transaction:
+    one bulk_create of their enrollments and one DELETE of their entries.
+    """
+    from .throttle import enrollment_key, forget_many
+
+    promoted = []
+    while True:
+        with transaction.atomic():
+            course = Course.objects.select_for_update().filter(pk=course_id).first()
+            if course is None:
+                break
+            free = seats_left(course, semester)
+            limit = settings.GRADES_WAITLIST_BATCH if free is None else min(free, settings.GRADES_WAITLIST_BATCH)
+            batch = list(waiting(course, semester).values_list('id', 'student_id')[:limit]) if limit else []
+            if not batch:
+                break
+            Enrollment.objects.bulk_create(
+                [Enrollment(student_id=student_id, course_id=course_id, semester=semester) for _, student_id in batch],
+                ignore_conflicts=True,
+            )
+            WaitlistEntry.objects.filter(id__in=[entry_id for entry_id, _ in batch]).delete()
+            Semester.touch([semester])
+        # bulk_create sends no post_save: drop the replayed "waitlisted" outcomes
+        forget_many(enrollment_key(student_id, course_id) for _, student_id in batch)
+        promoted.extend(student_id for _, student_id in batch)
+    return promoted
+
+
+def seats_freed(course_id, semester=''):
+    """Queue a promotion for ``course_id`` once the current transaction commits."""
+    from . import tasks
+    if WaitlistEntry.objects.filter(course_id=course_id, semester=semester).exists():
+        tasks.promote_waitlist.delay(course_id, semester)
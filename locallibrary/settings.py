@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,44 +45,134 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'grades.middleware.StaticFilesMiddleware',
+    'grades.middleware.ThresholdGZipMiddleware',
+    'grades.middleware.TimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'grades.middleware.ProfilingMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Compress HTML/JSON responses in-process (GRADES_GZIP=1) when no front proxy
+# does it; bodies under GRADES_GZIP_MIN_LENGTH bytes are sent as-is.
+GRADES_GZIP = os.environ.get('GRADES_GZIP', '0') == '1'
+GRADES_GZIP_MIN_LENGTH = int(os.environ.get('GRADES_GZIP_MIN_LENGTH', '1024'))
+
+# GRADES_TIMING=1 adds a Server-Timing header (db / tpl / total) to every
+# response, logs one JSON line per request on the `grades.timing` logger and
+# keeps per-view counters for /accounts/admin/metrics/. Scrapers can read the
+# metrics with `Authorization: Bearer <GRADES_METRICS_TOKEN>` instead of a
+# staff session.
+GRADES_TIMING = os.environ.get('GRADES_TIMING', '0') == '1'
+GRADES_METRICS_TOKEN = os.environ.get('GRADES_METRICS_TOKEN', '')
+
 ROOT_URLCONF = 'locallibrary.urls'
 
+# GRADES_MINIFY_TEMPLATES=1 strips layout whitespace from templates once at
+# load time.
+GRADES_MINIFY_TEMPLATES = os.environ.get('GRADES_MINIFY_TEMPLATES', '0') == '1'
+
+# Templates are always compiled once per process by the cached loader, also
+# under DEBUG, so the numbers measured in development (Server-Timing, profiles,
+# bench_templates) are the production ones. Edited templates need a server
+# restart; runserver's autoreloader does that by itself.
+if GRADES_MINIFY_TEMPLATES:
+    template_loaders = ['grades.template_loaders.FilesystemLoader', 'grades.template_loaders.AppDirectoriesLoader']
+else:
+    template_loaders = ['django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader']
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that also times renders for TimingMiddleware
+        'BACKEND': 'grades.template_backend.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'loaders': [('django.template.loaders.cached.Loader', template_loaders)],
+            # template debug keeps source positions on every node for the error page
+            'debug': os.environ.get('GRADES_TEMPLATE_DEBUG', '1' if DEBUG else '0') == '1',
         },
     },
 ]
 
 WSGI_APPLICATION = 'locallibrary.wsgi.application'
 
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'timing': {'class': 'logging.StreamHandler', 'formatter': 'message'},
+    },
+    'loggers': {
+        # one JSON object per line, for log shippers
+        'grades.timing': {'handlers': ['timing'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# SQLite runs in WAL mode so readers never wait for the (single) writer, and
+# write transactions take the lock up front instead of failing with "database
+# is locked" when they upgrade from a read.
+SQLITE_DATABASE = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': os.environ.get('GRADES_SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+    'OPTIONS': {
+        'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL',
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': 20,
+    },
 }
 
+# GRADES_DB=postgres switches to PostgreSQL (needs psycopg[binary,pool] >= 3)
+# with psycopg's connection pool: every process keeps GRADES_DB_POOL_MIN to
+# GRADES_DB_POOL_MAX connections open and hands them to requests, so there is
+# no connect per request and many concurrent writers. The SQLite file stays
+# reachable as the "sqlite" alias for `manage.py copy_database` and
+# `bench_database`.
+GRADES_DB = os.environ.get('GRADES_DB', 'sqlite')
+if GRADES_DB == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('GRADES_DB_NAME', 'grades'),
+            'USER': os.environ.get('GRADES_DB_USER', 'grades'),
+            'PASSWORD': os.environ.get('GRADES_DB_PASSWORD', ''),
+            'HOST': os.environ.get('GRADES_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('GRADES_DB_PORT', '5432'),
+            # the pool replaces persistent connections (CONN_MAX_AGE must stay 0)
+            'CONN_MAX_AGE': 0,
+            # .iterator() uses server-side cursors; turn them off only behind a
+            # transaction-pooling pgbouncer
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('GRADES_DB_PGBOUNCER', '0') == '1',
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('GRADES_DB_POOL_MIN', '2')),
+                    'max_size': int(os.environ.get('GRADES_DB_POOL_MAX', '10')),
+                    'timeout': int(os.environ.get('GRADES_DB_POOL_TIMEOUT', '10')),
+                },
+            },
+        },
+        'sqlite': SQLITE_DATABASE,
+    }
+elif GRADES_DB == 'sqlite':
+    DATABASES = {'default': SQLITE_DATABASE}
+else:
+    raise ImproperlyConfigured(f"GRADES_DB must be 'sqlite' or 'postgres', not {GRADES_DB!r}")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -100,6 +193,14 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Authentication
+# Loads request.user with its profile in one joined query (see grades/backends.py).
+
+AUTHENTICATION_BACKENDS = [
+    'grades.backends.ProfileModelBackend',
+]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -116,16 +217,123 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Bootstrap is vendored under grades/static. Outside DEBUG, collectstatic
+# writes content-hashed names plus .gz/.br variants (brotli if installed).
+# Set GRADES_SERVE_STATIC=1 to serve STATIC_ROOT from the app itself when
+# there is no front proxy (lab / exam-hall deployments).
+GRADES_STATIC_MANIFEST = os.environ.get('GRADES_STATIC_MANIFEST', '0' if DEBUG else '1') == '1'
+GRADES_SERVE_STATIC = os.environ.get('GRADES_SERVE_STATIC', '0') == '1'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'grades.storage.CompressedManifestStaticFilesStorage' if GRADES_STATIC_MANIFEST
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
 
 # Media files (user-uploaded)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Report snapshots of closed semesters (`manage.py snapshot_semester`)
+GRADES_SNAPSHOT_DIR = Path(os.environ.get('GRADES_SNAPSHOT_DIR', BASE_DIR / 'snapshots'))
+
+# A course counts as passed (for prerequisites) from this final grade up.
+GRADES_PASS_GRADE = int(os.environ.get('GRADES_PASS_GRADE', '60'))
+
+# Highest midterm/final grade a teacher may enter (grades.grading.parse_grade).
+GRADES_MAX_GRADE = int(os.environ.get('GRADES_MAX_GRADE', '1000'))
+
+# Students moved from a full course's waitlist into it per transaction when
+# seats free up (grades.waitlist.promote).
+GRADES_WAITLIST_BATCH = int(os.environ.get('GRADES_WAITLIST_BATCH', '50'))
+
+# Per-request profiling (grades.middleware.ProfilingMiddleware): with
+# GRADES_PROFILING=1 a staff user can send `X-Profile: cprofile|sql` or
+# `?_profile=cprofile|sql`; the newest GRADES_PROFILE_KEEP profiles are kept
+# in GRADES_PROFILE_DIR and listed at /accounts/admin/profiles/.
+GRADES_PROFILING = os.environ.get('GRADES_PROFILING', '0') == '1'
+GRADES_PROFILE_DIR = Path(os.environ.get('GRADES_PROFILE_DIR', BASE_DIR / 'profiles'))
+GRADES_PROFILE_KEEP = int(os.environ.get('GRADES_PROFILE_KEEP', '100'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache
+# The session and throttling helpers only need a process-local cache; point
+# this at a shared backend (file/redis/memcached) when running several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'grades-default',
+    }
+}
+
+# Enrollment endpoints (grades.throttle): token bucket per user of
+# (burst, tokens refilled per second), and how long a finished enroll/drop
+# outcome is replayed to duplicate requests instead of hitting the database.
+# Point GRADES_THROTTLE_CACHE at a FileBasedCache alias to share buckets
+# between worker processes on one host.
+GRADES_THROTTLE_CACHE = 'default'
+GRADES_THROTTLE_RATES = {
+    'enroll': (
+        int(os.environ.get('GRADES_ENROLL_BURST', '10')),
+        float(os.environ.get('GRADES_ENROLL_REFILL', '1')),
+    ),
+}
+GRADES_COALESCE_TTL = int(os.environ.get('GRADES_COALESCE_TTL', '10'))
+GRADES_COALESCE_WAIT = 2
+
+# Seconds the teacher dashboard's per-course aggregates are cached; a
+# teacher's own grade and course edits refresh them immediately.
+GRADES_DASHBOARD_TTL = int(os.environ.get('GRADES_DASHBOARD_TTL', '30'))
+
+# Rush mode: enroll/drop requests are appended to the EnrollmentRequest queue
+# and applied in batches by `manage.py process_enrollment_queue`, instead of
+# each request taking the database write lock itself.
+GRADES_RUSH_MODE = os.environ.get('GRADES_RUSH_MODE', '0') == '1'
+
+# Background tasks (grades.taskqueue). Eager: tasks run in the web process
+# right after the request's transaction commits. Set GRADES_TASKS_EAGER=0 when
+# `manage.py run_workers` is running to move them out of the request.
+GRADES_TASKS_EAGER = os.environ.get('GRADES_TASKS_EAGER', '1') == '1'
+
+
+# Sessions and messages
+# GRADES_SESSION_MODE selects where sessions live:
+#   db             - one row per session, written on every modification (Django default)
+#   cached_db      - write-through cache, reads served from CACHES['default']
+#   cache          - cache only, no database writes (sessions lost on cache eviction)
+#   signed_cookies - no server-side storage at all
+# Run `python manage.py bench_session_writes` to compare the modes.
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_MODE = os.environ.get('GRADES_SESSION_MODE', 'db')
+if SESSION_MODE not in SESSION_ENGINES:
+    raise ImproperlyConfigured(
+        f"GRADES_SESSION_MODE must be one of {', '.join(SESSION_ENGINES)}, not {SESSION_MODE!r}"
+    )
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+
+# Keep flash messages in their own cookie so messages.success(...) never
+# marks the session as modified (the default FallbackStorage may spill into it).
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
 # Login redirect
 # Route users to `main` which will then redirect based on role (teacher/admin/student)
 LOGIN_REDIRECT_URL = 'main'
@@ -19,16 +19,17 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
-from grades import views
+from grades.views import lazy_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('', views.index, name='index'),
-    path('main/', views.main, name='main'),
-    path('course/<int:course_id>/', views.course_detail, name='course_detail'),
-    path('add_course/', views.add_course, name='add_course'),
-    path('enroll_course/', views.enroll_course, name='enroll_course'),
+    path('', lazy_view('index'), name='index'),
+    path('main/', lazy_view('main'), name='main'),
+    path('course/<int:course_id>/', lazy_view('course_detail'), name='course_detail'),
+    path('add_course/', lazy_view('add_course'), name='add_course'),
+    path('enroll_course/', lazy_view('enroll_course'), name='enroll_course'),
     path('accounts/', include('grades.urls')),
+    path('api/', include('grades.api_urls')),
 ]
 
 if settings.DEBUG: